@@ -1 +1,3 @@
-from .translate_handler import *
\ No newline at end of file
+from .translate_handler import *
+from .metrics_handler import *
+from .ready_handler import *
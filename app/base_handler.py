@@ -1,11 +1,22 @@
 import json
 import traceback
 import logging
+import types
 
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
 from tornado.web import RequestHandler
 
+from .executor import EXECUTOR
+from .request_log import REQUEST_LOG
+from lib_translate.metrics import Counter, Gauge, Histogram
+
 logger = logging.getLogger(__name__)
 
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being processed.")
+REQUESTS = Counter("http_requests_total", "Requests processed, by response status.", ["status"])
+REQUEST_LATENCY = Histogram("http_request_seconds", "Latency of requests.")
+
 
 class _BaseHandler(RequestHandler):
 
@@ -23,16 +34,78 @@ class _BaseHandler(RequestHandler):
         self.set_header("Access-Control-Allow-Headers", "Content-Type")
         self.set_header("Access-Control-Expose-Headers", "Content-Type")
 
-    def post(self):
+    def _get_result_from_body(self, body):
+        params = json.loads(body)
+        return self._get_result_dict(**params)
 
-        logger.info("收到请求：%s" % self.request.body)
+    async def _write_stream(self, chunks):
+        """
+        逐条返回生成器中的数据，每条数据为一行json，写完一条立即发送给客户端，
+        返回处理结果的status，客户端中途断开连接时为499。
+        同步的生成器在线程池中执行，异步的生成器在IOLoop上执行
+        """
+        self.set_header("Content-Type", "application/x-ndjson; charset=UTF-8")
+        loop = IOLoop.current()
+        is_async = isinstance(chunks, types.AsyncGeneratorType)
+        count = 0
+        try:
+            while True:
+                if is_async:
+                    chunk = await chunks.__anext__()
+                else:
+                    chunk = await loop.run_in_executor(EXECUTOR, next, chunks, None)
+                if chunk is None:
+                    break
+                line = json.dumps({"status": "200", "msg": "请求成功", "data": chunk},
+                                  ensure_ascii=False)
+                self.write(line + "\n")
+                await self.flush()
+                count += 1
+        except StopAsyncIteration:
+            pass
+        except StreamClosedError:
+            # 客户端断开连接，不再继续翻译
+            if is_async:
+                await chunks.aclose()
+            else:
+                chunks.close()
+            logger.info("客户端断开连接，已返回%d条数据" % count)
+            return "499"
+        except Exception as e:
+            self.write(json.dumps({"status": "500", "msg": str(e)}, ensure_ascii=False) + "\n")
+            logger.error(traceback.format_exc())
+            return "500"
+        logger.info("流式返回结束，共返回%d条数据" % count)
+        return "200"
+
+    async def post(self, *args):
+        IN_FLIGHT.inc()
+        try:
+            with REQUEST_LATENCY.time():
+                status, response = await self._post()
+            REQUESTS.labels(status).inc()
+        finally:
+            IN_FLIGHT.dec()
+        REQUEST_LOG.log(self.request.uri, status, self.request.request_time(),
+                        self.request.body, response)
+
+    async def _post(self):
+        """
+        处理请求，返回响应的status字段和返回的json，流式返回时json为None
+        """
         response_dict = {
             "status": "200",
             "msg": "请求成功",
         }
         try:
-            params = json.loads(self.request.body)
-            data = self._get_result_dict(**params)
+            # 请求的解析和处理都放到线程池中执行，避免阻塞IOLoop；
+            # 需要等待翻译的方法返回协程，在IOLoop上等待，等待期间不占用线程池
+            data = await IOLoop.current().run_in_executor(
+                EXECUTOR, self._get_result_from_body, self.request.body)
+            if isinstance(data, types.CoroutineType):
+                data = await data
+            if isinstance(data, (types.GeneratorType, types.AsyncGeneratorType)):
+                return await self._write_stream(data), None
             if data:
                 response_dict["data"] = data
         except Exception as e:
@@ -41,5 +114,6 @@ class _BaseHandler(RequestHandler):
             logger.error(traceback.format_exc())
             
         response = json.dumps(response_dict, ensure_ascii=False)
-        logger.info("返回内容：%s" % response)
         self.write(response)
+        return response_dict["status"], response
+
@@ -0,0 +1,111 @@
+"""
+处理翻译请求的线程池，避免翻译过程阻塞tornado的IOLoop
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tornado.ioloop import IOLoop
+
+from config import global_config
+from lib_translate import advance_steps
+from lib_translate.metrics import Gauge
+
+# 获取当前模块有用的配置
+EXECUTOR_WORKERS = global_config.get("executor_workers", 4)
+EXECUTOR_MAX_QUEUE = global_config.get("executor_max_queue", 0)
+
+
+class ServerBusyError(RuntimeError):
+    """
+    线程池排队的任务数超过上限
+    """
+
+
+class TranslateExecutor():
+    """
+    有界线程池，记录正在执行和排队中的任务数
+    >>> executor = TranslateExecutor(max_workers=2)
+    >>> executor.submit(sum, [1, 2, 3]).result()
+    6
+    >>> executor.status()
+    {'workers': 2, 'running': 0, 'queue_depth': 0}
+    """
+
+    def __init__(self, max_workers, max_queue=0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers,
+                                            thread_name_prefix="translate")
+        self._lock = threading.Lock()
+        self._pending = 0  # 已提交但还没有执行完的任务数
+        self._running = 0
+
+    @property
+    def queue_depth(self):
+        """
+        排队等待执行的任务数
+        """
+        return self._pending - self._running
+
+    def submit(self, func, *args, **kwargs):
+        """
+        提交任务，排队任务数超过max_queue时抛出ServerBusyError
+        """
+        with self._lock:
+            if self.max_queue and self.queue_depth >= self.max_queue:
+                raise ServerBusyError(
+                    "Server is busy, {} requests are waiting.".format(self.queue_depth))
+            self._pending += 1
+
+        def run():
+            with self._lock:
+                self._running += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+
+        try:
+            return self._executor.submit(run)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    def status(self):
+        """
+        返回线程池当前的状态
+        """
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": self._running,
+                "queue_depth": self._pending - self._running
+            }
+
+
+EXECUTOR = TranslateExecutor(EXECUTOR_WORKERS, EXECUTOR_MAX_QUEUE)
+Gauge("executor_queue_depth", "Requests waiting in the executor.").set_function(
+    lambda: EXECUTOR.queue_depth)
+Gauge("executor_running", "Requests running in the executor.").set_function(
+    lambda: EXECUTOR._running)
+
+
+async def run_steps(steps):
+    """
+    执行lib_translate中的分步翻译：计算的步骤在线程池中执行，在IOLoop上等待调度器翻译，
+    等待期间不占用线程池，调度器合并的请求数不受线程数的限制
+    """
+    loop = IOLoop.current()
+    value, error = None, None
+    while True:
+        done, result = await loop.run_in_executor(EXECUTOR, advance_steps, steps, value, error)
+        if done:
+            return result
+        try:
+            value, error = await asyncio.wrap_future(result), None
+        except Exception as e:
+            value, error = None, e
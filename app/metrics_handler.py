@@ -0,0 +1,16 @@
+from tornado.web import RequestHandler
+
+from lib_translate.metrics import REGISTRY
+
+
+class MetricsHandler(RequestHandler):
+    """
+    以Prometheus的文本格式返回监控指标
+    """
+
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(REGISTRY.render())
+
+
+__all__ = ["MetricsHandler"]
@@ -0,0 +1,152 @@
+"""
+服务的就绪检查：模型加载和预热完成之前/ready返回503，完成之后返回200，
+nginx和docker-compose的健康检查据此只把流量发给已经预热的worker。
+服务运行时替换模型也在这里进行，新的模型同样预热之后才开始处理请求。
+一个进程中有多个翻译模型时，所有翻译模型都预热完成之后才就绪，每个翻译模型使用各自原文语言的语料
+"""
+import logging
+import os
+import threading
+import time
+
+from tornado.ioloop import IOLoop
+from tornado.web import RequestHandler
+
+from config import global_config
+import lib_translate
+from lib_translate.model_set import RELOADABLE_KEYS
+
+logger = logging.getLogger(__name__)
+
+# 获取当前模块有用的配置
+WARMUP_ENABLED = global_config.get("warmup_enabled", True)
+WARMUP_MAX_LINES = global_config.get("warmup_max_lines", 100)
+WARMUP_CONCURRENCY = global_config.get("warmup_concurrency", 4)
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "test", "assets")
+
+READINESS = {
+    "ready": False,
+    "status": "loading",
+    "seconds": {}
+}
+RELOAD = {}  # 每个翻译模型的替换状态
+_reload_lock = threading.Lock()
+
+
+def read_warmup_corpus(corpus, max_lines):
+    """
+    读取预热语料的前max_lines个非空行，文件不存在时返回空列表
+    """
+    if not corpus or not os.path.isfile(corpus):
+        return []
+    lines = []
+    with open(corpus, "r", encoding="utf-8") as input_file:
+        for line in input_file:
+            if len(lines) >= max_lines:
+                break
+            if line.strip():
+                lines.append(line.strip())
+    return lines
+
+
+def _warmup_lines(pipeline):
+    """
+    翻译模型的预热语料，默认为test/assets中原文语言的样例
+    """
+    if not WARMUP_ENABLED:
+        return []
+    corpus = pipeline.config.get("warmup_corpus", os.path.join(ASSETS_DIR, pipeline.src_lang))
+    lines = read_warmup_corpus(corpus, WARMUP_MAX_LINES)
+    if not lines:
+        logger.warning("warmup corpus %s of %s is empty or missing, skip warmup",
+                       corpus, pipeline.name)
+    return lines
+
+
+def _warm_up_all():
+    seconds = {}
+    for name, pipeline in lib_translate.PIPELINES.items():
+        lines = _warmup_lines(pipeline)
+        warmup_seconds = lib_translate.warmup(lines, WARMUP_CONCURRENCY, pipeline)
+        for key in ("translate_model", "warmup"):
+            logger.info("%s of %s finished in %.3fs", key, name, warmup_seconds[key])
+        logger.info("%s is warmed up with %d lines", name, len(lines))
+        if name == lib_translate.DEFAULT_NAME:
+            seconds.update(warmup_seconds)
+        else:
+            seconds[name] = warmup_seconds
+    return seconds
+
+
+async def warm_up():
+    """
+    在后台线程中加载翻译模型并预热，记录每种资源的加载耗时和从开始加载到就绪的总耗时
+    """
+    seconds = dict(lib_translate.LOAD_SECONDS)
+    for name, cost in sorted(seconds.items(), key=lambda item: -item[1]):
+        logger.info("loaded %s in %.3fs", name, cost)
+
+    READINESS["status"] = "warming_up"
+    try:
+        warmup_seconds = await IOLoop.current().run_in_executor(None, _warm_up_all)
+    except Exception:
+        READINESS["status"] = "failed"
+        logger.exception("warmup failed, the service stays unready")
+        return
+    seconds.update(warmup_seconds)
+    seconds["total"] = time.perf_counter() - lib_translate.LOAD_STARTED
+    READINESS.update(ready=True, status="ready", seconds=seconds)
+    logger.info("ready in %.3fs", seconds["total"])
+
+
+def get_reload_status(name):
+    """
+    返回翻译模型最近一次替换模型组的状态
+    """
+    return RELOAD.get(name, {"status": "idle", "config": {}, "error": None, "seconds": {}})
+
+
+def start_reload(config, pipeline):
+    """
+    在后台线程中加载并预热新的模型组，完成后替换翻译模型当前的模型组，
+    同一个翻译模型同一时间只能有一个替换任务
+    """
+    unknown = set(config) - set(RELOADABLE_KEYS)
+    if unknown:
+        raise ValueError("Unsupported keys for reloading models: {}".format(sorted(unknown)))
+    with _reload_lock:
+        if get_reload_status(pipeline.name)["status"] == "loading":
+            raise RuntimeError("Models of {} are being reloaded.".format(pipeline.name))
+        state = {"status": "loading", "config": config, "error": None, "seconds": {}}
+        RELOAD[pipeline.name] = state
+    threading.Thread(target=_reload, args=(config, pipeline, state), daemon=True).start()
+    return dict(state)
+
+
+def _reload(config, pipeline, state):
+    lines = _warmup_lines(pipeline)
+    try:
+        models, seconds = lib_translate.reload_models(config, lines, WARMUP_CONCURRENCY, pipeline)
+    except Exception as e:
+        state.update(status="failed", error=str(e))
+        logger.exception("failed to reload models of %s with %s", pipeline.name, config)
+        return
+    state.update(status="done", seconds=seconds)
+    logger.info("reloaded models of %s (generation %d) with %s in %.3fs, warmup %.3fs",
+                pipeline.name, models.generation, config, seconds["load"], seconds["warmup"])
+
+
+class ReadyHandler(RequestHandler):
+    """
+    就绪时返回200，否则返回503，body中包含当前状态和各资源的加载耗时
+    """
+
+    def get(self):
+        if not READINESS["ready"]:
+            self.set_status(503)
+        self.write(READINESS)
+
+
+__all__ = ["ReadyHandler", "warm_up", "start_reload", "get_reload_status"]
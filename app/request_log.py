@@ -0,0 +1,195 @@
+"""
+服务日志和请求日志。
+日志记录先放入有界队列，由后台线程写入文件，请求线程不再等待磁盘写入；队列满时丢弃记录并计数。
+每个请求记录一条结构化的请求日志，请求体和返回内容按log_body_sample_rate抽样记录，
+并截断到log_body_max_chars个字符，失败的请求总是记录。
+每log_slowest_interval_seconds秒记录一次这段时间内最慢的log_slowest_requests个请求的完整内容
+"""
+import atexit
+import heapq
+import itertools
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from config import global_config
+from lib_translate.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+# 获取当前模块有用的配置
+LOG_QUEUE_SIZE = global_config.get("log_queue_size", 10000)
+LOG_BODY_MAX_CHARS = global_config.get("log_body_max_chars", 1000)
+LOG_BODY_SAMPLE_RATE = global_config.get("log_body_sample_rate", 0.1)
+LOG_SLOWEST_REQUESTS = global_config.get("log_slowest_requests", 10)
+LOG_SLOWEST_INTERVAL = global_config.get("log_slowest_interval_seconds", 60)
+
+LOG_RECORDS_DROPPED = Counter("log_records_dropped_total",
+                              "Log records dropped because the log queue was full.", ["level"])
+LOG_QUEUE_DEPTH = Gauge("log_queue_depth", "Log records waiting to be written.")
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    把日志记录放入有界队列，队列满时不阻塞，直接丢弃记录
+    """
+
+    def prepare(self, record):
+        # 同一个进程中的队列不需要序列化，消息的格式化留给后台线程
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(record.levelname).inc()
+
+
+class _BlockingStopListener(QueueListener):
+
+    def stop(self):
+        # 可以先手动停止，进程退出时不再重复停止
+        if self._thread is not None:
+            super().stop()
+
+    def enqueue_sentinel(self):
+        # 队列满时等待后台线程写完，保证停止之前的记录都写入
+        self.queue.put(self._sentinel)
+
+
+def queue_logging(handlers, level=logging.INFO, max_size=LOG_QUEUE_SIZE):
+    """
+    根logger只保留一个队列handler，由后台线程把记录交给handlers和根logger原有的handler
+    （没有时与logging.basicConfig一样输出到标准错误），进程退出时写完队列中的记录。
+    返回QueueListener
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig()
+    handlers = root.handlers + list(handlers)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    log_queue = queue.Queue(max_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    listener = _BlockingStopListener(log_queue, *handlers, respect_handler_level=True)
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    LOG_QUEUE_DEPTH.set_function(log_queue.qsize)
+    listener.start()
+
+    def stop():
+        REQUEST_LOG.flush_slowest()
+        listener.stop()
+        # 之后的日志（如其他atexit中的清理）直接写入
+        root.removeHandler(queue_handler)
+        for handler in handlers:
+            root.addHandler(handler)
+    atexit.register(stop)
+    return listener
+
+
+class _LogEntry(dict):
+    """
+    结构化的日志内容，在写入时（后台线程中）才序列化为json
+    """
+
+    def __init__(self, max_chars=None, **fields):
+        super().__init__(**fields)
+        self.max_chars = max_chars
+
+    def _text(self, value):
+        truncated = False
+        if isinstance(value, bytes):
+            # 请求线程中按字节截断，utf-8中每个字符最多4个字节，截断处的字符可能不完整
+            if self.max_chars is not None and len(value) > self.max_chars * 4:
+                value, truncated = value[:self.max_chars * 4], True
+            value = value.decode("utf-8", "replace")
+        if self.max_chars is not None and len(value) > self.max_chars:
+            value, truncated = value[:self.max_chars], True
+        return value + "...(truncated)" if truncated else value
+
+    def __str__(self):
+        fields = dict(self)
+        for key in ("body", "response"):
+            if key in fields:
+                fields[key] = self._text(fields[key])
+        return json.dumps(fields, ensure_ascii=False)
+
+
+class RequestLog():
+    """
+    记录请求日志，请求线程中只做截断和抽样，不做序列化
+    >>> request_log = RequestLog(max_chars=5, sample_rate=0, slowest=1)
+    >>> print(request_log.entry("/yyq/translate", "500", 0.5, b'{"input": "hello world"}', "{}"))
+    {"uri": "/yyq/translate", "status": "500", "seconds": 0.5, "request_bytes": 24, "body": "{\\"inp...(truncated)", "response": "{}"}
+    >>> print(request_log.entry("/yyq/translate", "200", 0.1, b"{}", "{}"))
+    {"uri": "/yyq/translate", "status": "200", "seconds": 0.1, "request_bytes": 2}
+    """
+
+    def __init__(self, max_chars=LOG_BODY_MAX_CHARS, sample_rate=LOG_BODY_SAMPLE_RATE,
+                 slowest=LOG_SLOWEST_REQUESTS, interval=LOG_SLOWEST_INTERVAL):
+        self.max_chars = max_chars
+        self.sample_rate = sample_rate
+        self.slowest = slowest
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._heap = []  # 当前时间段内最慢的请求，(seconds, 序号, 请求内容)的小顶堆
+        self._counter = itertools.count()
+        self._window_start = time.monotonic()
+
+    def entry(self, uri, status, seconds, body, response=None):
+        """
+        返回一条请求日志，失败的请求和抽中的请求包含截断后的请求体和返回内容
+        """
+        entry = _LogEntry(self.max_chars, uri=uri, status=status, seconds=round(seconds, 4),
+                          request_bytes=len(body))
+        if status != "200" or random.random() < self.sample_rate:
+            entry["body"] = body[:self.max_chars * 4 + 1]
+            if response is not None:
+                entry["response"] = response[:self.max_chars + 1]
+        return entry
+
+    def log(self, uri, status, seconds, body, response=None):
+        """
+        记录一个请求，body为请求体的bytes，response为返回的json字符串，流式返回时为None
+        """
+        logger.info("请求日志：%s", self.entry(uri, status, seconds, body, response))
+        if self.slowest > 0:
+            self._track_slowest(uri, status, seconds, body, response)
+
+    def _track_slowest(self, uri, status, seconds, body, response):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._heap) < self.slowest:
+                heapq.heappush(self._heap, (seconds, next(self._counter),
+                                            (uri, status, seconds, body, response)))
+            elif seconds > self._heap[0][0]:
+                heapq.heapreplace(self._heap, (seconds, next(self._counter),
+                                               (uri, status, seconds, body, response)))
+            expired = now - self._window_start >= self.interval
+        if expired:
+            self.flush_slowest()
+
+    def flush_slowest(self):
+        """
+        按耗时从高到低记录当前时间段内最慢的请求的完整内容，并开始新的时间段
+        """
+        with self._lock:
+            heap, self._heap = self._heap, []
+            self._window_start = time.monotonic()
+        for rank, (_, _, (uri, status, seconds, body, response)) in enumerate(
+                sorted(heap, reverse=True), 1):
+            entry = _LogEntry(uri=uri, status=status, seconds=round(seconds, 4),
+                              request_bytes=len(body), rank=rank, body=body)
+            if response is not None:
+                entry["response"] = response
+            logger.info("最慢请求：%s", entry)
+
+
+REQUEST_LOG = RequestLog()
+
+__all__ = ["DroppingQueueHandler", "queue_logging", "RequestLog", "REQUEST_LOG"]
@@ -1,34 +1,126 @@
+import os
+
+from config import global_config
 from .base_handler import _BaseHandler
-from lib_translate import translate_all_in_one, add_words, delete_words, show_words
+from tornado.ioloop import IOLoop
+
+from .executor import EXECUTOR, run_steps
+from .ready_handler import start_reload, get_reload_status
+from lib_translate import (translate_steps, translate_batch_steps, translate_stream_steps,
+                           translation_cache, get_postprocess_timing, get_pipeline)
+
+# 获取当前模块有用的配置
+TERM_IMPORT_DIR = global_config.get("term_import_dir", "mount")
+
+SHOW_WORDS_LIMIT = 100  # show_words每页默认的词数
+SHOW_WORDS_MAX_LIMIT = 1000
+
+
+def _import_path(file_name):
+    """
+    import_words只能读取term_import_dir目录中的词表
+    """
+    import_dir = os.path.realpath(TERM_IMPORT_DIR)
+    path = os.path.realpath(os.path.join(import_dir, file_name))
+    if os.path.commonpath([import_dir, path]) != import_dir:
+        raise ValueError("File {} is not in {}.".format(file_name, TERM_IMPORT_DIR))
+    return path
 
 
 class TranslateHandler(_BaseHandler):
+    """
+    /yyq/translate使用默认的翻译模型，/{who}/translate/{domain}/{src}/{tgt}使用
+    名为{who}_translate_{domain}_{src}_{tgt}的翻译模型，词典和模型的管理方法也作用于这个翻译模型
+    """
+
     def _get_result_dict(self, **kwargs):
+        name = None
+        if self.path_args:
+            name = "{}_translate_{}_{}_{}".format(*self.path_args)
+        self.pipeline = get_pipeline(name)
         method = kwargs["method"]
         func = getattr(self, "_handle_{}".format(method))
         data = kwargs.get("data", None)
         return func(data)
 
-    def _handle_translate(self, data):
+    async def _handle_translate(self, data):
         """处理translate方法的请求"""
         text = data["input"]
-        translation = translate_all_in_one(text)
+        translation = await run_steps(translate_steps(text, self.pipeline))
         return {
             "translation": translation
         }
 
+    async def _handle_translate_batch(self, data):
+        """处理translate_batch方法的请求，单条输入翻译失败时不影响其他输入"""
+        translations = []
+        for item in await run_steps(translate_batch_steps(data["inputs"], self.pipeline)):
+            if isinstance(item, Exception):
+                translations.append({"status": "500", "msg": str(item)})
+            else:
+                translations.append({"status": "200", "translation": item})
+        return {
+            "translations": translations
+        }
+
+    async def _handle_translate_stream(self, data):
+        """处理translate_stream方法的请求，逐句返回译文"""
+        text = data["input"]
+        sentences = translate_stream_steps(text, self.pipeline)
+        loop = IOLoop.current()
+        index = 0
+        while True:
+            steps = await loop.run_in_executor(EXECUTOR, next, sentences, None)
+            if steps is None:
+                break
+            yield {
+                "index": index,
+                "translation": await run_steps(steps)
+            }
+            index += 1
+
     def _handle_add_words(self, data):
         """处理add_words方法的请求"""
-        add_words(data["words"])
+        self.pipeline.term_dict.add_words(data["words"])
 
     def _handle_delete_words(self, data):
         """处理delete_words方法的请求"""
-        delete_words(data["words"])
+        self.pipeline.term_dict.delete_words(data["words"])
+
+    def _handle_import_words(self, data):
+        """处理import_words方法的请求，从term_import_dir目录中的词表文件批量导入词语"""
+        return self.pipeline.term_dict.import_words(_import_path(data["file"]))
+
+    def _handle_export_words(self, _):
+        """处理export_words方法的请求，逐块返回词典中的词"""
+        for words in self.pipeline.term_dict.iter_words():
+            yield {
+                "words": words
+            }
+
+    def _handle_show_words(self, data):
+        """处理show_words方法的请求，按原文的字典序分页返回词典中以prefix开头的词"""
+        data = data or {}
+        limit = int(data.get("limit", SHOW_WORDS_LIMIT))
+        if not 0 < limit <= SHOW_WORDS_MAX_LIMIT:
+            raise ValueError("limit should be between 1 and {}.".format(SHOW_WORDS_MAX_LIMIT))
+        return self.pipeline.term_dict.page_words(
+            data.get("prefix", ""), data.get("cursor"), limit)
+
+    def _handle_status(self, _):
+        """处理status方法的请求，返回服务当前的负载情况"""
+        return {
+            "executor": EXECUTOR.status(),
+            "cache": translation_cache.stats() if translation_cache else None,
+            "postprocess": get_postprocess_timing(),
+            "models": self.pipeline.models.status(),
+            "reload": get_reload_status(self.pipeline.name)
+        }
 
-    def _handle_show_words(self, _):
-        """处理show_words方法的请求"""
+    def _handle_reload_models(self, data):
+        """处理reload_models方法的请求，在后台加载新的模型，预热完成后替换当前的模型"""
         return {
-            "words": show_words()
+            "reload": start_reload((data or {}).get("config", {}), self.pipeline)
         }
 
 
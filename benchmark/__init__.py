@@ -0,0 +1,3 @@
+"""
+性能测试脚本
+"""
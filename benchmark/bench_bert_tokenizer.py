@@ -0,0 +1,56 @@
+"""
+对比BasicTokenizer和FastBasicTokenizer在test/assets语料上每秒处理的字符数
+python benchmark/bench_bert_tokenizer.py --repeat 50
+"""
+import argparse
+import os
+import time
+
+from lib_translate.bert_tokenizer import BasicTokenizer, FastBasicTokenizer
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "test", "assets")
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--langs", nargs="+", default=["zh", "en"], help="测试的语言")
+    parser.add_argument("--repeat", type=int, default=50, help="重复次数")
+    args = parser.parse_args()
+    return args
+
+
+def bench(tokenizer, lines, repeat):
+    """
+    返回每秒处理的字符数
+    """
+    tokenizer.tokenize("warmup")
+    n_chars = sum(len(line) for line in lines)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            tokenizer.tokenize(line)
+    return n_chars * repeat / (time.perf_counter() - start)
+
+
+def main():
+    """
+    测试入口函数
+    """
+    args = parse_args()
+    print("{:>4} {:>20} {:>10} {:>14}".format("lang", "tokenizer", "lower", "chars/s"))
+    for lang in args.langs:
+        with open(os.path.join(ASSETS_DIR, lang), "r", encoding="utf-8") as input_file:
+            lines = [line.strip() for line in input_file]
+        for do_lower_case in (False, True):
+            for tokenizer_cls in (BasicTokenizer, FastBasicTokenizer):
+                speed = bench(tokenizer_cls(do_lower_case=do_lower_case), lines, args.repeat)
+                print("{:>4} {:>20} {:>10} {:>14.0f}".format(
+                    lang, tokenizer_cls.__name__, str(do_lower_case), speed))
+
+
+if __name__ == "__main__":
+    main()
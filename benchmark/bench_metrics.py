@@ -0,0 +1,71 @@
+"""
+测试监控指标的开销：分别在打开和关闭指标统计的情况下翻译test/assets中的语料，对比耗时
+python benchmark/bench_metrics.py --repeat 5
+"""
+import argparse
+import os
+import time
+
+from config import global_config
+from lib_translate import translate_all_in_one, translation_cache, set_enabled, STAGE_LATENCY
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "test", "assets")
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="交替测试的轮数")
+    parser.add_argument("--observe", type=int, default=1000000, help="单独测试observe的次数")
+    args = parser.parse_args()
+    return args
+
+
+def bench_pipeline(lines, enabled):
+    """
+    返回翻译全部语料的耗时（秒）
+    """
+    set_enabled(enabled)
+    if translation_cache is not None:
+        # 不让缓存影响两次测试的结果
+        translation_cache.clear()
+    start = time.perf_counter()
+    for line in lines:
+        translate_all_in_one(line)
+    return time.perf_counter() - start
+
+
+def main():
+    """
+    测试入口函数
+    """
+    args = parse_args()
+    src_lang = global_config["translate_src_lang"]
+    with open(os.path.join(ASSETS_DIR, src_lang), "r", encoding="utf-8") as input_file:
+        lines = [line.strip() for line in input_file if line.strip()]
+
+    bench_pipeline(lines, True)
+    costs = {True: 0., False: 0.}
+    for _ in range(args.repeat):
+        for enabled in (False, True):
+            costs[enabled] += bench_pipeline(lines, enabled)
+    set_enabled(True)
+    print("pipeline without metrics: {:.3f}s".format(costs[False]))
+    print("pipeline with metrics:    {:.3f}s".format(costs[True]))
+    print("overhead:                 {:.2f}%".format(
+        (costs[True] - costs[False]) / costs[False] * 100))
+
+    latency = STAGE_LATENCY.labels("benchmark")
+    start = time.perf_counter()
+    for _ in range(args.observe):
+        with latency.time():
+            pass
+    print("cost of one timed stage:  {:.0f}ns".format(
+        (time.perf_counter() - start) / args.observe * 1e9))
+
+
+if __name__ == "__main__":
+    main()
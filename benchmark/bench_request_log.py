@@ -0,0 +1,104 @@
+"""
+测试请求日志的开销：对比在请求线程中同步把完整的请求体和返回内容写入TimedRotatingFileHandler的写法，
+和放入队列、由后台线程写入截断、抽样之后的结构化日志的写法。
+分别统计请求线程中记录日志的耗时，以及写完所有日志的耗时
+python benchmark/bench_request_log.py --requests 20000 --body_chars 20000
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from logging.handlers import TimedRotatingFileHandler
+
+from app.request_log import queue_logging, RequestLog, LOG_RECORDS_DROPPED
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000, help="请求数")
+    parser.add_argument("--body_chars", type=int, default=20000, help="请求体和返回内容的字符数")
+    parser.add_argument("--max_chars", type=int, default=1000, help="日志中请求体最多保留的字符数")
+    parser.add_argument("--sample_rate", type=float, default=0.1, help="记录请求体的比例")
+    parser.add_argument("--queue_size", type=int, default=10000, help="日志队列的长度")
+    args = parser.parse_args()
+    return args
+
+
+def file_handler(path):
+    handler = TimedRotatingFileHandler(filename=path, when="D", interval=1, backupCount=10)
+    handler.setFormatter(logging.Formatter(
+        '%(asctime)s\tFile\"%(filename)s\",line%(lineno)s\t%(levelname)s:%(message)s'))
+    return handler
+
+
+def bench_sync(path, requests, body, response):
+    """
+    原来的写法：请求线程中格式化并写入完整的请求体和返回内容
+    """
+    root = logging.getLogger()
+    handler = file_handler(path)
+    root.addHandler(handler)
+    logger = logging.getLogger("bench_sync")
+    start = time.perf_counter()
+    for _ in range(requests):
+        logger.info("收到请求：%s" % body)
+        logger.info("返回内容：%s" % response)
+    cost = time.perf_counter() - start
+    root.removeHandler(handler)
+    handler.close()
+    return cost, cost
+
+
+def bench_queue(path, requests, body, response, args):
+    """
+    请求线程中只截断和抽样，由后台线程格式化并写入
+    """
+    listener = queue_logging([file_handler(path)], max_size=args.queue_size)
+    request_log = RequestLog(max_chars=args.max_chars, sample_rate=args.sample_rate)
+    start = time.perf_counter()
+    for _ in range(requests):
+        request_log.log("/yyq/translate", "200", 0.01, body, response)
+    cost = time.perf_counter() - start
+    request_log.flush_slowest()
+    listener.stop()
+    return cost, time.perf_counter() - start
+
+
+def main():
+    """
+    测试入口函数
+    """
+    args = parse_args()
+    text = ("The quick brown fox jumps over the lazy dog. " * args.body_chars)[:args.body_chars]
+    body = json.dumps({"input": text}).encode("utf-8")
+    response = json.dumps({"status": "200", "msg": "请求成功", "data": {"translation": text}},
+                          ensure_ascii=False)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    # 不输出到标准错误，只测试写入文件
+    root.addHandler(logging.NullHandler())
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sync_cost = bench_sync(os.path.join(tmp_dir, "sync.log"), args.requests, body, response)
+        queue_cost = bench_queue(os.path.join(tmp_dir, "queue.log"), args.requests,
+                                 body, response, args)
+        sizes = [os.path.getsize(os.path.join(tmp_dir, name)) / 2 ** 20
+                 for name in ("sync.log", "queue.log")]
+    dropped = sum(child.value for _, child in LOG_RECORDS_DROPPED._items())
+
+    print("{:>8} {:>14} {:>14} {:>14} {:>10}".format(
+        "mode", "requests/s", "us/request", "written_s", "log_mb"))
+    for name, (cost, written), size in (("sync", sync_cost, sizes[0]),
+                                        ("queue", queue_cost, sizes[1])):
+        print("{:>8} {:>14.0f} {:>14.1f} {:>14.2f} {:>10.1f}".format(
+            name, args.requests / cost, cost / args.requests * 1e6, written, size))
+    print("dropped records: {}".format(dropped))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+对比内置的正则分句与nltk、pyltp在test/assets语料上的分句吞吐量，
+分别测试单句输入（主要是句长检查的耗时）和整篇输入（句长检查加分句）
+python benchmark/bench_sent_split.py --repeat 20
+"""
+import argparse
+import os
+import time
+
+from lib_translate.sentence_split import get_sent_splitter
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "test", "assets")
+METHODS = {
+    "zh": ["regex", "ltp"],
+    "en": ["regex", "nltk"]
+}
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--langs", nargs="+", default=["zh", "en"], help="测试的语言")
+    parser.add_argument("--repeat", type=int, default=20, help="重复次数")
+    args = parser.parse_args()
+    return args
+
+
+def read_corpus(lang):
+    """
+    读取测试语料，返回单句列表和由所有句子拼成的整篇文本
+    """
+    with open(os.path.join(ASSETS_DIR, lang), "r", encoding="utf-8") as input_file:
+        lines = [line.strip() for line in input_file if line.strip()]
+    return lines, ("" if lang == "zh" else " ").join(lines)
+
+
+def bench(splitter, texts, repeat):
+    """
+    返回每秒处理的字符数和分句得到的句子数
+    """
+    n_sents = sum(len(splitter(text)) for text in texts)
+    n_chars = sum(len(text) for text in texts)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            splitter(text)
+    cost = time.perf_counter() - start
+    return n_chars * repeat / cost, n_sents
+
+
+def main():
+    """
+    测试入口函数
+    """
+    args = parse_args()
+    print("{:>4} {:>8} {:>8} {:>14} {:>8}".format("lang", "method", "input", "chars/s", "sents"))
+    for lang in args.langs:
+        lines, document = read_corpus(lang)
+        for method in METHODS[lang]:
+            try:
+                splitter = get_sent_splitter(lang, method)
+                splitter(document)
+            except (ImportError, LookupError) as e:
+                # 没有安装对应的分句工具或者缺少nltk数据
+                print("{:>4} {:>8} skipped: {}".format(lang, method, e))
+                continue
+            for input_type, texts in (("line", lines), ("document", [document])):
+                speed, n_sents = bench(splitter, texts, args.repeat)
+                print("{:>4} {:>8} {:>8} {:>14.0f} {:>8}".format(
+                    lang, method, input_type, speed, n_sents))
+
+
+if __name__ == "__main__":
+    main()
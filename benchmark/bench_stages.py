@@ -0,0 +1,144 @@
+"""
+翻译流程中各个阶段的微基准测试，使用test/assets中的语料，输出每行的平均耗时和每秒处理的字符数。
+没有安装的工具（如sacremoses）会被跳过
+python benchmark/bench_stages.py --repeat 10
+"""
+import argparse
+import importlib
+import os
+import time
+
+from config import global_config
+from lib_translate.bert_tokenizer import BasicTokenizer, FastBasicTokenizer
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "test", "assets")
+SRC_LANG = global_config["translate_src_lang"]
+TGT_LANG = global_config["translate_tgt_lang"]
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10, help="重复次数")
+    parser.add_argument("--stages", nargs="+", default=None, help="只测试这些阶段")
+    args = parser.parse_args()
+    return args
+
+
+def read_corpus(lang):
+    with open(os.path.join(ASSETS_DIR, lang), "r", encoding="utf-8") as input_file:
+        return [line.strip() for line in input_file if line.strip()]
+
+
+def bert_stages():
+    tokenizers = {
+        "BasicTokenizer": BasicTokenizer(do_lower_case=False),
+        "FastBasicTokenizer": FastBasicTokenizer(do_lower_case=False)
+    }
+    lines = read_corpus(SRC_LANG)
+    for name, tokenizer in tokenizers.items():
+        yield name, tokenizer.tokenize, lines
+
+
+def term_filter_stages():
+    from lib_translate.term_filter import DFAFilter, AhoCorasickFilter
+    from lib_translate.term_protection import MAPPING, mask_term, de_mask_term
+    lines = read_corpus(SRC_LANG)
+    words = list(MAPPING.keys())
+    yield "DFAFilter", DFAFilter(words).filter, lines
+    yield "AhoCorasickFilter", AhoCorasickFilter(words).filter, lines
+    yield "mask_term", mask_term, lines
+    masked = [mask_term(line) for line in lines]
+    yield "de_mask_term", lambda item: de_mask_term(*item), masked
+
+
+def moses_stages():
+    from sacremoses import MosesTokenizer, MosesPunctNormalizer, MosesDetokenizer
+    lines = read_corpus(SRC_LANG)
+    tokenizer = MosesTokenizer(lang=SRC_LANG)
+    yield "MosesPunctNormalizer", MosesPunctNormalizer().normalize, lines
+    yield "MosesTokenizer", lambda line: tokenizer.tokenize(line, return_str=True), lines
+    detokenizer = MosesDetokenizer(lang=TGT_LANG)
+    targets = [line.split() for line in _tokenized_targets()]
+    yield "MosesDetokenizer", lambda tokens: detokenizer.detokenize(tokens, return_str=True), targets
+
+
+def sent_split_stages():
+    from lib_translate.preprocessor import processor
+    from lib_translate.sentence_split import sent_splitter
+    yield "sent_splitter", sent_splitter, [processor(line) for line in read_corpus(SRC_LANG)]
+
+
+def tokenizer_stages():
+    from lib_translate.tokenizer import tokenize, detokenize
+    lines = read_corpus(SRC_LANG)
+    yield "tokenize", lambda line: tokenize([line]), lines
+    tokens = [tokenize([line]) for line in lines]
+    yield "detokenize", detokenize, tokens
+
+
+def postprocess_stages():
+    # lib_translate中导出的postprocessor是函数，这里需要的是模块
+    module = importlib.import_module("lib_translate.postprocessor")
+    targets = _tokenized_targets()
+    for item in ("remove_whitespace", "chinesepunc", "mosesdetokenize"):
+        yield item, getattr(module, "get_{}_postprocessor".format(item))(), targets
+    yield "postprocessor", module.postprocessor, targets
+
+
+def _tokenized_targets():
+    """
+    模拟翻译模型输出的译文：中文按字分开，英文把标点分开
+    """
+    tokenizer = FastBasicTokenizer(do_lower_case=False)
+    return [" ".join(tokenizer.tokenize(line)) for line in read_corpus(TGT_LANG)]
+
+
+STAGE_GROUPS = [bert_stages, term_filter_stages, moses_stages, sent_split_stages,
+                tokenizer_stages, postprocess_stages]
+
+
+def bench(func, inputs, repeat):
+    """
+    返回每条输入的平均耗时（秒）
+    """
+    for item in inputs:
+        func(item)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in inputs:
+            func(item)
+    return (time.perf_counter() - start) / (repeat * len(inputs))
+
+
+def _n_chars(item):
+    if isinstance(item, str):
+        return len(item)
+    return sum(_n_chars(sub) for sub in item)
+
+
+def main():
+    """
+    测试入口函数
+    """
+    args = parse_args()
+    print("{:>22} {:>12} {:>14}".format("stage", "us/line", "chars/s"))
+    for group in STAGE_GROUPS:
+        try:
+            stages = list(group())
+        except ImportError as e:
+            print("{:>22} skipped: {}".format(group.__name__, e))
+            continue
+        for name, func, inputs in stages:
+            if args.stages and name not in args.stages:
+                continue
+            cost = bench(func, inputs, args.repeat)
+            n_chars = sum(_n_chars(item) for item in inputs) / len(inputs)
+            print("{:>22} {:>12.1f} {:>14.0f}".format(name, cost * 1e6, n_chars / cost))
+
+
+if __name__ == "__main__":
+    main()
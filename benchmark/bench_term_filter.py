@@ -0,0 +1,124 @@
+"""
+对比DFAFilter、AhoCorasickFilter和编译后的词典在不同词表规模下的构建和匹配性能，
+编译后的词典的构建时间为通过mmap加载的时间
+python benchmark/bench_term_filter.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+from lib_translate.term_filter import DFAFilter, AhoCorasickFilter
+from lib_translate.term_dict import (compile_term_dict, CompiledTermDict,
+                                     CompiledTermFilter, TermMapping)
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10000, 100000, 1000000], help="词表的规模")
+    parser.add_argument("--text_len", type=int, default=4096, help="每条测试文本的字符数")
+    parser.add_argument("--repeat", type=int, default=20, help="匹配的重复次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+    return args
+
+
+def random_word(rnd):
+    """
+    随机生成一个由1到3个单词组成的词语
+    """
+    return " ".join(
+        "".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(2, 8)))
+        for _ in range(rnd.randint(1, 3)))
+
+
+def random_text(rnd, keywords, text_len):
+    """
+    生成测试文本，其中大约十分之一的词语来自词表
+    """
+    pieces = []
+    length = 0
+    while length < text_len:
+        word = rnd.choice(keywords) if rnd.random() < 0.1 else random_word(rnd)
+        pieces.append(word)
+        length += len(word) + 1
+    return " ".join(pieces)[:text_len]
+
+
+def worst_case(size, text_len):
+    """
+    词表中的词有很长的公共前缀，文本又总是停在前缀上，DFAFilter需要在每个位置上走很深
+    """
+    keywords = ["a" * (i % 200 + 1) + "b" + str(i) for i in range(size)]
+    texts = ["a" * text_len]
+    return keywords, texts
+
+
+def compiled_filter_factory(tmp_dir):
+    """
+    先编译词典，返回通过mmap加载词典的构建函数
+    """
+    path = os.path.join(tmp_dir, "dict.bin")
+
+    def factory(keywords):
+        return CompiledTermFilter(TermMapping(CompiledTermDict(path)))
+
+    def prepare(keywords):
+        compile_term_dict({word: word for word in keywords}, path)
+
+    factory.__name__ = "CompiledTermFilter"
+    factory.prepare = prepare
+    return factory
+
+
+def bench(filter_cls, keywords, texts, repeat):
+    """
+    返回构建耗时和每条文本的平均匹配耗时（秒）
+    """
+    if hasattr(filter_cls, "prepare"):
+        filter_cls.prepare(keywords)
+    start = time.perf_counter()
+    term_filter = filter_cls(keywords)
+    term_filter.filter("warmup")
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            term_filter.filter(text)
+    filter_time = (time.perf_counter() - start) / (repeat * len(texts))
+    return build_time, filter_time
+
+
+def main():
+    """
+    测试入口函数
+    """
+    args = parse_args()
+    rnd = random.Random(args.seed)
+    tmp_dir = tempfile.TemporaryDirectory()
+    filter_classes = (DFAFilter, AhoCorasickFilter, compiled_filter_factory(tmp_dir.name))
+    print("{:>10} {:>8} {:>20} {:>12} {:>14}".format(
+        "terms", "text", "filter", "build(s)", "filter(ms)"))
+    for size in args.sizes:
+        keywords = [random_word(rnd) for _ in range(size)]
+        cases = [
+            ("random", keywords, [random_text(rnd, keywords, args.text_len) for _ in range(10)]),
+            ("worst", *worst_case(size, args.text_len))
+        ]
+        for text_type, case_keywords, texts in cases:
+            for filter_cls in filter_classes:
+                build_time, filter_time = bench(filter_cls, case_keywords, texts, args.repeat)
+                print("{:>10} {:>8} {:>20} {:>12.2f} {:>14.3f}".format(
+                    size, text_type, filter_cls.__name__, build_time, filter_time * 1000))
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
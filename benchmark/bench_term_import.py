@@ -0,0 +1,80 @@
+"""
+测试批量导入和导出词表的耗时：生成--words个词的csv词表，对比一次add_words全部添加和import_words分块导入，
+再用export_words导出为csv
+python benchmark/bench_term_import.py --words 1000000
+"""
+import argparse
+import csv
+import os
+import random
+import resource
+import string
+import tempfile
+import time
+
+from lib_translate.term_protection import TermDictionary
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=1000000, help="词表中的词数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+    return args
+
+
+def write_csv(path, rnd, count):
+    with open(path, "w", encoding="utf-8", newline="") as term_file:
+        writer = csv.writer(term_file)
+        writer.writerow(["en", "zh"])
+        for i in range(count):
+            src = "".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(3, 10)))
+            writer.writerow(["{} {}".format(src, i), "译{}".format(i)])
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    """
+    测试入口函数
+    """
+    args = parse_args()
+    rnd = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        term_file = os.path.join(tmp_dir, "terms.csv")
+        write_csv(term_file, rnd, args.words)
+        results = []
+
+        dictionary = TermDictionary("en", "zh", os.path.join(tmp_dir, "import.db"))
+        start = time.perf_counter()
+        dictionary.import_words(term_file)
+        results.append(("import_words", time.perf_counter() - start, max_rss_mb()))
+        assert len(dictionary.mapping) == args.words
+
+        start = time.perf_counter()
+        exported = dictionary.export_words(os.path.join(tmp_dir, "export.csv"))
+        results.append(("export_words", time.perf_counter() - start, max_rss_mb()))
+        assert exported == args.words
+
+        # 原来的写法：整个词表放在一个add_words请求中，term filter在第一次匹配时构建
+        dictionary = TermDictionary("en", "zh", os.path.join(tmp_dir, "add.db"))
+        start = time.perf_counter()
+        with open(term_file, "r", encoding="utf-8", newline="") as csv_file:
+            dictionary.add_words(list(csv.reader(csv_file))[1:])
+        dictionary.writer.flush()
+        dictionary.term_filter.filter("")
+        results.append(("add_words", time.perf_counter() - start, max_rss_mb()))
+
+    print("{:>14} {:>14} {:>10} {:>14}".format("mode", "words/s", "seconds", "max_rss_mb"))
+    for name, cost, rss in results:
+        print("{:>14} {:>14.0f} {:>10.2f} {:>14.0f}".format(name, args.words / cost, cost, rss))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+测试add_words的吞吐量：每次请求添加--words个词，对比逐词merge并同步commit的写法和
+先更新内存、再由后台线程合并写入的写法。后者分别统计请求返回的耗时和写入sqlite完成的耗时
+python benchmark/bench_term_store.py --words 10000 --requests 5
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+
+from lib_translate.term_protection import TermDictionary
+from lib_translate.term_filter import _transform_word
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, default=10000, help="每次请求添加的词数")
+    parser.add_argument("--requests", type=int, default=5, help="请求次数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+    return args
+
+
+def random_words(rnd, count):
+    words = []
+    for _ in range(count):
+        src = " ".join("".join(rnd.choice(string.ascii_lowercase) for _ in range(rnd.randint(2, 8)))
+                       for _ in range(rnd.randint(1, 3)))
+        words.append([src, "译" + src])
+    return words
+
+
+def sync_add_words(dictionary, words):
+    """
+    原来的写法：在请求线程中逐词merge，最后同步commit
+    """
+    session = dictionary.session()
+    with dictionary.lock:
+        for src_word, tgt_word in words:
+            session.merge(dictionary.vocab(src_word=src_word, tgt_word=tgt_word))
+            dictionary.mapping[_transform_word(src_word)] = tgt_word
+            dictionary.term_filter.add(src_word)
+        dictionary.version += 1
+        session.commit()
+    dictionary.session.remove()
+
+
+def count_rows(dictionary):
+    count = dictionary.session.query(dictionary.vocab).count()
+    dictionary.session.remove()
+    return count
+
+
+def main():
+    """
+    测试入口函数
+    """
+    args = parse_args()
+    rnd = random.Random(args.seed)
+    payloads = [random_words(rnd, args.words) for _ in range(args.requests)]
+    total_words = args.words * args.requests
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sync_dict = TermDictionary("en", "zh", os.path.join(tmp_dir, "sync.db"))
+        start = time.perf_counter()
+        for words in payloads:
+            sync_add_words(sync_dict, words)
+        sync_cost = time.perf_counter() - start
+        assert count_rows(sync_dict) == len({src for words in payloads for src, _ in words})
+
+        dictionary = TermDictionary("en", "zh", os.path.join(tmp_dir, "write_behind.db"))
+        start = time.perf_counter()
+        for words in payloads:
+            dictionary.add_words(words)
+        return_cost = time.perf_counter() - start
+        dictionary.writer.flush()
+        persist_cost = time.perf_counter() - start
+        assert count_rows(dictionary) == count_rows(sync_dict)
+
+    print("{:>14} {:>14} {:>14}".format("mode", "words/s", "ms/request"))
+    for name, cost in (("sync", sync_cost), ("write_behind", return_cost),
+                       ("persisted", persist_cost)):
+        print("{:>14} {:>14.0f} {:>14.1f}".format(
+            name, total_words / cost, cost / args.requests * 1000))
+
+
+if __name__ == "__main__":
+    main()
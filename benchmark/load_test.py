@@ -0,0 +1,129 @@
+"""
+端到端的开环压力测试：按照固定的到达率发送请求，不等待前面的请求返回，
+同时在途的请求数不超过concurrency，超出的请求在客户端排队。
+延迟从请求计划发送的时间开始计算，包括在客户端排队的时间，输出p50/p95/p99和每秒完成的请求数。
+不需要模型文件时可以把配置中的translate_method和tok_method设置为stub
+python benchmark/load_test.py --url http://127.0.0.1:80/yyq/translate --rate 50 --concurrency 32
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.ioloop import IOLoop
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "test", "assets")
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:80/yyq/translate", help="翻译服务的地址")
+    parser.add_argument("--lang", default="en", help="使用test/assets中哪种语言的语料")
+    parser.add_argument("--method", default="translate", choices=["translate", "translate_batch"],
+                        help="请求的方法")
+    parser.add_argument("--batch_size", type=int, default=8, help="translate_batch每次请求的输入条数")
+    parser.add_argument("--rate", type=float, default=20, help="每秒发送的请求数")
+    parser.add_argument("--requests", type=int, default=500, help="发送的请求总数")
+    parser.add_argument("--concurrency", type=int, default=64, help="同时在途的最大请求数")
+    parser.add_argument("--poisson", action="store_true", help="请求间隔服从指数分布，默认为等间隔")
+    parser.add_argument("--timeout", type=float, default=60, help="单个请求的超时时间（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+    return args
+
+
+def percentile(sorted_values, percent):
+    """
+    最近秩法计算百分位数
+    >>> percentile([1, 2, 3, 4], 50)
+    2
+    >>> percentile([1, 2, 3, 4], 99)
+    4
+    """
+    if not sorted_values:
+        return float("nan")
+    rank = max(math.ceil(len(sorted_values) * percent / 100), 1)
+    return sorted_values[rank - 1]
+
+
+def build_bodies(args, rnd):
+    """
+    生成每个请求的body
+    """
+    with open(os.path.join(ASSETS_DIR, args.lang), "r", encoding="utf-8") as input_file:
+        lines = [line.strip() for line in input_file if line.strip()]
+    bodies = []
+    for _ in range(args.requests):
+        if args.method == "translate":
+            data = {"input": rnd.choice(lines)}
+        else:
+            data = {"inputs": [rnd.choice(lines) for _ in range(args.batch_size)]}
+        bodies.append(json.dumps({"method": args.method, "data": data}, ensure_ascii=False))
+    return bodies
+
+
+async def run(args):
+    rnd = random.Random(args.seed)
+    bodies = build_bodies(args, rnd)
+    # 超过max_clients的请求在客户端排队
+    client = AsyncHTTPClient(force_instance=True, max_clients=args.concurrency)
+    latencies = []
+    errors = []
+
+    async def send(body, scheduled):
+        request = HTTPRequest(args.url, method="POST", body=body,
+                              request_timeout=args.timeout, connect_timeout=args.timeout)
+        try:
+            response = await client.fetch(request, raise_error=False)
+            status = response.code
+            if status == 200:
+                status = json.loads(response.body.decode("utf-8").splitlines()[-1])["status"]
+        except Exception as e:
+            status = type(e).__name__
+        if str(status) == "200":
+            latencies.append(time.perf_counter() - scheduled)
+        else:
+            errors.append(status)
+
+    start = time.perf_counter()
+    scheduled = start
+    for body in bodies:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await gen.sleep(delay)
+        IOLoop.current().spawn_callback(send, body, scheduled)
+        scheduled += rnd.expovariate(args.rate) if args.poisson else 1 / args.rate
+    while len(latencies) + len(errors) < len(bodies):
+        await gen.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    client.close()
+    return latencies, errors, elapsed
+
+
+def main():
+    """
+    测试入口函数
+    """
+    args = parse_args()
+    latencies, errors, elapsed = IOLoop.current().run_sync(lambda: run(args))
+    latencies.sort()
+    print("requests: {}, ok: {}, errors: {}".format(
+        len(latencies) + len(errors), len(latencies), len(errors)))
+    if errors:
+        print("error status: {}".format(sorted(set(map(str, errors)))))
+    print("offered rate: {:.1f} req/s, throughput: {:.1f} req/s".format(
+        args.rate, len(latencies) / elapsed))
+    print("latency p50: {:.1f}ms, p95: {:.1f}ms, p99: {:.1f}ms, max: {:.1f}ms".format(
+        *(percentile(latencies, p) * 1000 for p in (50, 95, 99, 100))))
+
+
+if __name__ == "__main__":
+    main()
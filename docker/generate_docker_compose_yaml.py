@@ -7,7 +7,7 @@ import yaml
 
 
 DOCKER_COMPOSE_TEMPLATE = """
-version: '3'
+version: '3.4'
 services:
   nginx:
     image: nginx:stable
@@ -44,6 +44,13 @@ CONTAINER_CONFIG_TEMPLATE = """
       - "backend"
     volumes:
       - "{folder}/{name}:/root/translate_server_py/mount"
+    healthcheck:
+      # 模型加载和预热完成之前/ready返回503
+      test: ["CMD", "python", "-c", "import urllib.request; urllib.request.urlopen('http://127.0.0.1:80/ready')"]
+      interval: 10s
+      timeout: 5s
+      retries: 3
+      start_period: 120s
 
 """
 
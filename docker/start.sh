@@ -14,7 +14,10 @@ python docker/generate_nginx_conf.py ${FOLDER}
 cd ${FOLDER}
 docker-compose up -d
 echo "Waiting for containers ready."
-sleep 10s
+# 等待所有翻译服务的容器通过基于/ready的健康检查
+while docker-compose ps | grep -q "health: starting"; do
+  sleep 5s
+done
 
 # test for deployment
 cd ${SOURCE_ROOT}
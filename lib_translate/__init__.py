@@ -1,28 +1,282 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+LOAD_STARTED = time.perf_counter()
+
+# 所有模块都在当前线程中导入，各模块的模型和词典由下面的加载函数加载。
+# 加载函数相互独立，在线程池中并行执行，ctranslate2、SentencePiece等模型的加载过程会释放GIL。
+# 加载函数中不能再导入lib_translate的模块：当前线程持有lib_translate的导入锁，会死锁
+from . import translator, tokenizer, preprocessor, sentence_split, term_protection, postprocessor
+
+_LOADERS = {
+    "translator": translator.load_default_translator,
+    "tokenizer": tokenizer.load_default_tokenizer,
+    "preprocessor": preprocessor.load_default_preprocessor,
+    "sentence_split": sentence_split.load_default_sent_splitter,
+    "term_protection": term_protection.load_default_dictionary,
+    "postprocessor": postprocessor.load_default_postprocessor
+}
+LOAD_SECONDS = {}  # 每种资源的加载耗时（秒）
+
+
+def _load(name):
+    start = time.perf_counter()
+    _LOADERS[name]()
+    LOAD_SECONDS[name] = time.perf_counter() - start
+
+
+with ThreadPoolExecutor(max_workers=len(_LOADERS)) as _executor:
+    list(_executor.map(_load, _LOADERS))
+
+from .metrics import *
 from .tokenizer import *
 from .translator import *
+from .batch_scheduler import *
 from .preprocessor import *
 from .postprocessor import *
 from .sentence_split import *
 from .term_protection import *
+from .cache import *
+from .model_set import *
+from .pipeline import *
 
 
-def translate_all_in_one(text):
-    text, term = mask_term(text)
+def _prepare(text, pipeline, models):
+    """
+    对单条输入进行术语保护、预处理和分句
+    """
+    with MASK_TERM_LATENCY.time():
+        text, term = pipeline.term_dict.mask_term(text)
+    with PREPROCESS_LATENCY.time():
+        text = models.processor(text)
+    with SENT_SPLIT_LATENCY.time():
+        sents = pipeline.sent_splitter(text)
+    return sents, term
 
-    exe_funcs = [
-        processor,
-        sent_splitter,
-        tokenize,
-        translate,
-        detokenize,
-        sent_joiner,
-        postprocessor
-    ]
-    output = text
-    for func in exe_funcs:
-        output = func(output)
 
-    if term:
-        output = de_mask_term(output, term)
+MASK_TERM_LATENCY = STAGE_LATENCY.labels("mask_term")
+PREPROCESS_LATENCY = STAGE_LATENCY.labels("preprocess")
+SENT_SPLIT_LATENCY = STAGE_LATENCY.labels("sent_split")
+TOKENIZE_LATENCY = STAGE_LATENCY.labels("tokenize")
+BATCH_TRANSLATE_LATENCY = STAGE_LATENCY.labels("batch_translate")
+DETOKENIZE_LATENCY = STAGE_LATENCY.labels("detokenize")
+SENT_JOIN_LATENCY = STAGE_LATENCY.labels("sent_join")
+POSTPROCESS_LATENCY = STAGE_LATENCY.labels("postprocess")
+DE_MASK_TERM_LATENCY = STAGE_LATENCY.labels("de_mask_term")
+
+
+def _translate_uncached(sents, pipeline, models):
+    """
+    分词、翻译和去分词，batch_translate的耗时包括在调度器中排队等待的时间
+    """
+    with TOKENIZE_LATENCY.time():
+        tokens = models.tokenize(sents)
+    with BATCH_TRANSLATE_LATENCY.time():
+        tokens = yield pipeline.batch_translate.submit(tokens, models.translate)
+    with DETOKENIZE_LATENCY.time():
+        return models.detokenize(tokens)
 
+
+def _translate_sents(sents, pipeline, models):
+    """
+    翻译分句后的句子并去分词，命中缓存的句子不再重复翻译
+    """
+    SENTENCES.inc(len(sents))
+    if translation_cache is None:
+        return (yield from _translate_uncached(sents, pipeline, models))
+
+    # 不同的翻译模型不共用缓存，替换模型组或者修改词典之后旧的缓存不再被命中
+    version = (pipeline.name, models.generation, pipeline.term_dict.get_version())
+    outputs = [translation_cache.get(version, sent) for sent in sents]
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    if missing:
+        missing_sents = [sents[i] for i in missing]
+        translations = yield from _translate_uncached(missing_sents, pipeline, models)
+        for i, sent, translation in zip(missing, missing_sents, translations):
+            outputs[i] = translation
+            translation_cache.put(version, sent, translation)
+    return outputs
+
+
+def _finish(sents, term, pipeline):
+    """
+    对单条输入的翻译结果进行合并句子、后处理和术语还原
+    """
+    with SENT_JOIN_LATENCY.time():
+        output = sent_joiner(sents)
+    with POSTPROCESS_LATENCY.time():
+        output = pipeline.postprocessor(output)
+    if term:
+        with DE_MASK_TERM_LATENCY.time():
+            output = pipeline.term_dict.de_mask_term(output, term)
     return output
+
+
+def advance_steps(steps, value=None, error=None):
+    """
+    执行steps直到它交出下一个等待翻译的Future，value或error为上一个Future的结果。
+    返回(False, Future)，steps执行完时返回(True, 翻译结果)
+    """
+    try:
+        if error is not None:
+            return False, steps.throw(error)
+        return False, steps.send(value)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+def run_steps(steps):
+    """
+    在当前线程中执行steps，等待翻译时阻塞当前线程，返回翻译结果
+    >>> from concurrent.futures import Future
+    >>> def steps(future):
+    ...     return (yield future) + 1
+    >>> future = Future()
+    >>> future.set_result(1)
+    >>> run_steps(steps(future))
+    2
+    """
+    value, error = None, None
+    while True:
+        done, result = advance_steps(steps, value, error)
+        if done:
+            return result
+        try:
+            value, error = result.result(), None
+        except Exception as e:
+            value, error = None, e
+
+
+def translate_steps(text, pipeline=None, models=None):
+    """
+    分步翻译单条输入：生成器在需要等待调度器翻译时交出Future，其余步骤都是计算，
+    由advance_steps执行。调用方可以在等待Future期间不占用线程，合并翻译的请求数不受线程数的限制
+    """
+    pipeline = pipeline or get_pipeline()
+    models = models or pipeline.models
+    sents, term = _prepare(text, pipeline, models)
+    outputs = yield from _translate_sents(sents, pipeline, models)
+    return _finish(outputs, term, pipeline)
+
+
+def translate_all_in_one(text, pipeline=None, models=None):
+    """
+    翻译单条输入，pipeline为None时使用默认的翻译模型，models为None时使用翻译模型当前的模型组
+    """
+    return run_steps(translate_steps(text, pipeline, models))
+
+
+def translate_batch_steps(texts, pipeline=None, models=None):
+    """
+    分步翻译多条输入，见translate_steps和translate_batch_all_in_one
+    """
+    pipeline = pipeline or get_pipeline()
+    models = models or pipeline.models
+    results = [None] * len(texts)
+    prepared = []  # (输入下标, 分句结果, term)
+    for i, text in enumerate(texts):
+        try:
+            sents, term = _prepare(text, pipeline, models)
+            prepared.append((i, sents, term))
+        except Exception as e:
+            results[i] = e
+
+    all_sents = [sent for _, sents, _ in prepared for sent in sents]
+    try:
+        all_outputs = yield from _translate_sents(all_sents, pipeline, models)
+    except Exception:
+        # 合并解码失败时逐条解码，找出出错的输入
+        all_outputs = None
+
+    start = 0
+    for i, sents, term in prepared:
+        end = start + len(sents)
+        try:
+            if all_outputs is None:
+                outputs = yield from _translate_sents(sents, pipeline, models)
+            else:
+                outputs = all_outputs[start:end]
+            results[i] = _finish(outputs, term, pipeline)
+        except Exception as e:
+            results[i] = e
+        start = end
+    return results
+
+
+def translate_batch_all_in_one(texts, pipeline=None, models=None):
+    """
+    一次翻译多条输入，所有输入的句子合并到一起进行解码。
+    返回与输入顺序一致的列表，翻译失败的输入在对应位置上是异常对象，不影响其他输入。
+    """
+    return run_steps(translate_batch_steps(texts, pipeline, models))
+
+
+def translate_stream_steps(text, pipeline=None, models=None):
+    """
+    分句之后逐句返回每一句的分步翻译，见translate_steps和translate_stream_all_in_one
+    """
+    pipeline = pipeline or get_pipeline()
+    models = models or pipeline.models
+    sents, term = _prepare(text, pipeline, models)
+    for sent in sents:
+        yield _sentence_steps(sent, term, pipeline, models)
+
+
+def _sentence_steps(sent, term, pipeline, models):
+    outputs = yield from _translate_sents([sent], pipeline, models)
+    return _finish(outputs, term, pipeline)
+
+
+def translate_stream_all_in_one(text, pipeline=None, models=None):
+    """
+    逐句翻译，每翻译完一句就返回这一句的译文，后处理和术语还原也按句进行，
+    中途替换模型组时仍然使用开始时的模型组。
+    translate_all_in_one先用sent_joiner合并所有句子再做后处理，
+    所以拼接逐句的译文不一定与完整的翻译结果相同
+    """
+    for steps in translate_stream_steps(text, pipeline, models):
+        yield run_steps(steps)
+
+
+def warmup(lines, concurrency=1, pipeline=None, models=None):
+    """
+    用lines走一遍完整的翻译流程，提前完成翻译模型的加载、线程池和内存的初始化。
+    concurrency大于1时并发地翻译，使调度器合并出与线上相近的batch。
+    预热的译文不保留在缓存中，返回翻译模型加载和预热的耗时（秒）
+    """
+    pipeline = pipeline or get_pipeline()
+    models = models or pipeline.models
+    seconds = {}
+    start = time.perf_counter()
+    models.get_translator()
+    seconds["translate_model"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if lines:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(partial(translate_all_in_one, pipeline=pipeline, models=models),
+                              lines))
+        translate_batch_all_in_one(lines, pipeline, models)
+    seconds["warmup"] = time.perf_counter() - start
+    if translation_cache is not None:
+        translation_cache.clear((pipeline.name, models.generation))
+    return seconds
+
+
+def reload_models(config, lines=(), concurrency=1, pipeline=None):
+    """
+    在当前线程中按照config加载新的模型组，用lines预热之后替换翻译模型当前的模型组。
+    正在处理的请求仍然使用旧的模型组，返回新的模型组和加载、预热的耗时（秒）
+    """
+    pipeline = pipeline or get_pipeline()
+    start = time.perf_counter()
+    models = pipeline.load_models(config)
+    seconds = {"load": time.perf_counter() - start}
+    seconds.update(warmup(lines, concurrency, pipeline, models))
+    old = pipeline.models
+    pipeline.swap_models(models)
+    if translation_cache is not None:
+        # 旧模型组的缓存不会再被命中，其他翻译模型的缓存不受影响
+        translation_cache.clear((pipeline.name, old.generation))
+    return models, seconds
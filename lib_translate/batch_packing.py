@@ -0,0 +1,102 @@
+"""
+按token预算对句子进行分组后再解码：先把子词数超过上限的句子切开，
+再按子词数排序，每组的token数（按组内最长句子补齐计算）不超过预算，解码后恢复原来的顺序。
+method: get_packed_translate
+input type: Callable[[List[List[str]]], List[List[str]]]
+output type: Callable[[List[List[str]]], List[List[str]]]
+"""
+from config import global_config
+
+# 获取当前模块有用的配置
+batch_max_tokens = global_config.get("batch_max_tokens", 0)
+max_sent_tokens = global_config.get("max_sent_tokens", 0)
+
+# 以这些符号结尾的子词后面适合切分长句
+SPLIT_PUNCTUATION = tuple(",;:，；：、")
+WORD_START = "▁"
+
+
+def split_tokens(tokens, max_tokens):
+    """
+    把子词数超过max_tokens的句子切成多段，优先在后半段的标点后切分，
+    其次在词的边界切分，都找不到时直接按长度切分
+    >>> split_tokens(["▁a", "▁b", ",", "▁c", "d", "▁e"], 4)
+    [['▁a', '▁b', ','], ['▁c', 'd', '▁e']]
+    >>> split_tokens(["▁a", "▁b", "c", "d", "▁e"], 3)
+    [['▁a'], ['▁b', 'c', 'd'], ['▁e']]
+    """
+    if not max_tokens or len(tokens) <= max_tokens:
+        return [tokens]
+    chunks = []
+    start = 0
+    while len(tokens) - start > max_tokens:
+        end = start + max_tokens
+        lower = start + max_tokens // 2
+        cut = next((i + 1 for i in range(end - 1, lower - 1, -1)
+                    if tokens[i].endswith(SPLIT_PUNCTUATION)), None)
+        if cut is None:
+            cut = next((i for i in range(end, start, -1)
+                        if tokens[i].startswith(WORD_START)), end)
+        chunks.append(tokens[start: cut])
+        start = cut
+    chunks.append(tokens[start:])
+    return chunks
+
+
+def pack_batches(lengths, max_tokens, max_batch_size=0):
+    """
+    按长度排序后分组，返回每组句子的下标。每组补齐后的token数不超过max_tokens，
+    单句超过预算时单独成组
+    >>> pack_batches([3, 150, 4, 120, 5], max_tokens=300)
+    [[0, 2, 4], [3, 1]]
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches = []
+    batch = []
+    for index in order:
+        # 排过序，当前句子就是组内最长的句子
+        padded = lengths[index] * (len(batch) + 1)
+        if batch and (padded > max_tokens or len(batch) == max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def get_packed_translate(translate_func, max_tokens=0, max_sent_tokens=0, max_batch_size=0):
+    """
+    在translate_func外面加上长句切分和按token预算分组，返回结果的顺序与输入一致
+    >>> packed = get_packed_translate(lambda batch: [s[::-1] for s in batch], max_tokens=4, max_sent_tokens=2)
+    >>> packed([["▁a", "▁b", "▁c"], ["▁d"]])
+    [['▁b', '▁a', '▁c'], ['▁d']]
+    """
+    if not max_tokens and not max_sent_tokens:
+        return translate_func
+
+    def packed_translate(tokens):
+        chunks = []
+        owners = []  # 每一段属于哪个句子
+        for i, sent in enumerate(tokens):
+            for chunk in split_tokens(sent, max_sent_tokens):
+                chunks.append(chunk)
+                owners.append(i)
+
+        if max_tokens:
+            batches = pack_batches([len(chunk) for chunk in chunks], max_tokens, max_batch_size)
+        else:
+            batches = [list(range(len(chunks)))]
+        chunk_outputs = [None] * len(chunks)
+        for batch in batches:
+            for index, output in zip(batch, translate_func([chunks[i] for i in batch])):
+                chunk_outputs[index] = output
+
+        outputs = [[] for _ in tokens]
+        for owner, output in zip(owners, chunk_outputs):
+            outputs[owner].extend(output)
+        return outputs
+    return packed_translate
+
+
+__all__ = ["get_packed_translate"]
@@ -0,0 +1,191 @@
+"""
+跨请求的动态批处理调度器，把并发请求中的句子合并成一个batch后统一调用翻译模型
+method: batch_translate
+input type: List[List[str]]
+output type: List[List[str]]
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import global_config
+from .translator import translate
+from .batch_packing import get_packed_translate, batch_max_tokens, max_sent_tokens
+from .metrics import Gauge
+
+# 获取当前模块有用的配置
+batch_max_size = global_config.get("batch_max_size", 0)
+batch_max_wait = global_config.get("batch_max_wait_ms", 5) / 1000
+
+
+class _Request():
+    """
+    调度器中等待翻译的一个请求，translate_func是请求所用的那一组模型的翻译方法
+    """
+    __slots__ = ("tokens", "future", "translate_func")
+
+    def __init__(self, tokens, future, translate_func):
+        self.tokens = tokens
+        self.future = future
+        self.translate_func = translate_func
+
+
+class BatchScheduler():
+    """
+    动态批处理调度器。后台线程收集各个请求提交的句子，句子数达到max_batch_size
+    或者等待超过时间窗口后调用一次translate_func，再把结果分发回各个请求。
+    时间窗口根据请求的到达间隔自适应调整，负载较低时不会额外增加延迟。
+    提交时可以指定请求使用的翻译方法，只有翻译方法相同的请求才会合并到同一个batch中，
+    替换模型时已经提交的请求仍然由旧模型翻译。
+    >>> scheduler = BatchScheduler(lambda batch: [s[::-1] for s in batch], max_batch_size=8)
+    >>> scheduler.submit([["a", "b"], ["c"]]).result()
+    [['b', 'a'], ['c']]
+    >>> scheduler.submit([["a", "b"]], translate_func=lambda batch: batch).result()
+    [['a', 'b']]
+    >>> scheduler.submit([]).result()
+    []
+    """
+
+    def __init__(self, translate_func, max_batch_size=32, max_wait=0.005, smoothing=0.2):
+        self.translate_func = translate_func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.smoothing = smoothing
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._last_arrival = None
+        self._arrival_interval = None  # 请求到达间隔的指数滑动平均
+
+    def submit(self, tokens, translate_func=None):
+        """
+        提交一个请求的全部句子，返回一个Future，结果顺序与输入一致。
+        translate_func为None时使用调度器默认的翻译方法
+        """
+        future = Future()
+        if not tokens:
+            future.set_result([])
+            return future
+        self._observe_arrival()
+        self._ensure_worker()
+        self._queue.put(_Request(tokens, future, translate_func or self.translate_func))
+        return future
+
+    def wait_window(self, batch_size):
+        """
+        根据当前batch的句子数和请求到达间隔，估计还值得等待多长时间
+        """
+        interval = self._arrival_interval
+        if interval is None or interval >= self.max_wait:
+            # 负载较低，窗口内大概率等不到新的请求，直接解码
+            return 0.
+        return min(self.max_wait, interval * (self.max_batch_size - batch_size))
+
+    def _observe_arrival(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._last_arrival is not None:
+                interval = now - self._last_arrival
+                if self._arrival_interval is None:
+                    self._arrival_interval = interval
+                else:
+                    self._arrival_interval += self.smoothing * (interval - self._arrival_interval)
+            self._last_arrival = now
+
+    def _ensure_worker(self):
+        # 后台线程在第一次提交时才启动，避免在import阶段创建线程
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        pending = None
+        while True:
+            request = pending or self._queue.get()
+            pending = None
+            batch = [request]
+            size = len(request.tokens)
+            deadline = time.monotonic() + self.wait_window(size)
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    if timeout > 0:
+                        request = self._queue.get(timeout=timeout)
+                    else:
+                        # 时间窗口已过，但仍然合并已经在排队的请求
+                        request = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if (size + len(request.tokens) > self.max_batch_size
+                        or request.translate_func is not batch[0].translate_func):
+                    pending = request
+                    break
+                batch.append(request)
+                size += len(request.tokens)
+            self._process(batch)
+            # 不再引用处理完的请求，替换模型后旧的模型可以及时释放
+            batch = request = None
+
+    def _process(self, batch):
+        tokens = [sent for request in batch for sent in request.tokens]
+        try:
+            output_tokens = batch[0].translate_func(tokens)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        start = 0
+        for request in batch:
+            end = start + len(request.tokens)
+            request.future.set_result(output_tokens[start:end])
+            start = end
+
+
+# 合并后的batch再按token预算拆分，单个请求的句子很多时也不会超出预算
+packed_translate = get_packed_translate(translate, batch_max_tokens, max_sent_tokens, batch_max_size)
+
+SCHEDULER_QUEUE_DEPTH = Gauge("translate_scheduler_queue_depth",
+                              "Requests waiting in the batch scheduler.", ["model"])
+
+
+def get_batch_translate(name, max_batch_size=batch_max_size, max_wait=batch_max_wait):
+    """
+    为名为name的翻译模型创建独立的调度队列，返回batch_translate方法。
+    不同翻译模型的请求在各自的队列中合并，互不等待。
+    batch_translate.submit只提交不等待，返回Future，调用方可以在等待期间不占用线程
+    >>> func = get_batch_translate("doctest", 0)
+    >>> func([["a"]], lambda batch: batch)
+    [['a']]
+    >>> func.submit([["a"]], lambda batch: batch).result()
+    [['a']]
+    """
+    if max_batch_size <= 0:
+        def submit(tokens, translate_func=None):
+            # 不合并请求时在当前线程中直接翻译
+            future = Future()
+            try:
+                future.set_result((translate_func or packed_translate)(tokens))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+    else:
+        scheduler = BatchScheduler(packed_translate, max_batch_size, max_wait)
+        SCHEDULER_QUEUE_DEPTH.labels(name).set_function(scheduler._queue.qsize)
+        submit = scheduler.submit
+
+    def batch_translate(tokens, translate_func=None):
+        return submit(tokens, translate_func).result()
+    batch_translate.submit = submit
+    return batch_translate
+
+
+batch_translate = get_batch_translate("default")
+
+
+__all__ = ["batch_translate"]
@@ -168,6 +168,74 @@ class BasicTokenizer(object):
     return "".join(output)
 
 
+class _CharTable(dict):
+  """Lazily filled `str.translate` table, each code point is looked up once."""
+
+  # Bounds the memory used by inputs containing many distinct code points.
+  MAX_SIZE = 1 << 16
+
+  def __init__(self, convert):
+    super(_CharTable, self).__init__()
+    self._convert = convert
+
+  def __missing__(self, cp):
+    value = self._convert(cp)
+    if len(self) < self.MAX_SIZE:
+      self[cp] = value
+    return value
+
+
+class FastBasicTokenizer(BasicTokenizer):
+  """Same output as BasicTokenizer, but driven by `str.translate` tables.
+
+  Cleaning, CJK and punctuation splitting are done by a single `translate`
+  call followed by one `split`, instead of several per-character passes.
+  """
+
+  def __init__(self, do_lower_case=True):
+    """Constructs a FastBasicTokenizer.
+
+    Args:
+      do_lower_case: Whether to lower case the input.
+    """
+    super(FastBasicTokenizer, self).__init__(do_lower_case=do_lower_case)
+    if do_lower_case:
+      # Punctuation must be split after accents are stripped, since NFD may
+      # turn a non-punctuation character into punctuation.
+      self._table = _CharTable(lambda cp: self._convert_char(cp, False))
+      self._punc_table = _CharTable(self._convert_punc)
+    else:
+      self._table = _CharTable(lambda cp: self._convert_char(cp, True))
+
+  def tokenize(self, text):
+    """Tokenizes a piece of text."""
+    text = convert_to_unicode(text).translate(self._table)
+    if self.do_lower_case:
+      text = unicodedata.normalize("NFD", text.lower())
+      text = text.translate(self._punc_table)
+    return text.split()
+
+  def _convert_char(self, cp, split_punc):
+    """Returns what `cp` becomes after cleaning and CJK/punctuation spacing."""
+    char = six.unichr(cp)
+    if cp == 0 or cp == 0xfffd or _is_control(char):
+      return None
+    if _is_whitespace(char):
+      return " "
+    if self._is_chinese_char(cp) or (split_punc and _is_punctuation(char)):
+      return " " + char + " "
+    return char
+
+  def _convert_punc(self, cp):
+    """Drops accents and surrounds punctuation with spaces."""
+    char = six.unichr(cp)
+    if unicodedata.category(char) == "Mn":
+      return None
+    if _is_punctuation(char):
+      return " " + char + " "
+    return char
+
+
 def _is_whitespace(char):
   """Checks whether `chars` is a whitespace character."""
   # \t, \n, and \r are technically contorl characters but we treat them
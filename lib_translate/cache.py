@@ -0,0 +1,130 @@
+"""
+句子级别的翻译缓存，位于分句和翻译之间。
+缓存的key包含词典的版本号，词典变化后旧的缓存不会再被命中。
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from config import global_config
+
+# 获取当前模块有用的配置
+translate_cache_bytes = global_config.get("translate_cache_bytes", 0)
+translate_cache_ttl = global_config.get("translate_cache_ttl", 0)
+
+_ENTRY_OVERHEAD = 200  # 每条缓存中key元组、OrderedDict节点等的大致开销（字节）
+
+
+def _normalize(sent):
+    """
+    对句子中的空白进行规范化，作为缓存的key
+    """
+    return " ".join(sent.split())
+
+
+class TranslationCache():
+    """
+    按内存上限进行LRU淘汰的翻译缓存，可以额外设置过期时间(ttl，秒)
+    >>> cache = TranslationCache(max_bytes=4096)
+    >>> cache.get(0, "hello  world") is None
+    True
+    >>> cache.put(0, "hello world", "你好世界")
+    >>> cache.get(0, "hello  world")
+    '你好世界'
+    >>> cache.get(1, "hello world") is None
+    True
+    >>> stats = cache.stats()
+    >>> stats["hits"], stats["misses"], stats["entries"]
+    (1, 2, 1)
+    """
+
+    def __init__(self, max_bytes, ttl=0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, size, expire_time)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, version, sent):
+        """
+        查找缓存，未命中时返回None
+        """
+        key = (version, _normalize(sent))
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl and item[2] < time.monotonic():
+                self._pop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, version, sent, value):
+        """
+        写入缓存，超出内存上限时淘汰最久没有使用的数据
+        """
+        key = (version, _normalize(sent))
+        size = sys.getsizeof(key[1]) + sys.getsizeof(value) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        expire_time = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (value, size, expire_time)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self, prefix=None):
+        """
+        清空缓存，指定prefix时只删除版本号（元组）以prefix开头的缓存
+        >>> cache = TranslationCache(max_bytes=4096)
+        >>> cache.put(("a", 1), "hello", "你好")
+        >>> cache.put(("b", 1), "hello", "你好")
+        >>> cache.clear(("a",))
+        >>> cache.get(("a", 1), "hello"), cache.get(("b", 1), "hello")
+        (None, '你好')
+        """
+        with self._lock:
+            if prefix is None:
+                self._data.clear()
+                self._bytes = 0
+                return
+            for key in [key for key in self._data if key[0][:len(prefix)] == prefix]:
+                self._pop(key)
+
+    def stats(self):
+        """
+        返回缓存的命中情况和内存占用
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes
+            }
+
+    def _pop(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+
+if translate_cache_bytes > 0:
+    translation_cache = TranslationCache(translate_cache_bytes, translate_cache_ttl)
+else:
+    translation_cache = None
+
+
+__all__ = ["translation_cache"]
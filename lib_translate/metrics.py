@@ -0,0 +1,273 @@
+"""
+服务的监控指标，以Prometheus的文本格式输出
+>>> registry = Registry()
+>>> counter = Counter("demo_total", "Demo counter.", ["stage"], registry=registry)
+>>> counter.labels("a").inc(2)
+>>> print(registry.render(), end="")
+# HELP demo_total Demo counter.
+# TYPE demo_total counter
+demo_total{stage="a"} 2
+"""
+import bisect
+import threading
+import time
+
+from config import global_config
+
+# 获取当前模块有用的配置
+metrics_enabled = global_config.get("metrics_enabled", True)
+
+DEFAULT_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10.)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = ['{}="{}"'.format(name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Child():
+    """
+    某一组标签值对应的指标数据，所有的修改都在锁中进行
+    """
+    enabled = metrics_enabled
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+
+class _CounterChild(_Child):
+
+    def __init__(self):
+        super().__init__()
+        self.value = 0
+
+    def inc(self, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_Child):
+
+    def __init__(self):
+        super().__init__()
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """
+        输出指标时调用function获取当前值
+        """
+        self.function = function
+
+    def get(self):
+        return self.function() if self.function else self.value
+
+
+class _Timer():
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _HistogramChild(_Child):
+
+    def __init__(self, buckets):
+        super().__init__()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个是+Inf
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value):
+        if not self.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """
+        统计with语句块的耗时（秒）
+        """
+        return _Timer(self)
+
+
+class Registry():
+    """
+    指标的注册表
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self):
+        """
+        以Prometheus的文本格式输出所有指标
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append("# HELP {} {}".format(metric.name, metric.documentation))
+            lines.append("# TYPE {} {}".format(metric.name, metric.type))
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric():
+    """
+    指标的基类，每组标签值对应一个_Child，可以事先通过labels取出_Child，避免每次查找
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()
+        registry.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError("{} expects labels {}.".format(self.name, self.labelnames))
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _items(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def __getattr__(self, name):
+        # 没有标签的指标可以直接调用inc、observe等方法
+        if name.startswith("_") or self.__dict__.get("labelnames", True):
+            raise AttributeError(name)
+        return getattr(self.labels(), name)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def samples(self):
+        for values, child in self._items():
+            yield "{}{} {}".format(self.name, _format_labels(self.labelnames, values),
+                                   _format_value(child.value))
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def samples(self):
+        for values, child in self._items():
+            yield "{}{} {}".format(self.name, _format_labels(self.labelnames, values),
+                                   _format_value(child.get()))
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS,
+                 registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def samples(self):
+        for values, child in self._items():
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="{}"'.format(_format_value(float(bound)))
+                yield "{}_bucket{} {}".format(
+                    self.name, _format_labels(self.labelnames, values, le), cumulative)
+            labels = _format_labels(self.labelnames, values)
+            yield "{}_sum{} {}".format(self.name, labels, _format_value(total))
+            yield "{}_count{} {}".format(self.name, labels, count)
+
+
+def set_enabled(enabled):
+    """
+    打开或者关闭所有指标的统计，关闭后inc、observe等方法直接返回
+    """
+    _Child.enabled = enabled
+
+
+# 翻译流程中用到的指标
+STAGE_LATENCY = Histogram("translate_stage_seconds",
+                          "Latency of each stage of the translation pipeline.", ["stage"])
+SENTENCES = Counter("translate_sentences_total", "Sentences sent to translation.")
+DECODE_SENTENCES = Histogram("translate_decode_batch_sentences",
+                             "Sentences per call to the translation model.", buckets=SIZE_BUCKETS)
+DECODE_TOKENS = Counter("translate_decode_tokens_total",
+                        "Source subword tokens sent to the translation model.")
+
+
+__all__ = ["REGISTRY", "Counter", "Gauge", "Histogram", "set_enabled",
+           "STAGE_LATENCY", "SENTENCES", "DECODE_SENTENCES", "DECODE_TOKENS"]
@@ -0,0 +1,360 @@
+"""
+一起替换的一组模型：预处理器（truecase模型）、分词模型和翻译模型。
+每个请求开始时取得当前的模型组，整个请求都使用同一组模型。替换模型组时，
+已经开始的请求仍然使用旧的模型组，旧的模型组在不再被引用之后释放。
+多个翻译模型中配置相同的组件只加载一次，由这些模型共用。
+长时间没有请求的翻译模型，或者进程内存超出预算时最久没有使用的翻译模型会从内存中卸载，下一次翻译时重新加载。
+method: build_model_set
+input type: int, dict
+output type: ModelSet
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from functools import partial
+
+from config import global_config
+from . import translator as translator_module
+from .translator import load_translator, translate
+from .tokenizer import get_tokenizer, tokenize, detokenize
+from .preprocessor import get_pipeline_preprocessor, processor
+from .batch_packing import get_packed_translate, batch_max_tokens, max_sent_tokens
+from .batch_scheduler import batch_max_size
+from .metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# 获取当前模块有用的配置
+model_idle_unload_seconds = global_config.get("model_idle_unload_seconds", 0)
+model_memory_budget_mb = global_config.get("model_memory_budget_mb", 0)
+model_check_interval_seconds = global_config.get("model_check_interval_seconds", 10)
+
+# 替换模型组时可以修改的配置，以及对应的加载参数
+TRANSLATOR_ARGS = {
+    "translate_model": "model_path",
+    "translate_compute_type": "compute_type",
+    "translate_inter_threads": "inter_threads",
+    "translate_intra_threads": "intra_threads"
+}
+TOKENIZER_ARGS = {
+    "tok_src_model": "src_model",
+    "tok_tgt_model": "tgt_model"
+}
+PREPROCESSOR_ARGS = {
+    "truecase_model": "truecase_model"
+}
+RELOADABLE_KEYS = list(TRANSLATOR_ARGS) + list(TOKENIZER_ARGS) + list(PREPROCESSOR_ARGS)
+
+_SHARED = weakref.WeakValueDictionary()
+_SHARED_LOCKS = {}
+_SHARED_LOCK = threading.Lock()
+
+
+def get_shared(key, load):
+    """
+    返回key对应的组件，还没有加载时调用load加载。组件不再被任何模型组引用之后释放
+    >>> class Component(): pass
+    >>> component = get_shared(("demo", 1), Component)
+    >>> get_shared(("demo", 1), Component) is component
+    True
+    """
+    with _SHARED_LOCK:
+        lock = _SHARED_LOCKS.setdefault(key, threading.Lock())
+    # 不同的组件可以同时加载，相同的组件只加载一次
+    with lock:
+        value = _SHARED.get(key)
+        if value is None:
+            value = load()
+            _SHARED[key] = value
+    return value
+
+
+class _Tokenizer():
+    """
+    分词和去分词方法，作为一个整体共用
+    """
+    __slots__ = ("tokenize", "detokenize", "__weakref__")
+
+    def __init__(self, tokenize, detokenize):
+        self.tokenize = tokenize
+        self.detokenize = detokenize
+
+
+MODEL_LOADS = Counter("translate_model_loads_total",
+                      "Translation models loaded, including reloads after unloading.", ["model"])
+MODEL_UNLOADS = Counter("translate_model_unloads_total",
+                        "Translation models unloaded, by reason.", ["model", "reason"])
+MODEL_LOAD_LATENCY = Histogram("translate_model_load_seconds",
+                               "Time to load a translation model, the cold start of a request.",
+                               ["model"], buckets=(.1, .25, .5, 1., 2.5, 5., 10., 30., 60., 120.))
+_TRANSLATORS = weakref.WeakSet()  # 所有翻译模型，供后台线程检查是否需要卸载
+
+
+def get_rss():
+    """
+    返回当前进程的常驻内存（字节），无法读取时返回None
+    """
+    try:
+        with open("/proc/self/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+Gauge("process_resident_memory_bytes", "Resident memory of the process.").set_function(
+    lambda: get_rss() or 0)
+Gauge("translate_models_loaded", "Translation models resident in memory.").set_function(
+    lambda: sum(item.loaded for item in list(_TRANSLATORS)))
+
+
+class _LazyTranslator():
+    """
+    第一次使用时才加载的翻译模型，多进程模式下翻译模型在fork之后加载。
+    卸载之后再次使用时重新加载：ctranslate2模型使用unload_model/load_model，其他模型重新创建
+    >>> model = _LazyTranslator(lambda: "model", name="demo")
+    >>> model.loaded, model.get(), model.loaded
+    (False, 'model', True)
+    >>> model.unload("idle"), model.loaded
+    (True, False)
+    >>> with model.use() as translator:
+    ...     model.unload("idle"), translator
+    (False, 'model')
+    """
+
+    def __init__(self, load, translator=None, name=None):
+        self._load = load
+        self._lock = threading.Lock()
+        self.translator = translator
+        self.name = name or "default"
+        self.loaded = translator is not None
+        self.last_used = time.monotonic()
+        self._in_use = 0  # 正在翻译的batch数，使用中的模型不会被卸载
+        _TRANSLATORS.add(self)
+        if name:
+            weakref.finalize(self, logger.info, "translation model %s is released", name)
+
+    def get(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    start = time.perf_counter()
+                    if self.translator is None:
+                        self.translator = self._load()
+                    else:
+                        self.translator.load_model()
+                    self.loaded = True
+                    cost = time.perf_counter() - start
+                    MODEL_LOADS.labels(self.name).inc()
+                    MODEL_LOAD_LATENCY.labels(self.name).observe(cost)
+                    logger.info("translation model %s is loaded in %.3fs", self.name, cost)
+        return self.translator
+
+    @contextmanager
+    def use(self):
+        """
+        在with语句中使用翻译模型，期间模型不会被卸载
+        """
+        _ensure_monitor()
+        with self._lock:
+            self._in_use += 1
+        try:
+            yield self.get()
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self.last_used = time.monotonic()
+
+    def unload(self, reason):
+        """
+        模型没有在使用时从内存中卸载，返回是否卸载
+        """
+        with self._lock:
+            if not self.loaded or self._in_use:
+                return False
+            if hasattr(self.translator, "unload_model"):
+                self.translator.unload_model()
+            else:
+                if translator_module.translator is self.translator:
+                    translator_module.translator = None
+                self.translator = None
+            self.loaded = False
+        MODEL_UNLOADS.labels(self.name, reason).inc()
+        logger.info("translation model %s is unloaded (%s)", self.name, reason)
+        return True
+
+
+def check_models(now=None, rss=None):
+    """
+    卸载空闲超过model_idle_unload_seconds的翻译模型；进程内存超过model_memory_budget_mb时，
+    从最久没有使用的开始卸载，直到内存回到预算以内，最近使用的模型总是保留
+    """
+    now = time.monotonic() if now is None else now
+    loaded = sorted((item for item in list(_TRANSLATORS) if item.loaded),
+                    key=lambda item: item.last_used)
+    if model_idle_unload_seconds > 0:
+        for item in list(loaded):
+            if now - item.last_used >= model_idle_unload_seconds and item.unload("idle"):
+                loaded.remove(item)
+    if model_memory_budget_mb > 0:
+        budget = model_memory_budget_mb * 1024 * 1024
+        for item in loaded[:-1]:
+            rss = get_rss() if rss is None else rss
+            if rss is None or rss <= budget:
+                break
+            item.unload("memory")
+            rss = None
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def _monitor_loop():
+    while True:
+        time.sleep(model_check_interval_seconds)
+        try:
+            check_models()
+        except Exception:
+            logger.exception("failed to check idle translation models")
+
+
+def _ensure_monitor():
+    # 后台线程在第一次翻译时才启动，多进程模式下每个worker在fork之后各自启动
+    global _monitor
+    if _monitor is not None or (model_idle_unload_seconds <= 0 and model_memory_budget_mb <= 0):
+        return
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = threading.Thread(target=_monitor_loop, daemon=True)
+            _monitor.start()
+
+
+class ModelSet():
+    """
+    一组模型，config中记录这一组模型的可替换配置
+    >>> models = ModelSet(1, str.strip, _Tokenizer(lambda sents: [s.split() for s in sents], None),
+    ...                   _LazyTranslator(None, "t"), {"translate_model": "m"})
+    >>> models.tokenize([models.processor(" a b ")])
+    [['a', 'b']]
+    >>> models.status()
+    {'generation': 1, 'config': {'translate_model': 'm'}, 'translator_loaded': True}
+    """
+
+    def __init__(self, generation, processor, tokenizer, translator, config=None):
+        self.generation = generation
+        self.processor = processor
+        self.tokenize = tokenizer.tokenize
+        self.detokenize = tokenizer.detokenize
+        self.config = config or {}
+        self._tokenizer = tokenizer
+        self._translator = translator
+        # 翻译方法不引用self，旧的模型组不再被请求使用时可以立即释放，
+        # 批处理调度器按翻译方法分组，同一个batch中的句子都由同一组模型翻译
+        self.translate = get_packed_translate(
+            partial(_translate_with, translator), batch_max_tokens, max_sent_tokens, batch_max_size)
+        weakref.finalize(self, logger.info, "model set %d is released", generation)
+
+    def get_translator(self):
+        """
+        返回这一组的翻译模型，还没有加载时进行加载
+        """
+        return self._translator.get()
+
+    def status(self):
+        return {
+            "generation": self.generation,
+            "config": dict(self.config),
+            "translator_loaded": self._translator.loaded
+        }
+
+
+def _translate_with(translator, tokens):
+    with translator.use() as model:
+        return translate(tokens, model)
+
+
+def _select(config, args):
+    return {name: config[key] for key, name in args.items() if key in config}
+
+
+def _reloadable(config):
+    return {key: config[key] for key in RELOADABLE_KEYS if key in config}
+
+
+def _file_version(path):
+    """
+    返回模型文件的版本，原地替换模型文件之后版本改变，替换模型组时不再共用旧的组件。
+    目录（如ctranslate2模型）取其中每个文件的版本，文件不存在时返回None
+    >>> _file_version(None) is None
+    True
+    """
+    if not path:
+        return None
+    try:
+        if os.path.isdir(path):
+            paths = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+        else:
+            paths = [path]
+        return tuple((item.st_ino, item.st_mtime_ns, item.st_size) for item in map(os.stat, paths))
+    except OSError:
+        return None
+
+
+def _preprocessor_key(config):
+    truecase_model = config.get("truecase_model")
+    return ("preprocessor", tuple(config.get("preprocess_pipeline", [])),
+            config["translate_src_lang"], truecase_model, _file_version(truecase_model))
+
+
+def _tokenizer_key(config):
+    src_model, tgt_model = config.get("tok_src_model"), config.get("tok_tgt_model")
+    return ("tokenizer", src_model, tgt_model, _file_version(src_model), _file_version(tgt_model))
+
+
+def _translator_args(config):
+    args = _select(config, TRANSLATOR_ARGS)
+    if translator_module.translate_method != "opennmt":
+        # 只有ctranslate2模型支持量化和线程数的配置，其他模型忽略这些配置，也不用它们区分共用的模型
+        args = {"model_path": args["model_path"]} if "model_path" in args else {}
+    return args
+
+
+def _translator_key(config):
+    args = _translator_args(config)
+    return ("translator",) + tuple(sorted(args.items())) + (_file_version(args.get("model_path")),)
+
+
+def build_model_set(generation, config, eager=True):
+    """
+    按照完整的模型配置加载一组模型，与其他模型组配置相同的组件直接共用。
+    eager为False时翻译模型在第一次使用时才加载
+    """
+    new_processor = get_shared(_preprocessor_key(config), partial(
+        get_pipeline_preprocessor, config.get("preprocess_pipeline", []),
+        config.get("truecase_model"), config["translate_src_lang"]))
+    tokenizer = get_shared(_tokenizer_key(config), lambda: _Tokenizer(*get_tokenizer(
+        **_select(config, TOKENIZER_ARGS))))
+    args = _translator_args(config)
+    translator = get_shared(_translator_key(config), lambda: _LazyTranslator(
+        partial(load_translator, **args), name=args.get("model_path")))
+    if eager:
+        translator.get()
+    return ModelSet(generation, new_processor, tokenizer, translator, _reloadable(config))
+
+
+def get_default_model_set():
+    """
+    启动配置对应的模型组，使用各模块在import时加载的组件，并登记为共用的组件。
+    多进程模式下翻译模型在fork之后加载
+    """
+    default_processor = get_shared(_preprocessor_key(global_config), lambda: processor)
+    tokenizer = get_shared(_tokenizer_key(global_config), lambda: _Tokenizer(tokenize, detokenize))
+    translator = get_shared(_translator_key(global_config), lambda: _LazyTranslator(
+        load_translator, translator_module.translator, translator_module.translate_model))
+    return ModelSet(0, default_processor, tokenizer, translator, _reloadable(global_config))
+
+
+__all__ = ["ModelSet", "build_model_set", "get_default_model_set", "get_shared", "RELOADABLE_KEYS"]
@@ -0,0 +1,133 @@
+"""
+一个进程中同时提供多个翻译模型。每个翻译模型有自己的配置、术语词典、模型组和批处理队列，
+按照/{who}/translate/{domain}/{src}/{tgt}的路由区分，名称为{who}_translate_{domain}_{src}_{tgt}。
+配置相同的分词模型、预处理器、分句和后处理方法在多个翻译模型之间共用，只加载一次。
+启动配置本身是默认的翻译模型，对应/yyq/translate
+method: get_pipeline
+input type: str
+output type: Pipeline
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import yaml
+
+from config import global_config
+from . import translator as translator_module
+from .batch_scheduler import get_batch_translate, batch_translate
+from .model_set import build_model_set, get_default_model_set, get_shared
+from .postprocessor import get_pipeline_postprocessor, postprocessor
+from .sentence_split import get_sent_splitter, sent_splitter
+from .term_protection import get_term_dictionary
+
+logger = logging.getLogger(__name__)
+
+# 获取当前模块有用的配置
+MODEL_CONFIGS = global_config.get("models", {})
+
+DEFAULT_NAME = "default"
+
+
+def _splitter_key(config):
+    lang = config["translate_src_lang"]
+    return ("sent_splitter", lang, config.get("sent_split_method", {}).get(lang, "regex"))
+
+
+def _postprocessor_key(config):
+    return ("postprocessor", tuple(config.get("postprocess_pipeline", [])),
+            config["translate_tgt_lang"])
+
+
+class Pipeline():
+    """
+    一个翻译模型的完整流程。模型组可以在运行时替换，其他组件在启动时确定
+    """
+
+    def __init__(self, name, config, models, batch_translate_func, splitter=None, post=None):
+        self.name = name
+        self.config = config
+        self.src_lang = config["translate_src_lang"]
+        self.tgt_lang = config["translate_tgt_lang"]
+        self.term_dict = get_term_dictionary(
+            self.src_lang, self.tgt_lang, config["term_protection_db"],
+            config.get("term_protection_dict"), config.get("term_protection_compiled"))
+        self.sent_splitter = get_shared(_splitter_key(config), splitter or partial(
+            get_sent_splitter, *_splitter_key(config)[1:]))
+        self.postprocessor = get_shared(_postprocessor_key(config), post or partial(
+            get_pipeline_postprocessor, *_postprocessor_key(config)[1:]))
+        self.batch_translate = batch_translate_func
+        self.models = models
+        self._generation = models.generation
+        self._lock = threading.Lock()
+
+    def load_models(self, config):
+        """
+        在当前模型组配置的基础上修改config中的配置，加载新的模型组，不替换当前的模型组
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        merged = dict(self.config)
+        merged.update(self.models.config)
+        merged.update(config)
+        return build_model_set(generation, merged)
+
+    def swap_models(self, models):
+        """
+        替换当前的模型组，之后开始的请求使用新的模型组
+        """
+        old = self.models
+        self.models = models
+        if self.name == DEFAULT_NAME:
+            # 不指定翻译模型的translate调用也使用新的模型
+            translator_module.translator = models.get_translator()
+        logger.info("model set %d of %s is replaced by %d", old.generation, self.name,
+                    models.generation)
+
+    def status(self):
+        return {
+            "name": self.name,
+            "src_lang": self.src_lang,
+            "tgt_lang": self.tgt_lang,
+            "models": self.models.status()
+        }
+
+
+def _load_pipeline(name, model_config):
+    """
+    model_config为配置文件的路径或者配置项，其中的配置覆盖启动配置中的同名配置
+    """
+    if isinstance(model_config, str):
+        with open(model_config, "r", encoding="utf-8") as config_file:
+            model_config = yaml.safe_load(config_file)
+    config = {key: value for key, value in global_config.items() if key != "models"}
+    config.update(model_config or {})
+    # 多进程模式下翻译模型在fork之后加载，与默认的翻译模型一致
+    models = build_model_set(0, config, eager=translator_module.translator is not None)
+    pipeline = Pipeline(name, config, models, get_batch_translate(name))
+    logger.info("loaded model %s (%s -> %s)", name, pipeline.src_lang, pipeline.tgt_lang)
+    return pipeline
+
+
+PIPELINES = {
+    DEFAULT_NAME: Pipeline(DEFAULT_NAME, global_config, get_default_model_set(), batch_translate,
+                           lambda: sent_splitter, lambda: postprocessor)
+}
+if MODEL_CONFIGS:
+    with ThreadPoolExecutor(max_workers=len(MODEL_CONFIGS)) as _executor:
+        PIPELINES.update(zip(MODEL_CONFIGS, _executor.map(
+            _load_pipeline, MODEL_CONFIGS, MODEL_CONFIGS.values())))
+
+
+def get_pipeline(name=None):
+    """
+    返回名为name的翻译模型，name为None时返回默认的翻译模型
+    """
+    if (name or DEFAULT_NAME) not in PIPELINES:
+        raise ValueError("Model {} is not found.".format(name))
+    return PIPELINES[name or DEFAULT_NAME]
+
+
+__all__ = ["get_pipeline", "PIPELINES", "DEFAULT_NAME"]
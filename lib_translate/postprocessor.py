@@ -9,11 +9,50 @@ import sys
 import re
 
 from config import global_config
+from .metrics import Histogram
 
 # 获取当前模块有用的配置
 postprocess_pipeline = global_config.get("postprocess_pipeline", [])
 
 
+ALNUM = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789")
+
+
+def _fusable_processor(pattern, repl):
+    """
+    由一次正则替换构成的后处理器。流水线中相邻的这类后处理器会被合并成一次扫描，
+    所以它们之间必须可以交换顺序：替换结果不能影响其他后处理器的匹配和替换
+    """
+    regx = re.compile(pattern)
+
+    def processor(line):
+        return regx.sub(repl, line)
+
+    processor.pattern = pattern
+    processor.repl = repl
+    return processor
+
+
+def _remove_whitespace(match_obj):
+    """
+    一次处理一整段连续的空白，结果与反复删除两个非字母数字字符之间的空白直到不再变化相同：
+    两侧都不是字母数字时删除整段空白；只有左侧（或者开头）是字母数字时保留第一个空白字符；
+    只有右侧（或者结尾）是字母数字时保留最后一个空白字符；两侧都是时最多保留首尾两个空白字符
+    """
+    line = match_obj.string
+    start, end = match_obj.span()
+    left = start == 0 or line[start - 1] in ALNUM
+    right = end == len(line) or line[end] in ALNUM
+    run = match_obj.group(0)
+    if left and right:
+        return run if len(run) <= 2 else run[0] + run[-1]
+    if left:
+        return run[0]
+    if right:
+        return run[-1]
+    return ""
+
+
 def get_remove_whitespace_postprocessor():
     """
     去除文本中的所有空格，中文按字分开时可以将字符间空格去掉。
@@ -22,14 +61,7 @@ def get_remove_whitespace_postprocessor():
     >>> processor(text)
     '本•富兰克林（ Ben Franklin ）称德国人愚蠢而剽悍。'
     """
-    re_han = re.compile("([^A-Za-z0-9])(\\s+)([^A-Za-z0-9])")
-
-    def postprocessor(line):
-        while re_han.search(line):
-            line = re_han.sub("\\g<1>\\g<3>", line)
-        return line
-
-    return postprocessor
+    return _fusable_processor("\\s+", _remove_whitespace)
 
 
 def get_detruecase_postprocessor():
@@ -85,34 +117,104 @@ def get_chinesepunc_postprocessor():
         ":": "：",
         "!": "！"
     }
-    regx = re.compile('(?<![0-9A-Za-z])[{}](?![0-9A-Za-z])'.format(
-        "".join(punc_mapping)))
+    pattern = '(?<![0-9A-Za-z])[{}](?![0-9A-Za-z])'.format(
+        "".join(punc_mapping))
 
     def sub_func(match_obj):
         return punc_mapping[match_obj.group(0)]
 
+    return _fusable_processor(pattern, sub_func)
+
+
+def _fuse(stages):
+    """
+    把相邻的多个可合并的后处理器合并成一个正则，一次扫描完成所有替换
+    """
+    if len(stages) == 1:
+        return stages[0]
+    name = "+".join(item for item, _ in stages)
+    groups = ["_s{}".format(i) for i in range(len(stages))]
+    regx = re.compile("|".join("(?P<{}>{})".format(group, func.pattern)
+                               for group, (_, func) in zip(groups, stages)))
+    repls = {group: func.repl for group, (_, func) in zip(groups, stages)}
+
+    def sub_func(match_obj):
+        return repls[match_obj.lastgroup](match_obj)
+
     def processor(line):
         return regx.sub(sub_func, line)
+    return name, processor
 
-    return processor
 
+def compile_pipeline(pipeline, lang=None):
+    """
+    把后处理流水线编译成执行计划，返回[(阶段名称, 后处理器)]，lang为译文的语言
+    >>> [name for name, _ in compile_pipeline(["remove_whitespace", "chinesepunc", "mosesdetokenize"])]
+    ['remove_whitespace+chinesepunc', 'mosesdetokenize']
+    """
+    this = sys.modules[__name__]
+    plan = []
+    fusable = []
+    for item in pipeline:
+        try:
+            factory = getattr(this, "get_{}_postprocessor".format(item))
+        except AttributeError:
+            raise AttributeError(
+                "postprocessor {} is not found. Please check your config file.".format(item))
+        cur = factory(lang) if item == "mosesdetokenize" else factory()
+        if hasattr(cur, "pattern"):
+            fusable.append((item, cur))
+            continue
+        if fusable:
+            plan.append(_fuse(fusable))
+            fusable = []
+        plan.append((item, cur))
+    if fusable:
+        plan.append(_fuse(fusable))
+    return plan
+
+
+POSTPROCESS_STAGE_LATENCY = Histogram("translate_postprocess_seconds",
+                                      "Latency of each stage of the postprocess pipeline.",
+                                      ["stage"])
+
+
+def get_pipeline_postprocessor(pipeline=postprocess_pipeline, lang=None):
+    """
+    按照pipeline组合后处理器，每个阶段的耗时记录在translate_postprocess_seconds中
+    >>> get_pipeline_postprocessor(["remove_whitespace"])("你 好")
+    '你好'
+    """
+    all_processors = [(name, func, POSTPROCESS_STAGE_LATENCY.labels(name))
+                      for name, func in compile_pipeline(pipeline, lang)]
 
-this = sys.modules[__name__]
-all_processors = []
-for item in postprocess_pipeline:
-    try:
-        cur = getattr(this, "get_{}_postprocessor".format(item))()
-    except AttributeError:
-        raise AttributeError(
-            "postprocessor {} is not found. Please check your config file.")
-    all_processors.append(cur)
+    def postprocessor(text):
+        for _, func, latency in all_processors:
+            with latency.time():
+                text = func(text)
 
+        return text
+    return postprocessor
+
+
+def get_postprocess_timing():
+    """
+    返回每个后处理阶段的调用次数和总耗时（秒），多个翻译模型中同名的阶段合并统计
+    """
+    return {values[0]: {"calls": latency.count, "seconds": latency.sum}
+            for values, latency in POSTPROCESS_STAGE_LATENCY._items()}
 
-def postprocessor(text):
-    for func in all_processors:
-        text = func(text)
 
-    return text
+# 启动配置中的后处理方法，由load_default_postprocessor在导入lib_translate时加载
+postprocessor = None
+
+
+def load_default_postprocessor():
+    """
+    加载启动配置中的后处理器
+    """
+    global postprocessor
+    postprocessor = get_pipeline_postprocessor()
 
 
-__all__ = ["postprocessor"]
+__all__ = ["postprocessor", "get_postprocess_timing"]
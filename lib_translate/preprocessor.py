@@ -7,6 +7,7 @@ output_type: str
 import sys
 
 from config import global_config
+from .bert_tokenizer import FastBasicTokenizer
 
 # 获取当前模块有用的配置
 preprocess_pipeline = global_config.get("preprocess_pipeline", [])
@@ -20,8 +21,7 @@ def get_basic_preprocessor():
     >>> processor(text)
     '你 好'
     """
-    from lib_translate.bert_tokenizer import BasicTokenizer
-    tokenizer = BasicTokenizer(do_lower_case=False)
+    tokenizer = FastBasicTokenizer(do_lower_case=False)
     def preprocessor(line): return " ".join(tokenizer.tokenize(line))
     return preprocessor
 
@@ -43,7 +43,7 @@ def get_mosestokenize_preprocessor(lang=None):
     return processor
 
 
-def get_truecase_preprocessor():
+def get_truecase_preprocessor(truecase_model=None):
     """
     get sacremoses truecase processor
     Note: 此预处理器必须用在mosestokenize处理器之后
@@ -52,7 +52,8 @@ def get_truecase_preprocessor():
     'how are you'
     """
     from sacremoses import MosesTruecaser
-    truecase_model = global_config["truecase_model"]
+    if not truecase_model:
+        truecase_model = global_config["truecase_model"]
     mtr = MosesTruecaser(truecase_model)
 
     def preprocessor(line):
@@ -77,21 +78,46 @@ def get_normalize_preprocessor():
 
 
 this = sys.modules[__name__]
-all_processors = []
-for item in preprocess_pipeline:
-    try:
-        cur = getattr(this, "get_{}_preprocessor".format(item))()
-    except AttributeError:
-        raise AttributeError(
-            "Preprocessor {} is not found. Please check your config file.")
-    all_processors.append(cur)
 
 
-def processor(text):
-    for func in all_processors:
-        text = func(text)
+def get_pipeline_preprocessor(pipeline=preprocess_pipeline, truecase_model=None, lang=None):
+    """
+    按照pipeline依次组合预处理器，替换模型时可以指定新的truecase模型，lang为原文的语言
+    >>> get_pipeline_preprocessor(["basic"])("你好")
+    '你 好'
+    """
+    processors = []
+    for item in pipeline:
+        try:
+            factory = getattr(this, "get_{}_preprocessor".format(item))
+        except AttributeError:
+            raise AttributeError(
+                "Preprocessor {} is not found. Please check your config file.".format(item))
+        if item == "truecase":
+            processors.append(factory(truecase_model))
+        elif item == "mosestokenize":
+            processors.append(factory(lang))
+        else:
+            processors.append(factory())
+
+    def processor(text):
+        for func in processors:
+            text = func(text)
+
+        return text
+    return processor
+
 
-    return text
+# 启动配置中的预处理方法，由load_default_preprocessor在导入lib_translate时加载
+processor = None
+
+
+def load_default_preprocessor():
+    """
+    加载启动配置中的预处理器
+    """
+    global processor
+    processor = get_pipeline_preprocessor()
 
 
 __all__ = ["processor"]
@@ -4,49 +4,178 @@ method: sent_splitter
 input type: str
 output type: List[str]
 """
+import re
+from itertools import islice
+
 from config import global_config
 
 # 获取当前模块有用的配置
 max_sent_len = global_config.get("max_sent_len", 100)
 src_lang = global_config.get("translate_src_lang")
+sent_split_method = global_config.get("sent_split_method", {})
+
+# 英文句长按词和标点计数，与nltk.word_tokenize的计数基本一致
+RE_EN_TOKEN = re.compile(r"\w+|[^\w\s]")
+# 句末标点，后面可以跟引号或者右括号
+RE_EN_BOUNDARY = re.compile(r"[.!?]+(?:\s*[\"'”’)\]])*(?=\s|$)")
+# 句末标点之后的第一个非空白字符
+RE_NEXT_CHAR = re.compile(r"\s*(\S)")
+RE_ZH_BOUNDARY = re.compile(r"[。！？!?…]+(?:\s*[\"'”’」』）)\]])*")
+# 以.结尾但不是句末的常见缩写（小写，不含末尾的.），含有.的词（如e.g.、U.S.）也视为缩写
+EN_ABBREVIATIONS = frozenset([
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "mt", "vs", "etc", "al",
+    "fig", "figs", "no", "nos", "vol", "vols", "p", "pp", "ch", "sec", "art", "eq",
+    "inc", "ltd", "co", "corp", "dept", "est", "approx", "min", "max", "gov", "gen",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+])
+
+
+def zh_sent_len(text):
+    """
+    中文句长为字数，因为在预处理时会分字，所以在计算句长时不计空格
+    >>> zh_sent_len("你 好 ， 世 界")
+    5
+    """
+    return len(text) - text.count(" ")
+
+
+def en_exceeds_len(text, limit):
+    """
+    判断英文句子的词数是否超过limit，数到limit + 1个词时立即返回
+    >>> en_exceeds_len("Hello, world!", 4)
+    False
+    >>> en_exceeds_len("Hello, world!", 3)
+    True
+    """
+    return next(islice(RE_EN_TOKEN.finditer(text), limit, None), None) is not None
+
+
+def _is_en_boundary(text, match):
+    """
+    判断英文句末标点是否为真正的句子边界
+    """
+    if match.group() == ".":
+        start = match.start()
+        word_start = text.rfind(" ", 0, start) + 1
+        word = text[word_start: start]
+        # 缩写以及人名中的首字母（如J. Smith）
+        if "." in word or word.lower() in EN_ABBREVIATIONS or (len(word) == 1 and word.isupper()):
+            return False
+    # 下一个词以小写字母开头时通常不是新的句子，只看下一个字符，不复制之后的文本
+    next_char = RE_NEXT_CHAR.match(text, match.end())
+    return next_char is None or not next_char.group(1).islower()
+
+
+def regex_split_en(text):
+    """
+    使用正则对英文进行分句
+    >>> regex_split_en("Mr. Smith arrived at 3.5 p.m. today. He said: \\"Hi!\\" Then he left")
+    ['Mr. Smith arrived at 3.5 p.m. today.', 'He said: "Hi!"', 'Then he left']
+    """
+    sents = []
+    start = 0
+    for match in RE_EN_BOUNDARY.finditer(text):
+        if _is_en_boundary(text, match):
+            sent = text[start: match.end()].strip()
+            if sent:
+                sents.append(sent)
+            start = match.end()
+    sent = text[start:].strip()
+    if sent:
+        sents.append(sent)
+    return sents
+
+
+def regex_split_zh(text):
+    """
+    使用正则对中文进行分句
+    >>> regex_split_zh("你 好 。 他 说 ： “ 走 吧 ！ ” 然 后 离 开 了")
+    ['你 好 。', '他 说 ： “ 走 吧 ！ ”', '然 后 离 开 了']
+    """
+    sents = []
+    start = 0
+    for match in RE_ZH_BOUNDARY.finditer(text):
+        sent = text[start: match.end()].strip()
+        if sent:
+            sents.append(sent)
+        start = match.end()
+    sent = text[start:].strip()
+    if sent:
+        sents.append(sent)
+    return sents
 
-if src_lang == "zh":
+
+def get_regex_sent_splitter(lang):
+    """
+    内置的正则分句，句长检查只遍历一次文本
+    >>> splitter = get_regex_sent_splitter("en")
+    >>> splitter("Hello world.")
+    ['Hello world.']
+    """
+    if lang == "zh":
+        def sent_splitter(text):
+            if zh_sent_len(text) > max_sent_len:
+                return regex_split_zh(text)
+            return [text]
+    elif lang == "en":
+        def sent_splitter(text):
+            if en_exceeds_len(text, max_sent_len):
+                return regex_split_en(text)
+            return [text]
+    else:
+        raise AttributeError(
+            "Unsupported src_lang for sentence splitter: {}".format(lang))
+    return sent_splitter
+
+
+def get_ltp_sent_splitter(lang="zh"):
+    """
+    使用pyltp对中文进行分句
+    """
     from pyltp import SentenceSplitter
 
     def sent_splitter(text):
-        def sent_len(x):
-            # 因为在预处理时会分字，所以在计算句长时把空格去掉。
-            return len(x.replace(" ", ""))
-        if sent_len(text) > max_sent_len:
-            sents = SentenceSplitter.split(text)
-            #  long_sents = list(filter(lambda x: sent_len(x) > max_sent_len, sents))
-            #  if long_sents:
-            #      raise AttributeError(
-            #          "Please enter text less than {} chars in chinese.".format(max_sent_len))
-        else:
-            sents = [text]
-        return sents
-
-elif src_lang == "en":
+        if zh_sent_len(text) > max_sent_len:
+            return list(SentenceSplitter.split(text))
+        return [text]
+    return sent_splitter
+
+
+def get_nltk_sent_splitter(lang="en"):
+    """
+    使用nltk对英文进行分句，以nltk分词后的词数计算句长
+    """
     import nltk
 
     def sent_splitter(text):
-        def sent_len(x): 
-            # 这里以词数计算英文句长
-            return len(nltk.word_tokenize(x))
-        if sent_len(text) > max_sent_len:
-            sents = nltk.sent_tokenize(text)
-           #   long_sents = list(filter(lambda x: sent_len(x) > max_sent_len, sents))
-            #  if long_sents:
-            #      raise AttributeError(
-           #           "Please enter text less than {} chars in chinese.".format(max_sent_len))
-        else:
-            sents = [text]
-        return sents
-
-else:
-    raise AttributeError(
-        "Unsupported src_lang for sentence splitter: {}".format(src_lang))
+        if len(nltk.word_tokenize(text)) > max_sent_len:
+            return nltk.sent_tokenize(text)
+        return [text]
+    return sent_splitter
+
+
+def get_sent_splitter(lang, method="regex"):
+    """
+    获取指定语言的分句方法
+    """
+    try:
+        factory = globals()["get_{}_sent_splitter".format(method)]
+    except KeyError:
+        raise AttributeError(
+            "Sentence splitter {} is not found. Please check your config file.".format(method))
+    return factory(lang)
+
+
+# 启动配置中的分句方法，由load_default_sent_splitter在导入lib_translate时加载
+sent_splitter = None
+
+
+def load_default_sent_splitter():
+    """
+    加载启动配置中原文语言的分句方法
+    """
+    global sent_splitter
+    sent_splitter = get_sent_splitter(src_lang, sent_split_method.get(src_lang, "regex"))
 
 
 def sent_joiner(sents):
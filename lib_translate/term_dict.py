@@ -0,0 +1,349 @@
+"""
+编译后的术语词典。
+把词表编译成一个二进制文件（Aho-Corasick自动机 + 排好序的字符串表），
+服务启动时通过mmap只读加载，同一台机器上的多个进程共享同一份内存页。
+运行时增删的词语放在内存中的overlay里。
+"""
+import array
+import bisect
+import heapq
+import mmap
+import os
+import struct
+from collections.abc import Mapping, MutableMapping
+
+from .term_filter import (AhoCorasickFilter, lower_aligned, select_matches, _transform_word,
+                          _Automaton)
+
+MAGIC = b"TERMDICT"
+FORMAT_VERSION = 1
+BYTE_ORDER_MARK = 0x01020304
+# magic, 格式版本, 字节序标记, 节点数, 边数, 词数, 原文字节数, 译文字节数
+HEADER = struct.Struct("=8sIIIIIII")
+
+
+def _uint32_array(values):
+    return array.array("I", values)
+
+
+def compile_term_dict(mapping, output_path):
+    """
+    把{原文: 译文}形式的词典编译成二进制文件，原文需要已经经过_transform_word处理
+    文件结构：header | 节点的边起始位置 | 边的字符 | 边的目标节点 | 失败指针 | 输出指针
+             | 节点深度 | 原文偏移 | 译文偏移 | 原文 | 译文
+    """
+    keys = sorted(key for key in mapping if key)
+    automaton = _Automaton(keys)
+    fail, output = automaton.fail, automaton.output
+    goto, depth = automaton.goto, automaton.depth
+
+    edge_start = _uint32_array([0])
+    edge_char = _uint32_array([])
+    edge_target = _uint32_array([])
+    for trans in goto:
+        for char, child in sorted(trans.items()):
+            edge_char.append(ord(char))
+            edge_target.append(child)
+        edge_start.append(len(edge_char))
+
+    key_offsets = _uint32_array([0])
+    value_offsets = _uint32_array([0])
+    key_blob = bytearray()
+    value_blob = bytearray()
+    for key in keys:
+        key_blob += key.encode("utf-8")
+        value_blob += mapping[key].encode("utf-8")
+        key_offsets.append(len(key_blob))
+        value_offsets.append(len(value_blob))
+
+    # 先写入临时文件再替换，正在通过mmap读取旧文件的进程不受影响
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as output_file:
+        output_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDER_MARK,
+                                      len(goto), len(edge_char), len(keys),
+                                      len(key_blob), len(value_blob)))
+        for values in (edge_start, edge_char, edge_target,
+                       _uint32_array(fail), _uint32_array(output), _uint32_array(depth),
+                       key_offsets, value_offsets):
+            values.tofile(output_file)
+        output_file.write(key_blob)
+        output_file.write(value_blob)
+    os.replace(tmp_path, output_path)
+
+
+class CompiledTermDict(Mapping):
+    """
+    通过mmap加载的只读词典，同时提供词典查询和术语匹配
+    """
+    MAX_CACHED_TRANSITIONS = 1 << 16
+
+    def __init__(self, path):
+        with open(path, "rb") as input_file:
+            self._mmap = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, byte_order, n_nodes, n_edges, n_terms,
+         key_bytes, value_bytes) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("{} is not a compiled term dict of version {}.".format(
+                path, FORMAT_VERSION))
+        if byte_order != BYTE_ORDER_MARK:
+            raise ValueError("{} was compiled on a machine with different byte order.".format(path))
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def take_uint32(count):
+            nonlocal offset
+            values = view[offset: offset + 4 * count].cast("I")
+            offset += 4 * count
+            return values
+
+        self._edge_start = take_uint32(n_nodes + 1)
+        self._edge_char = take_uint32(n_edges)
+        self._edge_target = take_uint32(n_edges)
+        self._fail = take_uint32(n_nodes)
+        self._output = take_uint32(n_nodes)
+        self._depth = take_uint32(n_nodes)
+        self._key_offsets = take_uint32(n_terms + 1)
+        self._value_offsets = take_uint32(n_terms + 1)
+        self._key_start = offset
+        self._value_start = offset + key_bytes
+        self._n_terms = n_terms
+        # 按需缓存的状态转移(节点, 字符) -> 节点，所有线程共用，超过MAX_CACHED_TRANSITIONS个时清空，
+        # 每个进程只多占用几MB内存，不随线程数和词典大小增长
+        self._transitions = {}
+
+    def _key(self, index):
+        start = self._key_start + self._key_offsets[index]
+        end = self._key_start + self._key_offsets[index + 1]
+        return self._mmap[start: end]
+
+    def _value(self, index):
+        start = self._value_start + self._value_offsets[index]
+        end = self._value_start + self._value_offsets[index + 1]
+        return self._mmap[start: end].decode("utf-8")
+
+    def _bisect(self, target):
+        """
+        二分查找第一个不小于target的词的位置，词语按utf-8编码后的字节序排列，与字符串的字典序一致
+        """
+        low, high = 0, self._n_terms
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid) < target:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def index(self, key):
+        """
+        二分查找词语的位置，找不到时返回-1
+        """
+        target = key.encode("utf-8")
+        low = self._bisect(target)
+        if low < self._n_terms and self._key(low) == target:
+            return low
+        return -1
+
+    def iter_keys(self, prefix="", after=""):
+        """
+        按字典序返回以prefix开头、大于after的词
+        """
+        prefix, after = prefix.encode("utf-8"), after.encode("utf-8")
+        for index in range(self._bisect(max(prefix, after)), self._n_terms):
+            key = self._key(index)
+            if not key.startswith(prefix):
+                break
+            if key > after:
+                yield key.decode("utf-8")
+
+    def count_keys(self, prefix=""):
+        """
+        返回以prefix开头的词数，utf-8编码中不会出现0xff，prefix加上0xff大于所有以prefix开头的词
+        """
+        prefix = prefix.encode("utf-8")
+        return self._bisect(prefix + b"\xff") - self._bisect(prefix)
+
+    def __getitem__(self, key):
+        index = self.index(key)
+        if index < 0:
+            raise KeyError(key)
+        return self._value(index)
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self.index(key) >= 0
+
+    def __len__(self):
+        return self._n_terms
+
+    def __iter__(self):
+        for index in range(self._n_terms):
+            yield self._key(index).decode("utf-8")
+
+    def _next_node(self, node, char):
+        """
+        在mmap的边表中二分查找状态转移，找不到时沿失败指针回退
+        """
+        code = ord(char)
+        edge_start, edge_char = self._edge_start, self._edge_char
+        while True:
+            low, high = edge_start[node], edge_start[node + 1]
+            pos = bisect.bisect_left(edge_char, code, low, high)
+            if pos < high and edge_char[pos] == code:
+                return self._edge_target[pos]
+            if not node:
+                return 0
+            node = self._fail[node]
+
+    def match_ends(self, text, deleted=()):
+        """
+        对转为小写的文本进行匹配，返回每个起始位置上最长匹配的结束位置。
+        deleted中的词语在运行时已经被删除，不参与匹配。
+        状态转移在mmap的边表中二分查找，结果缓存在所有线程共用的有界字典中
+        """
+        fail, output, depth = self._fail, self._output, self._depth
+        cache = self._transitions
+        best_end = {}
+        node = 0
+        end = 0
+        for char in text:
+            end += 1
+            key = node * 0x110000 + ord(char)
+            next_node = cache.get(key)
+            if next_node is None:
+                next_node = self._next_node(node, char)
+                if len(cache) >= self.MAX_CACHED_TRANSITIONS:
+                    cache.clear()
+                cache[key] = next_node
+            node = next_node
+            match = output[node]
+            while match:
+                start = end - depth[match]
+                if not deleted or text[start: end] not in deleted:
+                    best_end[start] = end
+                match = output[fail[match]]
+        return best_end
+
+
+class TermMapping(MutableMapping):
+    """
+    在编译好的词典上叠加运行时的修改：overlay中是新增或者修改过的词，deleted中是被删除的词
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.overlay = {}
+        self.deleted = set()
+
+    def __getitem__(self, key):
+        if key in self.overlay:
+            return self.overlay[key]
+        if key in self.deleted:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __setitem__(self, key, value):
+        self.overlay[key] = value
+        self.deleted.discard(key)
+
+    def __delitem__(self, key):
+        found = self.overlay.pop(key, None) is not None
+        if key not in self.deleted and key in self.base:
+            self.deleted.add(key)
+            found = True
+        if not found:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self.overlay:
+            return True
+        return key not in self.deleted and key in self.base
+
+    def __len__(self):
+        overlay_only = sum(1 for key in self.overlay if key not in self.base)
+        return len(self.base) - len(self.deleted) + overlay_only
+
+    def __iter__(self):
+        for key in self.base:
+            if key not in self.deleted and key not in self.overlay:
+                yield key
+        yield from self.overlay
+
+    def copy(self):
+        """
+        返回共用编译好的词典、复制运行时修改的副本
+        """
+        mapping = TermMapping(self.base)
+        mapping.overlay = dict(self.overlay)
+        mapping.deleted = set(self.deleted)
+        return mapping
+
+
+class CompiledTermFilter():
+    """
+    编译好的词典加上运行时新增词语的term filter，匹配规则与AhoCorasickFilter一致
+    """
+
+    def __init__(self, mapping):
+        self.mapping = mapping
+        self.overlay = AhoCorasickFilter(mapping.overlay.keys())
+
+    def add(self, keyword):
+        """
+        向过滤器中添加词表
+        """
+        self.update([keyword])
+
+    def update(self, keywords):
+        """
+        向过滤器中批量添加词表，词典中已有的词只需要从deleted中移除，由TermMapping负责
+        """
+        base = self.mapping.base
+        self.overlay.update(keyword for keyword in keywords
+                            if _transform_word(keyword) not in base)
+
+    def remove(self, keyword):
+        """
+        移除过滤器中的词
+        """
+        self.difference_update([keyword])
+
+    def difference_update(self, keywords):
+        """
+        从过滤器中批量移除词语，编译好的词典中的词通过TermMapping.deleted屏蔽
+        """
+        self.overlay.difference_update(keywords)
+
+    def iter_words(self, prefix="", after=""):
+        """
+        按字典序合并返回编译好的词典和overlay中以prefix开头、大于after的词
+        """
+        base, deleted = self.mapping.base, self.mapping.deleted
+        previous = None
+        for word in heapq.merge(base.iter_keys(prefix, after),
+                                self.overlay.iter_words(prefix, after)):
+            # overlay中可能有修改了译文的词，与编译好的词典重复
+            if word != previous and word not in deleted:
+                yield word
+            previous = word
+
+    def count_words(self, prefix=""):
+        """
+        返回以prefix开头的词数
+        """
+        base = self.mapping.base
+        count = base.count_keys(prefix)
+        count -= sum(1 for word in self.mapping.deleted if word.startswith(prefix))
+        count += sum(1 for word in self.overlay.iter_words(prefix) if word not in base)
+        return count
+
+    def filter(self, message):
+        """
+        从文本中找出词表中的词
+        """
+        text = lower_aligned(message)
+        best_end = self.mapping.base.match_ends(text, self.mapping.deleted)
+        for start, end in self.overlay.match_ends(text).items():
+            if best_end.get(start, 0) < end:
+                best_end[start] = end
+        return select_matches(message, best_end)
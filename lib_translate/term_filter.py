@@ -0,0 +1,483 @@
+"""
+术语匹配器，从文本中找出词表中的词
+method: filter
+input type: str
+output type: Tuple[List[str], List[Tuple[int, int]]]
+"""
+import heapq
+import threading
+
+
+def _transform_word(word):
+    """
+    对加入词表的词进行预处理
+    """
+    return word.strip().lower()
+
+
+class DFAFilter():
+    """
+    使用dfa算法构建的term filter
+    >>> keywords = ["hello world", "I'm", "hello"]
+    >>> dfa_filter = DFAFilter(keywords)
+    >>> terms, indexes = dfa_filter.filter("Hello world. I'm fine thank you.")
+    >>> terms
+    ['Hello world', "I'm"]
+    >>> indexes
+    [(0, 11), (13, 16)]
+    """
+
+    def __init__(self, keywords):
+        self.keyword_chains = {}
+        self.delimit = '\x00'
+
+        self.keywords = keywords
+        for word in keywords:
+            if isinstance(word, str):
+                self.add(word.strip())
+
+    def remove(self, keyword):
+        """
+        移除过滤器中的词
+        """
+        if not keyword:
+            return
+        chars = _transform_word(keyword)
+        level = self.keyword_chains
+        prev_level = None
+        prev_key = None
+        for char in chars:
+            if char not in level:
+                return
+            if self.delimit in level:
+                prev_level = level
+                prev_key = char
+            level = level[char]
+        if len(level) > 1:
+            level.pop(self.delimit)
+        else:
+            prev_level.pop(prev_key)
+
+    def add(self, keyword):
+        """
+        向过滤器中添加词表
+        """
+        chars = _transform_word(keyword)
+        if not chars:
+            return
+        level = self.keyword_chains
+        for i in range(0, len(chars)):
+            if chars[i] in level:
+                level = level[chars[i]]
+            else:
+                for j in range(i, len(chars)):
+                    level[chars[j]] = {}
+                    last_level, last_char = level, chars[j]
+                    level = level[chars[j]]
+                last_level[last_char] = {self.delimit: 0}
+                break
+        if i == len(chars) - 1:
+            level[self.delimit] = 0
+
+    def filter(self, message):
+        """
+        从文本中找出词表中的词
+        """
+        origin_message = message
+        message = _transform_word(message)
+        sensitive_words = []
+        indexes = []
+        start = 0
+        while start < len(message):
+            level = self.keyword_chains
+            step_ins = 0
+            word_start, word_end = -1, -1
+            for char in message[start:]:
+                if char in level:
+                    step_ins += 1
+                    if self.delimit in level[char]:
+                        word_start, word_end = start, start + step_ins
+                    level = level[char]
+                else:
+                    break
+            if word_end >= 0:
+                sensitive_words.append(origin_message[word_start: word_end])
+                indexes.append((word_start, word_end))
+                start = word_end - 1
+            start += 1
+
+        return sensitive_words, indexes
+
+
+def lower_aligned(message):
+    """
+    把文本转为小写，并保证每个字符的位置不变
+    """
+    text = message.lower()
+    if len(text) != len(message):
+        # 个别字符转小写后长度会变化，这些字符保持原样
+        text = "".join(char if len(char.lower()) != 1 else char.lower()
+                       for char in message)
+    return text
+
+
+def select_matches(message, best_end):
+    """
+    根据每个起始位置上最长匹配的结束位置，从左到右选出互不重叠的匹配结果
+    >>> select_matches("abcdef", {0: 3, 1: 2, 3: 4, 4: 6})
+    (['abc', 'd', 'ef'], [(0, 3), (3, 4), (4, 6)])
+    """
+    terms = []
+    indexes = []
+    prev_end = 0
+    for start in sorted(best_end):
+        if start < prev_end:
+            continue
+        end = best_end[start]
+        terms.append(message[start: end])
+        indexes.append((start, end))
+        prev_end = end
+    return terms, indexes
+
+
+_END = None  # 运行时新增词语的前缀树中，表示词尾的键
+
+
+def _iter_sorted(node, word, after, children, is_end):
+    """
+    按字典序深度优先遍历前缀树，返回大于after的词，after为空时子树中的词都大于after
+    """
+    if is_end(node) and word > after:
+        yield word
+    for char, child in sorted(children(node)):
+        child_word = word + char
+        if after.startswith(child_word):
+            yield from _iter_sorted(child, child_word, after, children, is_end)
+        elif child_word > after:
+            yield from _iter_sorted(child, child_word, "", children, is_end)
+        # 否则子树中的词都小于after，跳过
+
+
+def _overlay_children(node):
+    return ((char, child) for char, child in node.items() if char is not _END)
+
+
+def _overlay_is_end(node):
+    return _END in node
+
+
+def _copy_on_write(root, words, end):
+    """
+    返回在前缀树root中添加（end为True）或者删除一批词之后的新前缀树。
+    只复制从根节点到这些词的路径上的节点，root本身不修改，正在匹配的线程不受影响。
+    词排好序后依次处理，与上一个词的公共前缀上的节点已经复制过，之后的节点都还没有复制
+
+    >>> old = {"a": {None: True}}
+    >>> new = _copy_on_write(old, ["ab", "b"], True)
+    >>> old, sorted(new), sorted(new["a"], key=str)
+    ({'a': {None: True}}, ['a', 'b'], [None, 'b'])
+    >>> _copy_on_write(new, ["ab", "b", "c"], False)
+    {'a': {None: True}}
+    """
+    root = dict(root)
+    path = [root]  # 上一个词路径上本次复制出的节点，path[i]对应长度为i的前缀
+    prev = ""
+    for word in sorted(set(words)):
+        common, limit = 0, min(len(prev), len(word), len(path) - 1)
+        while common < limit and prev[common] == word[common]:
+            common += 1
+        del path[common + 1:]
+        node = path[-1]
+        for char in word[common:]:
+            child = node.get(char)
+            if child is None:
+                if not end:
+                    break
+                child = {}
+            else:
+                child = dict(child)
+            node[char] = child
+            path.append(child)
+            node = child
+        else:
+            if end:
+                node[_END] = True
+            else:
+                node.pop(_END, None)
+                # 删除不再通向任何词的节点
+                depth = len(word)
+                while depth and not path[depth]:
+                    del path[depth - 1][word[depth - 1]]
+                    depth -= 1
+                del path[depth + 1:]
+        prev = word
+    return root
+
+
+class _Automaton():
+    """
+    用一批词构建的Aho-Corasick自动机，构建之后不再修改，多个线程可以同时匹配。
+    匹配时不缓存状态转移，沿失败指针回退的总次数不超过文本长度，不需要每个线程额外占用内存
+    """
+
+    def __init__(self, keywords=()):
+        goto, depth, is_end = [{}], [0], [False]  # 每个节点的转移表、对应前缀的长度、是否为词尾
+        for keyword in keywords:
+            node = 0
+            for char in _transform_word(keyword):
+                trans = goto[node]
+                next_node = trans.get(char)
+                if next_node is None:
+                    next_node = len(goto)
+                    goto.append({})
+                    depth.append(depth[node] + 1)
+                    is_end.append(False)
+                    trans[char] = next_node
+                node = next_node
+            if node:
+                is_end[node] = True
+        self.goto, self.depth, self.is_end = goto, depth, is_end
+        # 失败指针和沿失败指针能到达的第一个词尾节点
+        fail, output = self._build()
+        # 构建完成后转为tuple，垃圾回收发现其中只有dict和int之后不再跟踪，完整回收时不必遍历整个自动机
+        self.goto, self.depth, self.is_end = tuple(goto), tuple(depth), tuple(is_end)
+        self.fail, self.output = tuple(fail), tuple(output)
+
+    def _build(self):
+        """
+        按广度优先的顺序构建失败指针
+        """
+        goto, is_end = self.goto, self.is_end
+        fail = [0] * len(goto)
+        output = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:
+            output[node] = node if is_end[node] else 0
+        for node in queue:
+            for char, child in goto[node].items():
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                output[child] = child if is_end[child] else output[fail[child]]
+                queue.append(child)
+        return fail, output
+
+    def find(self, word):
+        """
+        返回word对应的节点，不存在时返回None
+        """
+        node = 0
+        for char in word:
+            node = self.goto[node].get(char)
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, word):
+        node = self.find(word)
+        return node is not None and self.is_end[node]
+
+    def iter_words(self, prefix="", after=""):
+        """
+        按字典序返回以prefix开头、大于after的词
+        """
+        node = self.find(prefix)
+        if node is None:
+            return iter(())
+        goto, is_end = self.goto, self.is_end
+        return _iter_sorted(node, prefix, after, lambda node: goto[node].items(),
+                            is_end.__getitem__)
+
+    def count_words(self, prefix=""):
+        """
+        返回以prefix开头的词数
+        """
+        node = self.find(prefix)
+        if node is None:
+            return 0
+        goto, is_end = self.goto, self.is_end
+        count = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            count += is_end[node]
+            stack.extend(goto[node].values())
+        return count
+
+    def match_ends(self, text, deleted=()):
+        """
+        扫描一遍文本，返回每个起始位置上能匹配到的最长的词的结束位置，deleted中的词不参与匹配
+        """
+        goto, fail, output, depth = self.goto, self.fail, self.output, self.depth
+        best_end = {}
+        node = 0
+        end = 0
+        for char in text:
+            end += 1
+            next_node = goto[node].get(char)
+            while next_node is None and node:
+                node = fail[node]
+                next_node = goto[node].get(char)
+            node = next_node or 0
+            match = output[node]
+            while match:
+                # 结束位置递增，后出现的匹配一定更长
+                start = end - depth[match]
+                if not deleted or text[start: end] not in deleted:
+                    best_end[start] = end
+                match = output[fail[match]]
+        return best_end
+
+
+class AhoCorasickFilter():
+    """
+    使用Aho-Corasick自动机构建的term filter，匹配时间与文本长度成线性关系。
+    匹配规则与DFAFilter一致：从左到右查找，同一位置优先匹配最长的词，匹配结果之间不重叠。
+    自动机只在创建时构建一次，运行时新增的词放在一棵写时复制的前缀树中，删除的词放在集合中屏蔽，
+    增删词语的开销只与修改的词有关。匹配时取一份不可变的快照，不加锁，也不会看到修改了一半的状态。
+    >>> keywords = ["hello world", "I'm", "hello"]
+    >>> ac_filter = AhoCorasickFilter(keywords)
+    >>> terms, indexes = ac_filter.filter("Hello world. I'm fine thank you.")
+    >>> terms
+    ['Hello world', "I'm"]
+    >>> indexes
+    [(0, 11), (13, 16)]
+    >>> ac_filter.remove("hello world")
+    >>> ac_filter.filter("Hello world. I'm fine thank you.")
+    (['Hello', "I'm"], [(0, 5), (13, 16)])
+    >>> ac_filter.add("world. i")
+    >>> ac_filter.filter("Hello world. I'm fine thank you.")
+    (['Hello', 'world. I'], [(0, 5), (6, 14)])
+    """
+
+    def __init__(self, keywords=()):
+        self._lock = threading.Lock()  # 只在增删词语时使用，匹配时不加锁
+        # 匹配时使用的快照：(创建时构建的自动机, 运行时新增的词的前缀树, 运行时删除的自动机中的词)
+        self._snapshot = (_Automaton(word for word in keywords if isinstance(word, str)),
+                          {}, frozenset())
+
+    def add(self, keyword):
+        """
+        向过滤器中添加词表
+        """
+        self.update([keyword])
+
+    def update(self, keywords):
+        """
+        向过滤器中批量添加词表，只复制一次修改路径上的节点
+        """
+        with self._lock:
+            automaton, overlay, deleted = self._snapshot
+            added, restored = [], set()
+            for keyword in keywords:
+                word = _transform_word(keyword)
+                if not word:
+                    continue
+                if word in automaton:
+                    restored.add(word)
+                else:
+                    added.append(word)
+            if added:
+                overlay = _copy_on_write(overlay, added, True)
+            if restored & deleted:
+                deleted = deleted - restored
+            self._snapshot = (automaton, overlay, deleted)
+
+    def remove(self, keyword):
+        """
+        移除过滤器中的词
+        """
+        self.difference_update([keyword])
+
+    def difference_update(self, keywords):
+        """
+        从过滤器中批量移除词语，自动机中的词加入删除的集合，运行时新增的词从前缀树中移除
+        """
+        with self._lock:
+            automaton, overlay, deleted = self._snapshot
+            removed, masked = [], set()
+            for keyword in keywords:
+                word = _transform_word(keyword)
+                if not word:
+                    continue
+                if word in automaton:
+                    masked.add(word)
+                else:
+                    removed.append(word)
+            if removed:
+                overlay = _copy_on_write(overlay, removed, False)
+            if masked - deleted:
+                deleted = deleted | masked
+            self._snapshot = (automaton, overlay, deleted)
+
+    def iter_words(self, prefix="", after=""):
+        """
+        按字典序返回过滤器中以prefix开头、大于after的词，词语经过_transform_word处理
+        >>> list(AhoCorasickFilter(["ab", "b", "abc", "a"]).iter_words("a", after="ab"))
+        ['abc']
+        """
+        automaton, overlay, deleted = self._snapshot
+        base_words = (word for word in automaton.iter_words(prefix, after) if word not in deleted)
+        node = overlay
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return base_words
+        # 前缀树中的词不在自动机中，两边没有重复的词
+        return heapq.merge(base_words, _iter_sorted(node, prefix, after,
+                                                    _overlay_children, _overlay_is_end))
+
+    def count_words(self, prefix=""):
+        """
+        返回过滤器中以prefix开头的词数
+        """
+        automaton, overlay, deleted = self._snapshot
+        count = automaton.count_words(prefix)
+        count -= sum(1 for word in deleted if word.startswith(prefix))
+        node = overlay
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return count
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            count += _END in node
+            stack.extend(child for char, child in _overlay_children(node))
+        return count
+
+    def match_ends(self, text):
+        """
+        对转为小写的文本进行匹配，返回每个起始位置上最长匹配的结束位置
+        """
+        automaton, overlay, deleted = self._snapshot
+        best_end = automaton.match_ends(text, deleted)
+        if not overlay:
+            return best_end
+        # 运行时新增的词通常不多，从每个位置出发沿前缀树查找最长的词
+        length = len(text)
+        for start, char in enumerate(text):
+            node = overlay.get(char)
+            if node is None:
+                continue
+            end = start + 1
+            longest = 0
+            while True:
+                if _END in node:
+                    longest = end
+                if end == length:
+                    break
+                node = node.get(text[end])
+                if node is None:
+                    break
+                end += 1
+            if longest > best_end.get(start, 0):
+                best_end[start] = longest
+        return best_end
+
+    def filter(self, message):
+        """
+        从文本中找出词表中的词
+        """
+        return select_matches(message, self.match_ends(lower_aligned(message)))
@@ -0,0 +1,149 @@
+"""
+术语词表的流式读写，支持csv、tsv、xlsx和xls。
+格式规定：第一行为列名，包括源语言和目标语言的简称，中文：zh 英文：en，后面每一行是一对需要保护的term。
+读取时按chunk_size分块返回校验过的词语，内存占用与词表的大小无关
+>>> import os, tempfile
+>>> path = os.path.join(tempfile.mkdtemp(), "dict.csv")
+>>> write_term_file(path, "en", "zh", [("hello world", "你好世界"), ("I'm", "我是")])
+2
+>>> for words, invalid in read_term_chunks(path, "zh", "en"):
+...     print(words, invalid)
+[('你好世界', 'hello world'), ('我是', "I'm")] []
+"""
+import csv
+import os
+
+# 与sqlite中词表的列宽一致
+MAX_WORD_LENGTH = 64
+CHUNK_SIZE = 50000
+
+
+def _file_format(path):
+    file_format = os.path.splitext(path)[1].lower().lstrip(".")
+    if file_format not in ("csv", "tsv", "xlsx", "xls"):
+        raise ValueError("Unsupported term file format: {}".format(path))
+    return file_format
+
+
+def _iter_text_rows(path, delimiter):
+    with open(path, "r", encoding="utf-8-sig", newline="") as term_file:
+        yield from csv.reader(term_file, delimiter=delimiter)
+
+
+def _iter_xlsx_rows(path):
+    # 只读模式下openpyxl边解析边返回，不会把整个sheet读进内存
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_xls_rows(path):
+    import xlrd
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    try:
+        sheet = workbook.sheet_by_index(0)
+        for index in range(sheet.nrows):
+            yield sheet.row_values(index)
+    finally:
+        workbook.release_resources()
+
+
+def iter_term_rows(path):
+    """
+    逐行返回词表文件中的原始数据，包括列名
+    """
+    file_format = _file_format(path)
+    if file_format == "xlsx":
+        return _iter_xlsx_rows(path)
+    if file_format == "xls":
+        return _iter_xls_rows(path)
+    return _iter_text_rows(path, "\t" if file_format == "tsv" else ",")
+
+
+def _cell(value):
+    if isinstance(value, str):
+        return value.strip()
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        # excel中的数字读出来是浮点数
+        value = int(value)
+    return str(value).strip()
+
+
+def _column_indexes(header, src_lang, tgt_lang, path):
+    header = [_cell(value) for value in header]
+    if src_lang not in header or tgt_lang not in header:
+        raise ValueError("Term file {} should have columns {} and {}, got {}".format(
+            path, src_lang, tgt_lang, header))
+    return header.index(src_lang), header.index(tgt_lang)
+
+
+def read_term_chunks(path, src_lang, tgt_lang, chunk_size=CHUNK_SIZE):
+    """
+    按块读取词表，每块返回([(src_word, tgt_word)], [不合法的行号])。
+    原文或译文为空、超过MAX_WORD_LENGTH个字符的行不合法，行号从1开始，第1行为列名
+    """
+    rows = iter_term_rows(path)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("Term file {} is empty".format(path))
+    src_index, tgt_index = _column_indexes(header, src_lang, tgt_lang, path)
+    last_index = max(src_index, tgt_index)
+
+    words, invalid = [], []
+    for line, row in enumerate(rows, 2):
+        if len(row) <= last_index:
+            invalid.append(line)
+            continue
+        src_word, tgt_word = _cell(row[src_index]), _cell(row[tgt_index])
+        if not src_word or not tgt_word or \
+                len(src_word) > MAX_WORD_LENGTH or len(tgt_word) > MAX_WORD_LENGTH:
+            invalid.append(line)
+            continue
+        words.append((src_word, tgt_word))
+        if len(words) >= chunk_size:
+            yield words, invalid
+            words, invalid = [], []
+    if words or invalid:
+        yield words, invalid
+
+
+def _write_xlsx_rows(path, rows):
+    # 只写模式下每一行写完之后不再保存在内存中
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def write_term_file(path, src_lang, tgt_lang, words):
+    """
+    把可迭代的[(src_word, tgt_word)]逐行写入词表文件，返回写入的词数
+    """
+    file_format = _file_format(path)
+    count = 0
+
+    def rows():
+        nonlocal count
+        yield src_lang, tgt_lang
+        for src_word, tgt_word in words:
+            count += 1
+            yield src_word, tgt_word
+
+    if file_format == "xlsx":
+        _write_xlsx_rows(path, rows())
+    elif file_format == "xls":
+        raise ValueError("Exporting to xls is not supported, use xlsx instead: {}".format(path))
+    else:
+        with open(path, "w", encoding="utf-8", newline="") as term_file:
+            csv.writer(term_file, delimiter="\t" if file_format == "tsv" else ",").writerows(rows())
+    return count
+
+
+__all__ = ["iter_term_rows", "read_term_chunks", "write_term_file"]
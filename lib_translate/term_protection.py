@@ -14,262 +14,490 @@ True
 >>> mask_term("hello world! I'm.")
 ("hello world! I'm.", [])
 """
+import gc
+import logging
+import os
 import re
+import threading
+import time
 import warnings
-import pandas
+from contextlib import contextmanager
 
-from sqlalchemy import Column, String, create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import Column, String
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from config import global_config
+from .term_filter import _transform_word, AhoCorasickFilter
+from .term_dict import compile_term_dict, CompiledTermDict, CompiledTermFilter, TermMapping
+from .term_io import CHUNK_SIZE, read_term_chunks, write_term_file
+from .term_store import (create_term_engine, change_log_table, TermChangeLog, TermWriter,
+                         TERM_SYNC_LAG, TERM_SYNC_VERSION)
+
+logger = logging.getLogger(__name__)
 
 PROTECTION_SYMBOL = global_config["term_mask_symbol"]
 DICT_FILE = global_config.get("term_protection_dict", None)
 SRC_LANG = global_config["translate_src_lang"]
 TGT_LANG = global_config["translate_tgt_lang"]
 TERM_PROTECTION_DB = global_config["term_protection_db"]
+COMPILED_DICT = global_config.get("term_protection_compiled", None)
+TERM_SYNC_INTERVAL = global_config.get("term_sync_interval_ms", 1000) / 1000
+TERM_SYNC_GAP_TIMEOUT = global_config.get("term_sync_gap_timeout_seconds", 60)
 
 __all__ = ["mask_term", "de_mask_term",
-           "add_words", "delete_words", "show_words"]
+           "add_words", "delete_words", "show_words", "get_dict_version",
+           "import_words", "export_words",
+           "TermDictionary", "get_term_dictionary"]
 
 
-def _transform_word(word):
-    """
-    对加入词表的词进行预处理
-    """
-    return word.strip().lower()
+_VOCAB_CLASSES = {}
 
 
-class DFAFilter():
+def _vocab_class(src_lang, tgt_lang):
     """
-    使用dfa算法构建的term filter
-    >>> keywords = ["hello world", "I'm", "hello"]
-    >>> dfa_filter = DFAFilter(keywords)
-    >>> terms, indexes = dfa_filter.filter("Hello world. I'm fine thank you.")
-    >>> terms
-    ['Hello world', "I'm"]
-    >>> indexes
-    [(0, 11), (13, 16)]
+    每个语言对的词表存放在sqlite中名为{src_lang}-{tgt_lang}的表中
     """
-
-    def __init__(self, keywords):
-        self.keyword_chains = {}
-        self.delimit = '\x00'
-
-        self.keywords = keywords
-        for word in keywords:
-            if isinstance(word, str):
-                self.add(word.strip())
-
-    def remove(self, keyword):
-        """
-        移除过滤器中的词
-        """
-        if not keyword:
-            return
-        chars = _transform_word(keyword)
-        level = self.keyword_chains
-        prev_level = None
-        prev_key = None
-        for char in chars:
-            if char not in level:
-                return
-            if self.delimit in level:
-                prev_level = level
-                prev_key = char
-            level = level[char]
-        if len(level) > 1:
-            level.pop(self.delimit)
-        else:
-            prev_level.pop(prev_key)
-
-    def add(self, keyword):
-        """
-        向过滤器中添加词表
-        """
-        chars = _transform_word(keyword)
-        if not chars:
-            return
-        level = self.keyword_chains
-        for i in range(0, len(chars)):
-            if chars[i] in level:
-                level = level[chars[i]]
-            else:
-                for j in range(i, len(chars)):
-                    level[chars[j]] = {}
-                    last_level, last_char = level, chars[j]
-                    level = level[chars[j]]
-                last_level[last_char] = {self.delimit: 0}
-                break
-        if i == len(chars) - 1:
-            level[self.delimit] = 0
-
-    def filter(self, message):
-        """
-        从文本中找出词表中的词
-        """
-        origin_message = message
-        message = _transform_word(message)
-        sensitive_words = []
-        indexes = []
-        start = 0
-        while start < len(message):
-            level = self.keyword_chains
-            step_ins = 0
-            word_start, word_end = -1, -1
-            for char in message[start:]:
-                if char in level:
-                    step_ins += 1
-                    if self.delimit in level[char]:
-                        word_start, word_end = start, start + step_ins
-                    level = level[char]
-                else:
-                    break
-            if word_end >= 0:
-                sensitive_words.append(origin_message[word_start: word_end])
-                indexes.append((word_start, word_end))
-                start = word_end - 1
-            start += 1
-
-        return sensitive_words, indexes
-
-
-Base = declarative_base()
-
-
-class Vocab(Base):
-
-    __tablename__ = "{}-{}".format(SRC_LANG, TGT_LANG)
-
-    src_word = Column(String(64), primary_key=True)
-    tgt_word = Column(String(64))
-
-
-ENGIN = create_engine("sqlite:///{}".format(TERM_PROTECTION_DB))
-SESSION = sessionmaker(bind=ENGIN)()
-Base.metadata.create_all(ENGIN)
-
-
-def read_dict_sqlite():
+    table_name = "{}-{}".format(src_lang, tgt_lang)
+    if table_name not in _VOCAB_CLASSES:
+        base = declarative_base()
+        _VOCAB_CLASSES[table_name] = type("Vocab", (base,), {
+            "__tablename__": table_name,
+            "src_word": Column(String(64), primary_key=True),
+            "tgt_word": Column(String(64))
+        })
+    return _VOCAB_CLASSES[table_name]
+
+
+def read_dict_excel(term_file, src_lang=SRC_LANG, tgt_lang=TGT_LANG):
     """
-    从sqlite数据库中读取需要保护的词典
+    从原文和译文中获取需要保护的词典，词表的格式见term_io。
+    词表中没有src_lang和tgt_lang两列时返回None
     """
     mapping = {}
-    for item in SESSION.query(Vocab):
-        mapping[_transform_word(item.src_word)] = item.tgt_word
+    try:
+        for words, _ in read_term_chunks(term_file, src_lang, tgt_lang):
+            for src, tgt in words:
+                mapping[_transform_word(src)] = tgt
+    except ValueError:
+        return None
     return mapping
 
 
-def read_dict_excel(term_file):
+def _apply_changes(mapping, changes):
     """
-    从原文和译文中获取需要保护的词典。
-    格式规定：词典的第一行为列名，分别有源语言和目标语言的简称，中文：zh 英文：en
-    后面每一行是对应语言需要保护的term
+    把{原文: 译文}形式的修改应用到词典中，译文为None时删除这个词
     """
-    dataframe = pandas.read_excel(term_file)
-    langs = dataframe.columns.tolist()
+    for key, value in changes.items():
+        if value is None:
+            mapping.pop(key, None)
+        elif mapping.get(key) != value:
+            mapping[key] = value
 
-    mapping = {}
-    reverse_mapping = {}
-    for _, (src, tgt) in dataframe.iterrows():
-        if isinstance(src, str) and isinstance(tgt, str):
-            mapping[_transform_word(src)] = tgt
-            reverse_mapping[_transform_word(tgt)] = src
-    vocab = {
-        "{}-{}".format(*langs): mapping,
-        "{}-{}".format(*reversed(langs)): reverse_mapping
-    }
-    return vocab.get("{}-{}".format(SRC_LANG, TGT_LANG))
-
-
-if DICT_FILE:
-    try:
-        MAPPING = read_dict_excel(DICT_FILE)
-    except FileNotFoundError:
-        MAPPING = {}
-else:
-    MAPPING = {}
-if not MAPPING:
-    warnings.warn(
-        "Can't find mapping {}-{} from dict file for term protecting.".format(SRC_LANG, TGT_LANG))
-MAPPING.update(read_dict_sqlite())
 
-TERM_FILTER = DFAFilter(list(MAPPING.keys()))
+@contextmanager
+def _gc_paused():
+    """
+    with语句中暂停垃圾回收，结束后恢复原来的状态
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
 
 
-def mask_term(sent):
+class TermDictionary():
     """
-    给定一段平行语料，对其中的term进行保护操作
+    一个语言对的术语词典：excel词表或者编译后的词表，加上sqlite中增删的词语。
+    多个翻译模型使用同一个语言对和同一个sqlite数据库时共用一个词典，见get_term_dictionary。
+    增删的词语立即在内存中生效，由TermWriter在后台写入sqlite。
+    其他进程写入的修改由后台线程每隔term_sync_interval_ms从修改记录中读取，只把增量应用到当前进程
     """
-    terms, indexes = TERM_FILTER.filter(sent)
-    if PROTECTION_SYMBOL in sent:
-        return sent, ""
 
-    string_builder = ""
-    prev = 0  # 记录上一个term的位置
-    for i, (start, end) in enumerate(indexes):
-        string_builder += sent[prev:start]
-        string_builder += PROTECTION_SYMBOL + str(i)
-        prev = end
-    string_builder += sent[prev:]
+    def __init__(self, src_lang, tgt_lang, db_path, dict_file=None, compiled_dict=None):
+        self.src_lang = src_lang
+        self.tgt_lang = tgt_lang
+        self.dict_file = dict_file
+        self.compiled_dict = compiled_dict
+        self.vocab = _vocab_class(src_lang, tgt_lang)
+        self.engine = create_term_engine(db_path)
+        # 请求在线程池中处理，每个线程使用各自的session
+        self.session = scoped_session(sessionmaker(bind=self.engine))
+        self.lock = threading.Lock()  # 保护内存中的词典和term filter
+        self.version = 0  # 词典的版本号，每次修改词典后加一
+        self._import_lock = threading.Lock()  # 同时只进行一次批量导入
+        self.change_log = TermChangeLog(self.engine, change_log_table(self.vocab.__table__))
+        self.vocab.metadata.create_all(self.engine)
+        self.writer = TermWriter(self.engine, self.vocab.__table__, self.change_log)
+        self._syncer_pid = None  # 同步线程所在的进程
+
+        # 先记录修改记录的版本号再读取词表，读取期间其他进程写入的修改同步时会再应用一次
+        self._reset_sync()
+        self.mapping = self._load_mapping()
+        self.term_filter = self._create_term_filter(self.mapping)
+        TERM_SYNC_VERSION.labels(self.vocab.__tablename__).set(self.synced_version)
+        # 多进程模式下不把连接池中的连接带到fork出的worker中
+        self.engine.dispose()
+
+    def _load_mapping(self):
+        if self.compiled_dict and os.path.isfile(self.compiled_dict):
+            # sqlite中可能有编译之后新增或者修改的词，放到overlay中，删除的词放到deleted中
+            mapping = TermMapping(CompiledTermDict(self.compiled_dict))
+        else:
+            mapping = self.read_dict_file()
+        _apply_changes(mapping, self.read_dict_sqlite())
+        return mapping
+
+    @staticmethod
+    def _create_term_filter(mapping):
+        # 大词表的自动机由上千万个dict组成，构建过程中暂停垃圾回收，避免反复完整回收时遍历构建了一半的自动机
+        with _gc_paused():
+            if isinstance(mapping, TermMapping):
+                return CompiledTermFilter(mapping)
+            return AhoCorasickFilter(mapping.keys())
+
+    def read_dict_sqlite(self):
+        """
+        从sqlite数据库中读取需要保护的词典，运行时删除的词译文为None
+        """
+        mapping = {}
+        for item in self.session.query(self.vocab):
+            mapping[_transform_word(item.src_word)] = item.tgt_word
+        # 读取完成后归还数据库连接，多进程模式下不会把打开的连接带到fork出的worker中
+        self.session.remove()
+        return mapping
+
+    def read_dict_file(self):
+        """
+        读取excel词表，读取不到时返回空的词典
+        """
+        mapping = None
+        if self.dict_file:
+            try:
+                mapping = read_dict_excel(self.dict_file, self.src_lang, self.tgt_lang)
+            except FileNotFoundError:
+                pass
+        if not mapping:
+            warnings.warn("Can't find mapping {}-{} from dict file for term protecting.".format(
+                self.src_lang, self.tgt_lang))
+        return mapping or {}
+
+    def compile(self, output_path=None):
+        """
+        把excel词表和sqlite中的词编译成二进制文件，配置term_protection_compiled后服务启动时直接加载
+        """
+        self.writer.flush()
+        mapping = self.read_dict_file()
+        _apply_changes(mapping, self.read_dict_sqlite())
+        compile_term_dict(mapping, output_path or self.compiled_dict)
+
+    def mask_term(self, sent):
+        """
+        给定一段平行语料，对其中的term进行保护操作
+        """
+        self._ensure_syncer()
+        if PROTECTION_SYMBOL in sent:
+            return sent, ""
+        terms, indexes = self.term_filter.filter(sent)
+
+        string_builder = []
+        prev = 0  # 记录上一个term的位置
+        for i, (start, end) in enumerate(indexes):
+            string_builder.append(sent[prev:start])
+            string_builder.append(PROTECTION_SYMBOL + str(i))
+            prev = end
+        string_builder.append(sent[prev:])
+
+        return "".join(string_builder), terms
+
+    def de_mask_term(self, sent, terms):
+        """
+        对句子进行去保护
+        """
+        string_builder = []
+        prev = 0  # 记录上一个term的位置
+        for obj in RE_DEMULTY.finditer(sent):
+            start, end = obj.span()
+            string_builder.append(sent[prev:start])
+            prev = end
+            prefix, num = obj.groups()
+            if not prefix.replace(" ", ""):
+                # 如果提取的前缀中只有空格，则跳过
+                continue
+            num = int(num)
+            if num >= len(terms):
+                continue
+            term = terms[num]
+            # 翻译过程中词语可能被删除，此时保留原文
+            string_builder.append(self.mapping.get(_transform_word(term), term))
+
+        string_builder.append(sent[prev:])
+
+        return "".join(string_builder)
+
+    def get_version(self):
+        """
+        返回词典当前的版本号，可以用于判断缓存的翻译结果是否过期
+        """
+        return self.version
+
+    def add_words(self, words):
+        """添加词典"""
+        words = [(src_word, tgt_word) for src_word, tgt_word in words]
+        with self.lock:
+            for src_word, tgt_word in words:
+                self.mapping[_transform_word(src_word)] = tgt_word
+            self.term_filter.update(src_word for src_word, _ in words)
+            self.version += 1
+            self.writer.put(words)
+
+    def delete_words(self, words):
+        """
+        从词典中删除
+        """
+        words = list(words)
+        with self.lock:
+            for word in words:
+                self.mapping.pop(_transform_word(word), None)
+            self.term_filter.difference_update(words)
+            self.version += 1
+            self.writer.put([(word, None) for word in words])
+
+    def import_words(self, term_file, chunk_size=CHUNK_SIZE):
+        """
+        从csv、tsv、xlsx或xls词表中按块导入词语，每块在一个事务中批量写入sqlite，
+        再把这一块的词加入内存中的词典和term filter的overlay，不复制词典也不重建自动机。
+        返回导入的词数、不合法的行数和其中前100个行号。
+        写入数据库时不持有self.lock，导入期间增删、还没有写入的词以导入期间的修改为准。
+        导入的词不逐条记录修改，其他进程读到导入完成时的记录后重新加载整个词典
+        """
+        imported, invalid, invalid_lines = 0, 0, []
+        # 每块词在overlay中新建几十万个dict，导入期间暂停垃圾回收，避免反复完整回收时遍历整个词典
+        with self._import_lock, _gc_paused():
+            for words, lines in read_term_chunks(
+                    term_file, self.src_lang, self.tgt_lang, chunk_size):
+                if words:
+                    # 先写入之前提交的修改，数据库中以导入的词为准
+                    self.writer.write(words, log=False)
+                    with self.lock, self.writer.hold() as pending:
+                        pending = {_transform_word(word) for word in pending}
+                        kept = [(src_word, tgt_word) for src_word, tgt_word in words
+                                if _transform_word(src_word) not in pending]
+                        for src_word, tgt_word in kept:
+                            self.mapping[_transform_word(src_word)] = tgt_word
+                        self.term_filter.update(src_word for src_word, _ in kept)
+                        self.version += 1
+                imported += len(words)
+                invalid += len(lines)
+                invalid_lines.extend(lines[:100 - len(invalid_lines)])
+            # 和启动时加载的词典一样移出垃圾回收的跟踪范围，之后的完整回收不再遍历overlay中的上百万个dict
+            gc.freeze()
+        if imported:
+            self.change_log.mark_reload(self.writer.origin)
+        return {"imported": imported, "invalid": invalid, "invalid_lines": invalid_lines}
+
+    def sync(self):
+        """
+        从修改记录中读取其他进程写入的修改，只把增量应用到内存中的词典和term filter，返回应用的修改数。
+        当前进程还没有写入的词以当前进程的修改为准。
+        其他进程批量导入了词语，或者落后太多、需要的修改记录已经被删除时，重新加载整个词典，返回词典中的词数。
+        版本号在写入时分配，在postgresql等数据库中可能晚于更大的版本号提交，所以每次从synced_version之后重新读取，
+        跳过已经应用的版本号，见_advance
+        """
+        table_name = self.vocab.__tablename__
+        with self.lock, self.writer.hold() as pending:
+            rows = self.change_log.read(self.synced_version)
+            if not rows:
+                return 0
+            origin = self.writer.origin
+            rows = [row for row in rows if row.version not in self._applied]
+            if any(row.src_word == TermChangeLog.RELOAD and row.origin != origin for row in rows) \
+                    or rows and rows[0].version > self.synced_version + 1 and \
+                    self.change_log.oldest_version() > self.synced_version + 1:
+                return self._reload(pending)
+
+            now = time.time()
+            applied = 0
+            changes = {}  # 同一个词的多次修改以最后一次为准
+            for row in rows:
+                self._applied[row.version] = row.created_at
+                if row.origin == origin or row.src_word == TermChangeLog.RELOAD or \
+                        row.src_word in pending:
+                    continue
+                key = _transform_word(row.src_word)
+                if row.tgt_word is None:
+                    self.mapping.pop(key, None)
+                else:
+                    self.mapping[key] = row.tgt_word
+                changes[key] = row.tgt_word
+                TERM_SYNC_LAG.labels(table_name).observe(max(now - row.created_at, 0))
+                applied += 1
+            self.term_filter.difference_update(
+                word for word, value in changes.items() if value is None)
+            self.term_filter.update(word for word, value in changes.items() if value is not None)
+            self._advance(now)
+            if applied:
+                self.version += 1
+        TERM_SYNC_VERSION.labels(table_name).set(self.synced_version)
+        return applied
+
+    def _reload(self, pending):
+        """
+        重新加载整个词典，再应用当前进程还没有写入的修改，调用时需要持有self.lock
+        """
+        logger.info("term dictionary %s is behind version %d, reload it",
+                    self.vocab.__tablename__, self.synced_version)
+        self._reset_sync()
+        mapping = self._load_mapping()
+        _apply_changes(mapping, {_transform_word(word): value for word, value in pending.items()})
+        self.mapping = mapping
+        self.term_filter = self._create_term_filter(mapping)
+        self.version += 1
+        TERM_SYNC_VERSION.labels(self.vocab.__tablename__).set(self.synced_version)
+        return len(mapping)
+
+    def _reset_sync(self):
+        """
+        在读取整个词典之前调用：已经提交的修改记录都包含在读取的词典中，记为已经应用，
+        最近的记录中缺少的版本号可能属于还没有提交的事务，之后同步时再应用
+        """
+        latest = self.change_log.latest_version()
+        self.synced_version = max(latest - TermChangeLog.READ_LIMIT,
+                                  self.change_log.oldest_version() - 1, 0)
+        self._applied = {row.version: row.created_at
+                         for row in self.change_log.read(self.synced_version)}
+        self._advance(time.time())
+
+    def _advance(self, now):
+        """
+        把synced_version推进到连续的已经应用的版本号。缺少的版本号之后的记录写入超过
+        term_sync_gap_timeout_seconds时，认为缺少的版本号属于回滚的事务，不再等待
+        """
+        version = self.synced_version
+        for applied in sorted(self._applied):
+            if applied != version + 1 and now - self._applied[applied] < TERM_SYNC_GAP_TIMEOUT:
+                break
+            version = applied
+        self._applied = {applied: created_at for applied, created_at in self._applied.items()
+                         if applied > version}
+        self.synced_version = version
+
+    def _ensure_syncer(self):
+        # 多进程模式下fork出的worker中没有父进程的线程，每个worker在第一次使用词典时各自启动
+        if self._syncer_pid == os.getpid() or TERM_SYNC_INTERVAL <= 0:
+            return
+        with _SYNCER_LOCK:
+            if self._syncer_pid != os.getpid():
+                self._syncer_pid = os.getpid()
+                threading.Thread(target=self._sync_loop, daemon=True).start()
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(TERM_SYNC_INTERVAL)
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("failed to sync term dictionary %s", self.vocab.__tablename__)
+
+    def iter_words(self, chunk_size=CHUNK_SIZE):
+        """
+        按块返回词典中的词[[src_word, tgt_word]]，不复制整个词典。
+        开始时记录当前的全部原文，之后删除的词不再返回，修改的词返回修改后的译文
+        """
+        with self.lock:
+            keys = list(self.mapping)
+        for start in range(0, len(keys), chunk_size):
+            words = []
+            for key in keys[start:start + chunk_size]:
+                value = self.mapping.get(key)
+                if value is not None:
+                    words.append([key, value])
+            yield words
+
+    def export_words(self, term_file):
+        """
+        把词典中的词逐行写入csv、tsv或xlsx词表，返回导出的词数
+        """
+        return write_term_file(term_file, self.src_lang, self.tgt_lang,
+                               (word for words in self.iter_words() for word in words))
 
-    return string_builder, terms
+    def page_words(self, prefix="", cursor=None, limit=100):
+        """
+        按原文的字典序分页返回以prefix开头的词，cursor为上一页返回的next_cursor，最后一页的next_cursor为None。
+        词语从term filter的前缀树中按顺序取出，每次只取一页的词，total为以prefix开头的词数
+        """
+        prefix = prefix.lstrip().lower()
+        term_filter = self.term_filter
+        words = []
+        next_cursor = None
+        for key in term_filter.iter_words(prefix, cursor or ""):
+            value = self.mapping.get(key)
+            if value is None:
+                continue
+            if len(words) == limit:
+                next_cursor = words[-1][0]
+                break
+            words.append([key, value])
+        total = term_filter.count_words(prefix) if prefix else len(self.mapping)
+        return {
+            "words": words,
+            "total": total,
+            "next_cursor": next_cursor
+        }
+
+    def show_words(self, return_dict=False):
+        """
+        返回当前词典中的全部数据，词典很大时使用page_words或者iter_words
+        """
+        if return_dict:
+            return self.mapping
+        else:
+            return [[key, value] for key, value in self.mapping.items()]
 
 
 RE_DEMULTY = re.compile(
     "([{} ]+)([0-9]+)".format("".join(set(PROTECTION_SYMBOL))))
 
+_DICTIONARIES = {}
+_DICTIONARIES_LOCK = threading.Lock()
+_SYNCER_LOCK = threading.Lock()
 
-def de_mask_term(sent, terms):
-    """
-    对句子进行去保护
-    """
-    string_builder = ""
-    prev = 0  # 记录上一个term的位置
-    for obj in RE_DEMULTY.finditer(sent):
-        start, end = obj.span()
-        string_builder += sent[prev:start]
-        prev = end
-        prefix, num = obj.groups()
-        if not prefix.replace(" ", ""):
-            # 如果提取的前缀中只有空格，则跳过
-            continue
-        num = int(num)
-        if num >= len(terms):
-            continue
-        term = terms[num]
-        string_builder += MAPPING[_transform_word(term)]
-
-    string_builder += sent[prev:]
-
-    return string_builder
-
-
-def add_words(words):
-    """添加词典"""
-    for src_word, tgt_word in words:
-        SESSION.merge(Vocab(src_word=src_word, tgt_word=tgt_word))
-        MAPPING[_transform_word(src_word)] = tgt_word
-        TERM_FILTER.add(src_word)
-    SESSION.commit()
-
-
-def delete_words(words):
+
+def get_term_dictionary(src_lang, tgt_lang, db_path, dict_file=None, compiled_dict=None):
     """
-    从词典中删除
+    返回语言对和数据库对应的词典，相同的词典只加载一次
     """
-    for word in words:
-        MAPPING.pop(_transform_word(word), None)
-        TERM_FILTER.remove(word)
-        SESSION.query(Vocab).filter(Vocab.src_word == word).delete()
-    SESSION.commit()
+    key = (src_lang, tgt_lang, db_path if "://" in db_path else os.path.abspath(db_path))
+    with _DICTIONARIES_LOCK:
+        if key not in _DICTIONARIES:
+            _DICTIONARIES[key] = TermDictionary(src_lang, tgt_lang, db_path, dict_file, compiled_dict)
+        return _DICTIONARIES[key]
+
+
+# 启动配置中的词典，模块中的函数都作用于这个词典，由load_default_dictionary在导入lib_translate时加载
+DEFAULT_DICTIONARY = MAPPING = TERM_FILTER = None
+mask_term = de_mask_term = get_dict_version = None
+add_words = delete_words = show_words = import_words = export_words = compile_dict = None
 
 
-def show_words(return_dict=False):
+def load_default_dictionary():
     """
-    返回当前词典中的全部数据
+    加载启动配置中的词典
     """
-    if return_dict:
-        return MAPPING
-    else:
-        return [[key, value] for key, value in MAPPING.items()]
+    global DEFAULT_DICTIONARY, MAPPING, TERM_FILTER, mask_term, de_mask_term, get_dict_version, \
+        add_words, delete_words, show_words, import_words, export_words, compile_dict
+    DEFAULT_DICTIONARY = get_term_dictionary(SRC_LANG, TGT_LANG, TERM_PROTECTION_DB,
+                                             DICT_FILE, COMPILED_DICT)
+    MAPPING = DEFAULT_DICTIONARY.mapping
+    TERM_FILTER = DEFAULT_DICTIONARY.term_filter
+    mask_term = DEFAULT_DICTIONARY.mask_term
+    de_mask_term = DEFAULT_DICTIONARY.de_mask_term
+    get_dict_version = DEFAULT_DICTIONARY.get_version
+    add_words = DEFAULT_DICTIONARY.add_words
+    delete_words = DEFAULT_DICTIONARY.delete_words
+    show_words = DEFAULT_DICTIONARY.show_words
+    import_words = DEFAULT_DICTIONARY.import_words
+    export_words = DEFAULT_DICTIONARY.export_words
+    compile_dict = DEFAULT_DICTIONARY.compile
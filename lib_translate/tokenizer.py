@@ -9,34 +9,145 @@ method: detokenize
 input_type: List[List[str]]
 output_type: List[str]
 """
-
+import inspect
+import threading
+from collections import OrderedDict
 from functools import partial
 from config import global_config
+from .metrics import Counter
 
 # 获取当前模块有用的配置
 tok_method = global_config["tok_method"]
-tok_src_model = global_config["tok_src_model"]
-tok_tgt_model = global_config["tok_tgt_model"]
+tok_src_model = global_config.get("tok_src_model")
+tok_tgt_model = global_config.get("tok_tgt_model")
+tok_sampling_alpha = global_config.get("tok_sampling_alpha", 0)
+tok_cache_size = global_config.get("tok_cache_size", 100000)
+tok_num_threads = global_config.get("tok_num_threads", 0)
+
+TOKENIZE_CACHE = Counter("translate_tokenize_cache_total",
+                         "Sentences looked up in the tokenizer memo, by result.", ["result"])
+_TOKENIZE_HITS = TOKENIZE_CACHE.labels("hit")
+_TOKENIZE_MISSES = TOKENIZE_CACHE.labels("miss")
+
+
+def get_memoized_tokenize(encode, max_size):
+    """
+    在encode外面加一层按句子数LRU淘汰的缓存，同一次调用中没有命中的句子去重后一次交给encode
+    >>> calls = []
+    >>> tokenize = get_memoized_tokenize(lambda sents: calls.append(sents) or [s.split() for s in sents], 2)
+    >>> tokenize(["a b", "c", "a b"])
+    [['a', 'b'], ['c'], ['a', 'b']]
+    >>> tokenize(["c", "d"])
+    [['c'], ['d']]
+    >>> calls
+    [['a b', 'c'], ['d']]
+    """
+    memo = OrderedDict()  # 句子 -> tuple(子词)
+    lock = threading.Lock()
+
+    def tokenize(sents):
+        outputs = [None] * len(sents)
+        missing = []
+        with lock:
+            for i, sent in enumerate(sents):
+                tokens = memo.get(sent)
+                if tokens is None:
+                    missing.append(i)
+                else:
+                    memo.move_to_end(sent)
+                    outputs[i] = list(tokens)
+        _TOKENIZE_HITS.inc(len(sents) - len(missing))
+        if not missing:
+            return outputs
 
+        _TOKENIZE_MISSES.inc(len(missing))
+        unique_sents = list(dict.fromkeys(sents[i] for i in missing))
+        encoded = {sent: tuple(tokens) for sent, tokens in zip(unique_sents, encode(unique_sents))}
+        with lock:
+            memo.update(encoded)
+            for sent in encoded:
+                memo.move_to_end(sent)
+            while len(memo) > max_size:
+                memo.popitem(last=False)
+        for i in missing:
+            outputs[i] = list(encoded[sents[i]])
+        return outputs
+    return tokenize
 
-def get_spm_tokenizer():
+
+def _thread_args(method, num_threads):
+    # 0.1.96之前的SentencePiece不支持num_threads，整个batch仍然是一次调用
+    try:
+        supported = "num_threads" in inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        supported = False
+    return {"num_threads": num_threads} if num_threads and supported else {}
+
+
+def get_spm_tokenizer(src_model=tok_src_model, tgt_model=tok_tgt_model,
+                      sampling_alpha=tok_sampling_alpha, cache_size=tok_cache_size,
+                      num_threads=tok_num_threads):
+    """
+    推理时默认使用确定的分词结果；sampling_alpha大于0时开启子词采样，同一句话每次的分词结果可能不同，
+    这时不使用分词缓存。所有句子一次交给SentencePiece分词和去分词，num_threads为其使用的线程数
+    """
     import sentencepiece as spm
-    src_tokenizer = spm.SentencePieceProcessor(model_file=tok_src_model)
-    if tok_tgt_model == tok_src_model:
+    src_tokenizer = spm.SentencePieceProcessor(model_file=src_model)
+    if tgt_model == src_model:
         tgt_tokenizer = src_tokenizer
-    else:  
-        tgt_tokenizer = spm.SentencePieceProcessor(model_file=tok_tgt_model)
-    
-    tokenize = partial(src_tokenizer.encode, out_type=str, alpha=0.1)
-    detokenize = tgt_tokenizer.decode
+    else:
+        tgt_tokenizer = spm.SentencePieceProcessor(model_file=tgt_model)
+
+    encode_args = dict(out_type=str, **_thread_args(src_tokenizer.Encode, num_threads))
+    if sampling_alpha > 0:
+        encode_args.update(enable_sampling=True, nbest_size=-1, alpha=sampling_alpha)
+    tokenize = partial(src_tokenizer.encode, **encode_args)
+    if sampling_alpha <= 0 and cache_size > 0:
+        tokenize = get_memoized_tokenize(tokenize, cache_size)
+    detokenize = partial(tgt_tokenizer.decode, **_thread_args(tgt_tokenizer.Decode, num_threads))
     return tokenize, detokenize
 
 
-# 基于 SentencePiece 的分词
-if tok_method == "spm":
-    tokenize, detokenize = get_spm_tokenizer()
-else:
-    raise AttributeError("Unsupported tok_method: {}".format(tok_method))
+def get_stub_tokenizer():
+    """
+    用于性能测试的分词器，按空格分词，不需要分词模型
+    >>> tokenize, detokenize = get_stub_tokenizer()
+    >>> tokenize(["a b", "c"])
+    [['a', 'b'], ['c']]
+    >>> detokenize([['a', 'b'], ['c']])
+    ['a b', 'c']
+    """
+    def tokenize(sents):
+        return [sent.split() for sent in sents]
+
+    def detokenize(tokens):
+        return [" ".join(item) for item in tokens]
+    return tokenize, detokenize
+
+
+def get_tokenizer(src_model=tok_src_model, tgt_model=tok_tgt_model):
+    """
+    按照tok_method获取分词和去分词方法，替换模型时可以指定新的分词模型
+    """
+    # 基于 SentencePiece 的分词
+    if tok_method == "spm":
+        return get_spm_tokenizer(src_model, tgt_model)
+    elif tok_method == "stub":
+        return get_stub_tokenizer()
+    else:
+        raise AttributeError("Unsupported tok_method: {}".format(tok_method))
+
+
+# 启动配置中的分词方法，由load_default_tokenizer在导入lib_translate时加载
+tokenize = detokenize = None
+
+
+def load_default_tokenizer():
+    """
+    加载启动配置中的分词模型
+    """
+    global tokenize, detokenize
+    tokenize, detokenize = get_tokenizer()
 
 
 __all__ = ["tokenize", "detokenize"]
\ No newline at end of file
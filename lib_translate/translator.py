@@ -4,13 +4,20 @@ method: translate
 input type: List[List[str]]
 output type: List[List[str]]
 """
-from itertools import chain
+import threading
 from config import global_config
+from .metrics import STAGE_LATENCY, DECODE_SENTENCES, DECODE_TOKENS
 
 # 获取当前模块有用的配置
 translate_method = global_config["translate_method"]
-translate_model = global_config["translate_model"]
-translate_model_device = global_config["translate_model_device"]
+translate_model = global_config.get("translate_model")
+translate_model_device = global_config.get("translate_model_device", "cpu")
+translate_inter_threads = global_config.get("translate_inter_threads", 1)
+translate_intra_threads = global_config.get("translate_intra_threads", 4)
+translate_compute_type = global_config.get("translate_compute_type", "default")
+translate_beam_size = global_config.get("translate_beam_size", 2)
+translate_max_batch_size = global_config.get("translate_max_batch_size", 0)
+worker_processes = global_config.get("worker_processes", 1)
 
 # 使用opennmt训练的翻译模型
 if translate_method == "opennmt":
@@ -19,32 +26,119 @@ if translate_method == "opennmt":
         translate_model_device, device_index = translate_model_device.split(":")
     else:
         device_index = "0"
-    translator = ctranslate2.Translator(translate_model,
-                                        device=translate_model_device,
-                                        device_index=int(device_index))
 
-    def translate(tokens):
-        model_output = translator.translate_batch(tokens)
+    def load_translator(compute_type=translate_compute_type,
+                        inter_threads=translate_inter_threads,
+                        intra_threads=translate_intra_threads,
+                        model_path=translate_model):
+        return ctranslate2.Translator(model_path,
+                                      device=translate_model_device,
+                                      device_index=int(device_index),
+                                      compute_type=compute_type,
+                                      inter_threads=inter_threads,
+                                      intra_threads=intra_threads)
+
+    def _translate(translator, tokens, beam_size=translate_beam_size,
+                   max_batch_size=translate_max_batch_size):
+        model_output = translator.translate_batch(tokens, beam_size=beam_size,
+                                                  max_batch_size=max_batch_size)
         output_tokens = [item[0]["tokens"] for item in model_output]
         return output_tokens
 
 elif translate_method == "fairseq":
     from fairseq.models.transformer import TransformerModel
-    translator = TransformerModel.from_pretrained(
-        translate_model,
-        checkpoint_file='checkpoint_best.pt',
-        data_name_or_path=translate_model,  # 指定存储词表的文件
-        beam=3
-    )
-    translator.to(translate_model_device)
-    translator.eval()
-
-    def translate(tokens):
+
+    # 量化和线程数只对ctranslate2模型有效，三种翻译模型的加载函数接受相同的参数
+    def load_translator(compute_type=None, inter_threads=None, intra_threads=None,
+                        model_path=translate_model):
+        translator = TransformerModel.from_pretrained(
+            model_path,
+            checkpoint_file='checkpoint_best.pt',
+            data_name_or_path=model_path,  # 指定存储词表的文件
+            beam=global_config.get("translate_beam_size", 3)
+        )
+        translator.to(translate_model_device)
+        translator.eval()
+        return translator
+
+    def _translate(translator, tokens):
         input_sents = [" ".join(item) for item in tokens]
         model_output = translator.translate(input_sents)
         output_tokens = [[i for i in item.split(" ") if i != "<unk>"] for item in model_output]
         return output_tokens
+elif translate_method == "stub":
+    # 用于性能测试的假翻译模型，不需要模型文件
+    import time
+    stub_latency = global_config.get("stub_latency_ms", 20) / 1000
+    stub_latency_per_token = global_config.get("stub_latency_per_token_ms", 0.05) / 1000
+
+    class StubTranslator():
+        """
+        原样返回输入的子词，并按照batch补齐后的token数等待一段时间，模拟翻译模型的耗时。
+        等待时释放GIL，与真实的翻译模型一样不会阻塞其他线程
+        >>> StubTranslator(0, 0).translate_batch([["▁a", "b"]])
+        [[{'tokens': ['▁a', 'b']}]]
+        """
+
+        def __init__(self, latency, latency_per_token):
+            self.latency = latency
+            self.latency_per_token = latency_per_token
+
+        def translate_batch(self, tokens):
+            padded = max((len(item) for item in tokens), default=0) * len(tokens)
+            time.sleep(self.latency + self.latency_per_token * padded)
+            return [[{"tokens": list(item)}] for item in tokens]
+
+    def load_translator(compute_type=None, inter_threads=None, intra_threads=None,
+                        model_path=None):
+        return StubTranslator(stub_latency, stub_latency_per_token)
+
+    def _translate(translator, tokens):
+        model_output = translator.translate_batch(tokens)
+        return [item[0]["tokens"] for item in model_output]
 else:
     raise AttributeError("Unsupported translation method: {}".format(translate_method))
 
+# ctranslate2的线程池和cuda在fork之后都不能继续使用，
+# 所以多进程模式下翻译模型由每个worker进程在fork之后第一次翻译时加载，
+# 单进程模式下由load_default_translator在导入lib_translate时加载
+translator = None
+_translator_lock = threading.Lock()
+
+
+def get_translator():
+    """
+    返回当前进程的翻译模型，还没有加载时进行加载
+    """
+    global translator
+    if translator is None:
+        with _translator_lock:
+            if translator is None:
+                translator = load_translator()
+    return translator
+
+
+def load_default_translator():
+    """
+    单进程模式下加载当前进程的翻译模型，多进程模式下不加载
+    """
+    if worker_processes == 1:
+        get_translator()
+
+
+DECODE_LATENCY = STAGE_LATENCY.labels("translate")
+
+
+def translate(tokens, translator=None):
+    """
+    使用translator进行翻译，没有指定时使用当前进程的翻译模型
+    """
+    DECODE_SENTENCES.observe(len(tokens))
+    DECODE_TOKENS.inc(sum(len(item) for item in tokens))
+    if translator is None:
+        translator = get_translator()
+    with DECODE_LATENCY.time():
+        return _translate(translator, tokens)
+
+
 __all__ = ["translate"]
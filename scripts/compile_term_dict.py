@@ -0,0 +1,32 @@
+"""
+把excel词表和sqlite中的词编译成二进制文件，服务启动时通过mmap加载
+python scripts/compile_term_dict.py --output mount/dict.bin
+"""
+import argparse
+
+from lib_translate.term_protection import compile_dict, COMPILED_DICT
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", type=str, default=COMPILED_DICT,
+                        help="输出文件的路径，默认为配置文件中的term_protection_compiled")
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    """
+    脚本入口函数
+    """
+    args = parse_args()
+    if not args.output:
+        raise AttributeError("Please specify --output or term_protection_compiled in config file.")
+    compile_dict(args.output)
+
+
+if __name__ == "__main__":
+    main()
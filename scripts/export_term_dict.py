@@ -0,0 +1,29 @@
+"""
+把excel词表和sqlite中的词导出为csv、tsv或xlsx词表
+python scripts/export_term_dict.py --output mount/terms.csv
+"""
+import argparse
+
+from lib_translate.term_protection import export_words
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", type=str, required=True, help="输出的词表文件")
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    """
+    脚本入口函数
+    """
+    args = parse_args()
+    print("exported {} words".format(export_words(args.output)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+把csv、tsv、xlsx或xls词表批量导入配置文件中的词典，第一行为列名，分别是源语言和目标语言的简称
+python scripts/import_term_dict.py --input mount/terms.csv
+"""
+import argparse
+import time
+
+from lib_translate.term_protection import import_words
+from lib_translate.term_io import CHUNK_SIZE
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", type=str, required=True, help="需要导入的词表文件")
+    parser.add_argument("--chunk_size", type=int, default=CHUNK_SIZE, help="每个事务写入的词数")
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    """
+    脚本入口函数
+    """
+    args = parse_args()
+    start = time.perf_counter()
+    result = import_words(args.input, args.chunk_size)
+    print("imported {} words in {:.1f}s, {} invalid lines {}".format(
+        result["imported"], time.perf_counter() - start, result["invalid"],
+        result["invalid_lines"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+在本机上对ctranslate2翻译模型的参数进行网格搜索：用样例语料分别测试每组参数的吞吐量和延迟，
+并以当前配置的翻译结果为参照计算BLEU，观察量化、beam_size等参数对翻译质量的影响。
+满足质量和延迟要求的参数中吞吐量最高的一组会写入--output指定的配置文件，供人工确认后替换mount/config.yaml
+python scripts/tune_translator.py --compute_types default int8 int16 --intra_threads 1 2 4
+"""
+import argparse
+import importlib
+import itertools
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+from nltk.translate.bleu_score import corpus_bleu, SmoothingFunction
+
+from config import global_config
+from lib_translate import mask_term, processor, sent_splitter, tokenize, detokenize
+
+translator_module = importlib.import_module("lib_translate.translator")
+
+CWD = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TUNED_KEYS = ["translate_compute_type", "translate_inter_threads", "translate_intra_threads",
+              "translate_beam_size", "translate_max_batch_size"]
+
+
+def parse_args():
+    """
+    解析脚本命令行参数
+    """
+    src_lang = global_config["translate_src_lang"]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=os.path.join(CWD, "test", "assets", src_lang),
+                        help="样例语料，每行一条输入")
+    parser.add_argument("--compute_types", nargs="+", default=["default", "int8", "int16"])
+    parser.add_argument("--inter_threads", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--intra_threads", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--beam_sizes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--max_batch_sizes", type=int, nargs="+", default=[0, 16])
+    parser.add_argument("--request_size", type=int, default=8,
+                        help="每次调用translate_batch的句子数，模拟服务合并后的batch")
+    parser.add_argument("--max_bleu_drop", type=float, default=1.0,
+                        help="与当前配置相比允许下降的BLEU")
+    parser.add_argument("--max_p95_ms", type=float, default=0,
+                        help="每次调用的p95延迟上限（毫秒），设置为0时不限制")
+    parser.add_argument("--oversubscribe", action="store_true",
+                        help="允许inter_threads * intra_threads超过cpu核数")
+    parser.add_argument("--output", default=os.path.join(CWD, "mount", "config.tuned.yaml"),
+                        help="写入最优参数的配置文件")
+    args = parser.parse_args()
+    return args
+
+
+def read_batches(corpus, request_size):
+    """
+    按服务中的流程对语料进行术语保护、预处理、分句和分词，返回每次调用翻译模型的输入
+    """
+    sents = []
+    with open(corpus, "r", encoding="utf-8") as input_file:
+        for line in input_file:
+            if line.strip():
+                text, _ = mask_term(line.strip())
+                sents.extend(sent_splitter(processor(text)))
+    tokens = tokenize(sents)
+    return [tokens[i: i + request_size] for i in range(0, len(tokens), request_size)]
+
+
+def bleu_tokens(text):
+    # 中文按字计算BLEU
+    if global_config["translate_tgt_lang"] == "zh":
+        return [char for char in text if not char.isspace()]
+    return text.split()
+
+
+def run(translator, batches, inter_threads, beam_size, max_batch_size):
+    """
+    用inter_threads个线程并发调用翻译模型，返回译文、总耗时和每次调用的耗时
+    """
+    def call(batch):
+        start = time.perf_counter()
+        output = translator_module._translate(translator, batch, beam_size=beam_size,
+                                              max_batch_size=max_batch_size)
+        return output, time.perf_counter() - start
+
+    call(batches[0])  # 预热
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=inter_threads) as executor:
+        results = list(executor.map(call, batches))
+    total = time.perf_counter() - start
+    outputs = [sent for output, _ in results for sent in output]
+    latencies = sorted(cost for _, cost in results)
+    return detokenize(outputs), total, latencies
+
+
+def main():
+    """
+    脚本入口函数
+    """
+    args = parse_args()
+    if translator_module.translate_method != "opennmt":
+        raise AttributeError("Only opennmt (ctranslate2) models can be tuned.")
+    batches = read_batches(args.corpus, args.request_size)
+    n_sents = sum(len(batch) for batch in batches)
+
+    baseline = {key: getattr(translator_module, key) for key in TUNED_KEYS}
+    references, _, _ = run(translator_module.get_translator(), batches,
+                           baseline["translate_inter_threads"],
+                           baseline["translate_beam_size"], baseline["translate_max_batch_size"])
+    references = [[bleu_tokens(text)] for text in references]
+    # 只保留一个模型在内存中
+    translator_module.translator = None
+
+    cpu_count = os.cpu_count() or 1
+    results = []
+    print("{:>10} {:>6} {:>6} {:>5} {:>6} {:>10} {:>9} {:>8}".format(
+        "compute", "inter", "intra", "beam", "max_bs", "sents/s", "p95(ms)", "BLEU"))
+    for compute_type, inter_threads, intra_threads in itertools.product(
+            args.compute_types, args.inter_threads, args.intra_threads):
+        if inter_threads * intra_threads > cpu_count and not args.oversubscribe:
+            continue
+        try:
+            translator = translator_module.load_translator(compute_type, inter_threads, intra_threads)
+        except ValueError as e:
+            # 当前设备不支持的compute_type
+            print("{:>10} skipped: {}".format(compute_type, e))
+            continue
+        for beam_size, max_batch_size in itertools.product(args.beam_sizes, args.max_batch_sizes):
+            outputs, total, latencies = run(translator, batches, inter_threads,
+                                            beam_size, max_batch_size)
+            bleu = corpus_bleu(references, [bleu_tokens(text) for text in outputs],
+                               smoothing_function=SmoothingFunction().method1) * 100
+            p95 = latencies[max(math.ceil(len(latencies) * 0.95), 1) - 1] * 1000
+            setting = dict(zip(TUNED_KEYS, (compute_type, inter_threads, intra_threads,
+                                            beam_size, max_batch_size)))
+            results.append((setting, n_sents / total, p95, bleu))
+            print("{:>10} {:>6} {:>6} {:>5} {:>6} {:>10.1f} {:>9.1f} {:>8.2f}".format(
+                compute_type, inter_threads, intra_threads, beam_size, max_batch_size,
+                n_sents / total, p95, bleu))
+        del translator
+
+    candidates = [item for item in results
+                  if item[3] >= 100 - args.max_bleu_drop
+                  and (not args.max_p95_ms or item[2] <= args.max_p95_ms)]
+    if not candidates:
+        print("No setting satisfies the quality and latency limits.")
+        return
+    setting, speed, p95, bleu = max(candidates, key=lambda item: item[1])
+    print("best: {} ({:.1f} sents/s, p95 {:.1f}ms, BLEU {:.2f} against the current config)".format(
+        setting, speed, p95, bleu))
+
+    tuned_config = {key: value for key, value in global_config.items() if key != "serve_port"}
+    tuned_config.update(setting)
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        output_file.write("# 由scripts/tune_translator.py生成，当前配置: {}\n".format(baseline))
+        output_file.write("# {:.1f} sents/s, p95 {:.1f}ms, BLEU {:.2f}\n".format(speed, p95, bleu))
+        yaml.dump(tuned_config, output_file, allow_unicode=True, sort_keys=False)
+    print("tuned config is written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
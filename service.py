@@ -1,47 +1,103 @@
 """
 服务启动入口
 """
+import gc
 import os
 import logging
+import signal
 from logging.handlers import TimedRotatingFileHandler
 
 import tornado
+import tornado.netutil
+import tornado.process
 import app
+from app.request_log import queue_logging
 from config import global_config
 
 # 加载所需要的配置
 LOG_DIR = global_config["logdir"]
 SERVE_PORT = global_config["serve_port"]
+WORKER_PROCESSES = global_config.get("worker_processes", 1)
+WORKER_MAX_RESTARTS = global_config.get("worker_max_restarts", 100)
 
-def config_logging():
+
+def config_logging(log_name="TranslationLog"):
     """
-    配置服务日志
+    配置服务日志，日志由后台线程写入文件和标准错误输出，见app/request_log.py
     """
     log_fmt = '%(asctime)s\tFile\"%(filename)s\",line%(lineno)s\t%(levelname)s:%(message)s'
     formatter = logging.Formatter(log_fmt)
     # S 秒，D 天， M 分钟， H 小时，下面代表每间隔一天生成一个日志文件，每10天定时删除，日志文件存放在log目录下，前缀是translation
-    log_file_handler = TimedRotatingFileHandler(filename=os.path.join(LOG_DIR, "TranslationLog"),
+    log_file_handler = TimedRotatingFileHandler(filename=os.path.join(LOG_DIR, log_name),
                                                 when="D",
                                                 interval=1,
                                                 backupCount=10)
     log_file_handler.setFormatter(formatter)
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger()
-    logger.addHandler(log_file_handler)
+    queue_logging([log_file_handler], level=logging.INFO)
+
+
+def stop_on_sigterm():
+    """
+    收到SIGTERM时停止IOLoop，使进程正常退出，atexit中注册的清理（如写入词典的修改）得以执行
+    """
+    loop = tornado.ioloop.IOLoop.current()
+    signal.signal(signal.SIGTERM, lambda *_: loop.add_callback_from_signal(loop.stop))
+
+
+def terminate_workers(*_):
+    """
+    多进程模式下父进程把SIGTERM转发给所有worker，不再重新拉起退出的worker。
+    等所有worker执行完atexit中的清理之后父进程才退出：容器中父进程是1号进程，
+    它退出时内核会直接杀掉其余的进程
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    os.killpg(os.getpgid(0), signal.SIGTERM)
+    while True:
+        try:
+            os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+    raise SystemExit(0)
 
 
 def main():
     """
     服务启动入口函数
     """
-    config_logging()
+    # import时加载的模型和词典一直使用到进程退出，移出垃圾回收的跟踪范围，
+    # 多进程模式下fork之后的垃圾回收也不会因为写入这些对象的头部而复制共享的内存页
+    gc.freeze()
+    if WORKER_PROCESSES == 1:
+        config_logging()
+        sockets = None
+    else:
+        # 多进程模式：先在父进程中绑定端口再fork，所有worker共享同一个监听socket。
+        # 分词模型、术语词典等在import时已经加载，fork之后各worker以写时复制的方式共享，
+        # 翻译模型由每个worker在fork之后各自加载。worker异常退出时由父进程重新拉起。
+        sockets = tornado.netutil.bind_sockets(SERVE_PORT)
+        signal.signal(signal.SIGTERM, terminate_workers)
+        # worker不继承父进程的处理方法，在stop_on_sigterm之前收到SIGTERM时直接退出
+        os.register_at_fork(after_in_child=lambda: signal.signal(signal.SIGTERM, signal.SIG_DFL))
+        task_id = tornado.process.fork_processes(WORKER_PROCESSES, WORKER_MAX_RESTARTS)
+        # 每个worker写各自的日志文件，避免多个进程同时滚动同一个日志文件
+        config_logging("TranslationLog.{}".format(task_id))
     # 对服务的配置问题
     application = tornado.web.Application(
-        [(r'/yyq/translate', app.TranslateHandler)]
+        [(r'/yyq/translate', app.TranslateHandler),
+         # 配置中models的翻译模型：/{who}/translate/{domain}/{src}/{tgt}
+         (r'/(\w+)/translate/(\w+)/(\w+)/(\w+)', app.TranslateHandler),
+         (r'/metrics', app.MetricsHandler),
+         (r'/ready', app.ReadyHandler)]
     )
     http_server = tornado.httpserver.HTTPServer(application)
     # 2. 服务端口
-    http_server.listen(SERVE_PORT)
+    if sockets is None:
+        http_server.listen(SERVE_PORT)
+    else:
+        http_server.add_sockets(sockets)
+    stop_on_sigterm()
+    # 端口打开后在后台加载翻译模型并预热，完成之前/ready返回503
+    tornado.ioloop.IOLoop.current().spawn_callback(app.warm_up)
     tornado.ioloop.IOLoop.current().start()
 
 
@@ -0,0 +1,53 @@
+"""
+测试FastBasicTokenizer，分词结果应当与BasicTokenizer完全一致
+"""
+import os
+import random
+
+from lib_translate.bert_tokenizer import BasicTokenizer, FastBasicTokenizer
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+# 空白、控制字符、标点、全角符号、带重音的字母、组合字符以及各个CJK区间的字符
+SPECIAL_CHARS = (" \t\n\r\x00\x07\x1f\x85\xa0\u200b\u2028\u3000\ufeff\ufffd"
+                 "!$^`~,.;:?()[]{}，。；：？！“”、…·¿"
+                 "ÀÉîõüÇñİẞ\u0301\u0308\u037e\u1fef"
+                 "中文\u3400\uf900\U00020000\U0002a700\U0002f800한국어カタカナ")
+
+
+def _random_text(rnd):
+    chars = []
+    for _ in range(rnd.randint(0, 40)):
+        if rnd.random() < 0.5:
+            chars.append(rnd.choice(SPECIAL_CHARS))
+        elif rnd.random() < 0.5:
+            chars.append(rnd.choice("abcXYZ019 "))
+        else:
+            chars.append(chr(rnd.randint(0, 0x2ffff)))
+    return "".join(chars)
+
+
+def test_same_as_basic_tokenizer():
+    """
+    随机生成包含各类字符的文本，对比两个分词器的结果
+    """
+    rnd = random.Random(0)
+    for do_lower_case in (False, True):
+        basic = BasicTokenizer(do_lower_case=do_lower_case)
+        fast = FastBasicTokenizer(do_lower_case=do_lower_case)
+        for _ in range(5000):
+            text = _random_text(rnd)
+            assert fast.tokenize(text) == basic.tokenize(text), repr(text)
+
+
+def test_assets():
+    """
+    对比两个分词器在测试语料上的结果
+    """
+    for do_lower_case in (False, True):
+        basic = BasicTokenizer(do_lower_case=do_lower_case)
+        fast = FastBasicTokenizer(do_lower_case=do_lower_case)
+        for lang in ("zh", "en"):
+            with open(os.path.join(ASSETS_DIR, lang), "r", encoding="utf-8") as input_file:
+                for line in input_file:
+                    assert fast.tokenize(line) == basic.tokenize(line)
+                    assert fast.tokenize(line.encode("utf-8")) == basic.tokenize(line)
@@ -4,7 +4,9 @@
 import argparse
 import os
 from test.test_service import (test_method_term_protection,
-                               test_method_translate, test_performance)
+                               test_method_translate,
+                               test_method_translate_batch,
+                               test_method_translate_stream, test_performance)
 
 
 def parse_args():
@@ -33,6 +35,8 @@ def test_deployment(folder, ipaddr, port):
         src_lang = name.split("_")[-2]
         url = url_base + "/" + name.replace("_", "/")
         test_method_translate(url, src_lang)
+        test_method_translate_batch(url, src_lang)
+        test_method_translate_stream(url, src_lang)
         test_method_term_protection(url)
         test_performance(url, src_lang)
 
@@ -0,0 +1,59 @@
+"""
+测试后处理流水线，合并后的执行计划应当与原来逐个后处理器执行的结果完全一致
+"""
+import random
+import re
+
+from lib_translate.postprocessor import compile_pipeline, get_remove_whitespace_postprocessor
+
+ALPHABET = "ab19 \t\n　,.?;():!，。中文•-"
+
+
+def _reference_remove_whitespace(line):
+    re_han = re.compile("([^A-Za-z0-9])(\\s+)([^A-Za-z0-9])")
+    while re_han.search(line):
+        line = re_han.sub("\\g<1>\\g<3>", line)
+    return line
+
+
+def _reference_chinesepunc(line):
+    punc_mapping = {",": "，", ".": "。", "?": "？", ";": "；",
+                    "(": "（", ")": "）", ":": "：", "!": "！"}
+    regx = re.compile('(?<![0-9A-Za-z])[{}](?![0-9A-Za-z])'.format("".join(punc_mapping)))
+    return regx.sub(lambda match_obj: punc_mapping[match_obj.group(0)], line)
+
+
+def _random_text(rnd):
+    return "".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(0, 40)))
+
+
+def test_remove_whitespace():
+    """
+    单次扫描删除空白与原来反复替换的结果一致
+    """
+    rnd = random.Random(0)
+    processor = get_remove_whitespace_postprocessor()
+    for _ in range(20000):
+        text = _random_text(rnd)
+        assert processor(text) == _reference_remove_whitespace(text), repr(text)
+
+
+def test_fused_pipeline():
+    """
+    合并成一次扫描的remove_whitespace和chinesepunc与依次执行的结果一致
+    """
+    rnd = random.Random(1)
+    references = {
+        "remove_whitespace": _reference_remove_whitespace,
+        "chinesepunc": _reference_chinesepunc
+    }
+    for pipeline in (["remove_whitespace", "chinesepunc"], ["chinesepunc", "remove_whitespace"]):
+        plan = compile_pipeline(pipeline)
+        assert len(plan) == 1
+        _, fused = plan[0]
+        for _ in range(20000):
+            text = _random_text(rnd)
+            expected = text
+            for item in pipeline:
+                expected = references[item](expected)
+            assert fused(text) == expected, repr(text)
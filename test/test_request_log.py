@@ -0,0 +1,95 @@
+"""
+测试请求日志的截断、抽样、最慢请求的记录和日志队列满时的丢弃
+"""
+import json
+import logging
+import queue
+
+from app.request_log import DroppingQueueHandler, RequestLog, LOG_RECORDS_DROPPED
+
+
+class _ListHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _capture():
+    handler = _ListHandler()
+    logger = logging.getLogger("app.request_log")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return handler
+
+
+def _entries(handler, prefix):
+    return [json.loads(message[len(prefix):]) for message in handler.messages
+            if message.startswith(prefix)]
+
+
+def test_truncate_and_sample():
+    """
+    抽中的请求和失败的请求按字符截断，没有抽中的请求只记录耗时等信息
+    """
+    handler = _capture()
+    try:
+        body = json.dumps({"input": "你好世界" * 10}, ensure_ascii=False).encode("utf-8")
+        RequestLog(max_chars=12, sample_rate=1, slowest=0).log("/a", "200", 0.1, body, "{}")
+        RequestLog(max_chars=12, sample_rate=0, slowest=0).log("/b", "200", 0.1, body, "{}")
+        RequestLog(max_chars=12, sample_rate=0, slowest=0).log("/c", "500", 0.1, b"{", "{}")
+        sampled, skipped, failed = _entries(handler, "请求日志：")
+        assert sampled["body"] == '{"input": "你...(truncated)'
+        assert sampled["response"] == "{}"
+        assert sampled["request_bytes"] == len(body)
+        assert "body" not in skipped and skipped["uri"] == "/b"
+        assert failed["body"] == "{"
+    finally:
+        logging.getLogger("app.request_log").removeHandler(handler)
+
+
+def test_slowest():
+    """
+    每个时间段结束时按耗时从高到低记录最慢请求的完整内容
+    """
+    handler = _capture()
+    try:
+        request_log = RequestLog(max_chars=1, sample_rate=0, slowest=2, interval=3600)
+        for index in range(5):
+            request_log.log("/", "200", index / 10, ("x" * index).encode("utf-8"),
+                            "y" * index)
+        assert not _entries(handler, "最慢请求：")
+        request_log.flush_slowest()
+        slowest = _entries(handler, "最慢请求：")
+        assert [(entry["rank"], entry["seconds"], entry["body"], entry["response"])
+                for entry in slowest] == [(1, 0.4, "xxxx", "yyyy"), (2, 0.3, "xxx", "yyy")]
+        request_log.flush_slowest()
+        assert len(_entries(handler, "最慢请求：")) == 2
+    finally:
+        logging.getLogger("app.request_log").removeHandler(handler)
+
+
+def test_drop_when_full():
+    """
+    队列满时不阻塞，丢弃的记录按级别计数
+    """
+    handler = DroppingQueueHandler(queue.Queue(1))
+    logger = logging.getLogger("test_request_log.drop")
+    logger.propagate = False
+    logger.addHandler(handler)
+    dropped = LOG_RECORDS_DROPPED.labels("WARNING")
+    before = dropped.value
+    logger.warning("first")
+    logger.warning("second")
+    logger.warning("third")
+    assert dropped.value - before == 2
+    assert handler.queue.get_nowait().getMessage() == "first"
+
+
+if __name__ == "__main__":
+    test_truncate_and_sample()
+    test_slowest()
+    test_drop_when_full()
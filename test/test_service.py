@@ -62,6 +62,63 @@ def test_method_translate(url, src_lang):
     assert response_data["status"] == "200"
 
 
+def test_method_translate_batch(url, src_lang):
+    """
+    测试批量翻译接口
+    """
+    if src_lang == "zh":
+        sents = ["正确使用数据操作，掌握排序与限量", "坡度差"]
+    elif src_lang == "en":
+        sents = ["Please input a word.", "How are you?"]
+    else:
+        raise NotImplementedError(
+            "Test cases for source language "
+            "{} have not been NotImplemented yet. ".format(src_lang))
+    data = {
+        "method": "translate_batch",
+        "data": {
+            "inputs": sents + [None]
+        }
+    }
+    result = requests.post(url, json=data)
+    response_data = json.loads(result.text)
+    assert response_data["status"] == "200"
+    translations = response_data["data"]["translations"]
+    assert len(translations) == len(sents) + 1
+    for item in translations[:-1]:
+        assert item["status"] == "200"
+    # 不合法的输入只影响自身
+    assert translations[-1]["status"] == "500"
+
+
+def test_method_translate_stream(url, src_lang):
+    """
+    测试流式翻译接口
+    """
+    # 从assets文件夹中取出对应的测试语料，拼成一个长文档
+    test_file = os.path.join(CWD, "assets", src_lang)
+    if not os.path.exists(test_file):
+        raise NotImplementedError(
+            "Test cases for source language "
+            "{} have not been NotImplemented yet. ".format(src_lang))
+    with open(test_file, "r") as f_open:
+        text = "".join(f_open.readlines()[:5])
+    data = {
+        "method": "translate_stream",
+        "data": {
+            "input": text
+        }
+    }
+    result = requests.post(url, json=data, stream=True)
+    indexes = []
+    for line in result.iter_lines():
+        response_data = json.loads(line)
+        assert response_data["status"] == "200"
+        indexes.append(response_data["data"]["index"])
+    assert indexes == list(range(len(indexes)))
+    assert indexes
+
+
 def test_method_term_protection(url):
     """
     测试术语保护相关的接口
@@ -81,13 +138,16 @@ def test_method_term_protection(url):
     response_data = json.loads(result.text)
     assert response_data["status"] == "200"
 
-    # 请求获取当前所有词典
-    data = {
-        "method": "show_words"
-    }
-    result = requests.post(url, json=data)
-    response_data = json.loads(result.text)
+    # 按前缀查询添加的词
     for item in words:
+        data = {
+            "method": "show_words",
+            "data": {
+                "prefix": item[0]
+            }
+        }
+        result = requests.post(url, json=data)
+        response_data = json.loads(result.text)
         assert item in response_data["data"]["words"]
 
     # 请求翻译
@@ -117,6 +177,8 @@ def main():
     url = "http://127.0.0.1:{}/yyq/translate".format(serve_port)
 
     test_method_translate(url, src_lang)
+    test_method_translate_batch(url, src_lang)
+    test_method_translate_stream(url, src_lang)
     test_method_term_protection(url)
     test_performance(url, src_lang)
 
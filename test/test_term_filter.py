@@ -0,0 +1,145 @@
+"""
+测试术语匹配器，AhoCorasickFilter的匹配结果应当与DFAFilter完全一致
+"""
+import os
+import random
+import tempfile
+
+from lib_translate.term_filter import DFAFilter, AhoCorasickFilter
+from lib_translate.term_dict import (compile_term_dict, CompiledTermDict,
+                                     CompiledTermFilter, TermMapping)
+
+ALPHABET = "abc d"
+
+
+def _random_text(rnd):
+    return "x" + "".join(rnd.choice(ALPHABET + "AB") for _ in range(rnd.randint(0, 60)))
+
+
+def test_same_as_dfa_filter():
+    """
+    随机生成词表和文本，对比两个匹配器的结果
+    """
+    rnd = random.Random(0)
+    for _ in range(200):
+        words = list({"".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(1, 5))).strip()
+                      for _ in range(rnd.randint(1, 30))} - {""})
+        dfa_filter = DFAFilter(words)
+        ac_filter = AhoCorasickFilter(words)
+        for _ in range(20):
+            text = _random_text(rnd)
+            assert ac_filter.filter(text) == dfa_filter.filter(text)
+
+
+def test_add_and_remove():
+    """
+    增删词语后的匹配结果应当与用新词表构建的DFAFilter一致
+    """
+    rnd = random.Random(1)
+    for _ in range(200):
+        words = list({"".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(1, 5))).strip()
+                      for _ in range(rnd.randint(2, 30))} - {""})
+        half = len(words) // 2
+        ac_filter = AhoCorasickFilter(words)
+        for word in words[:half]:
+            ac_filter.remove(word)
+        ac_filter.add(words[0])
+        extra = list({"".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(0, 4))) + "B"
+                      for _ in range(5)})
+        ac_filter.update(extra)
+        ac_filter.difference_update(extra[::2])
+        remaining = (set(words[half:] + words[:1]) | {word.strip().lower() for word in extra}) \
+            - {word.strip().lower() for word in extra[::2]}
+        dfa_filter = DFAFilter(list(remaining))
+        for _ in range(20):
+            text = _random_text(rnd)
+            assert ac_filter.filter(text) == dfa_filter.filter(text)
+
+
+def test_snapshot():
+    """
+    增删词语不重建自动机，增删之前取出的快照不受影响
+    """
+    ac_filter = AhoCorasickFilter(["hello world", "hello"])
+    automaton, _, _ = snapshot = ac_filter._snapshot
+    ac_filter.add("world")
+    ac_filter.remove("hello")
+    assert ac_filter._snapshot[0] is automaton
+    assert ac_filter.filter("hello world") == (["hello world"], [(0, 11)])
+    assert ac_filter.filter("hello, world") == (["world"], [(7, 12)])
+    ac_filter._snapshot, current = snapshot, ac_filter._snapshot
+    assert ac_filter.filter("hello, world") == (["hello"], [(0, 5)])
+    ac_filter._snapshot = current
+    ac_filter.remove("world")
+    ac_filter.add("hello")
+    assert ac_filter._snapshot[1:] == ({}, frozenset())
+
+
+def test_compiled_term_filter():
+    """
+    编译后的词典加上运行时的增删，匹配结果应当与AhoCorasickFilter一致
+    """
+    rnd = random.Random(2)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "dict.bin")
+        for _ in range(50):
+            words = list({"".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(1, 5))).strip()
+                          for _ in range(rnd.randint(2, 30))} - {""})
+            half = len(words) // 2
+            compile_term_dict({word: word.upper() for word in words[:half]}, path)
+            mapping = TermMapping(CompiledTermDict(path))
+            compiled_filter = CompiledTermFilter(mapping)
+            for word in words[half:]:
+                mapping[word] = word.upper()
+                compiled_filter.add(word)
+            for word in words[::3]:
+                mapping.pop(word, None)
+                compiled_filter.remove(word)
+            remaining = [word for word in words if word not in words[::3]]
+            assert sorted(mapping) == sorted(remaining)
+            ac_filter = AhoCorasickFilter(remaining)
+            for _ in range(20):
+                text = _random_text(rnd)
+                assert compiled_filter.filter(text) == ac_filter.filter(text)
+
+
+def test_iter_words():
+    """
+    按前缀和after取出的词应当与排序后逐个过滤的结果一致
+    """
+    rnd = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "dict.bin")
+        for _ in range(50):
+            words = list({"".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(1, 5))).strip()
+                          for _ in range(rnd.randint(2, 30))} - {""})
+            half = len(words) // 2
+            compile_term_dict({word: word for word in words[:half]}, path)
+            mapping = TermMapping(CompiledTermDict(path))
+            compiled_filter = CompiledTermFilter(mapping)
+            ac_filter = AhoCorasickFilter(words[:half])
+            for word in words[half // 2:]:
+                mapping[word] = word.upper()
+                compiled_filter.add(word)
+                ac_filter.add(word)
+            for word in words[::3]:
+                mapping.pop(word, None)
+                compiled_filter.remove(word)
+                ac_filter.remove(word)
+            remaining = sorted(set(words) - set(words[::3]))
+            for _ in range(20):
+                prefix = "".join(rnd.choice(ALPHABET) for _ in range(rnd.randint(0, 2))).strip()
+                after = rnd.choice(words + [""])
+                expected = [word for word in remaining if word.startswith(prefix) and word > after]
+                for term_filter in (ac_filter, compiled_filter):
+                    assert list(term_filter.iter_words(prefix, after)) == expected
+                    assert term_filter.count_words(prefix) == \
+                        sum(1 for word in remaining if word.startswith(prefix))
+
+
+if __name__ == "__main__":
+    test_same_as_dfa_filter()
+    test_add_and_remove()
+    test_snapshot()
+    test_compiled_term_filter()
+    test_iter_words()
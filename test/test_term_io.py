@@ -0,0 +1,137 @@
+"""
+测试词表的批量导入和导出
+"""
+import os
+import tempfile
+
+import pytest
+
+from lib_translate.term_io import read_term_chunks, write_term_file
+from lib_translate import term_protection
+from lib_translate.term_protection import TermDictionary
+
+
+@pytest.fixture(autouse=True)
+def no_sync_thread(monkeypatch):
+    """
+    mask_term不启动后台同步线程，避免临时数据库删除之后线程还在读取
+    """
+    monkeypatch.setattr(term_protection, "TERM_SYNC_INTERVAL", 0)
+
+
+def test_read_term_chunks():
+    """
+    按列名选择原文和译文，不合法的行跳过并返回行号
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "dict.tsv")
+        with open(path, "w", encoding="utf-8") as term_file:
+            term_file.write("zh\tnote\ten\n填方\t-\tfilling\n\t-\tempty\n坡度差\t-\n"
+                            "跳线线夹\t-\t jumper clamp \n{}\t-\tlong\n".format("长" * 65))
+        chunks = list(read_term_chunks(path, "en", "zh", chunk_size=1))
+    assert chunks == [([("filling", "填方")], []), ([("jumper clamp", "跳线线夹")], [3, 4]),
+                      ([], [6])]
+
+
+def test_import_and_export():
+    """
+    导入的词写入sqlite并且可以匹配，导出的词表与词典一致
+    """
+    words = [("Hello world", "你好世界"), ("I'm", "我是"), ("hello", "你好")]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dictionary = TermDictionary("en", "zh", os.path.join(tmp_dir, "dict.db"))
+        dictionary.add_words([["hello", "哈喽"]])
+        path = os.path.join(tmp_dir, "import.xlsx")
+        write_term_file(path, "en", "zh", words)
+
+        version = dictionary.get_version()
+        result = dictionary.import_words(path, chunk_size=2)
+        assert result == {"imported": 3, "invalid": 0, "invalid_lines": []}
+        assert dictionary.get_version() == version + 2  # 每块导入后版本号加一
+        assert dictionary.mask_term("hello world! I'm.")[1] == ["hello world", "I'm"]
+        assert dictionary.read_dict_sqlite() == {"hello world": "你好世界", "i'm": "我是",
+                                                 "hello": "你好"}
+
+        for name in ("export.csv", "export.xlsx"):
+            export_path = os.path.join(tmp_dir, name)
+            assert dictionary.export_words(export_path) == 3
+            exported = [word for chunk, _ in read_term_chunks(export_path, "en", "zh")
+                        for word in chunk]
+            assert dict(exported) == dictionary.show_words(return_dict=True)
+
+
+def test_page_words():
+    """
+    按cursor逐页取出的词应当与按前缀过滤、排序后的词典一致
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dictionary = TermDictionary("en", "zh", os.path.join(tmp_dir, "dict.db"))
+        dictionary.add_words([["Word {}".format(i), str(i)] for i in range(25)] + [["other", "他"]])
+        for prefix, expected in (("", 26), ("word 1", 11), ("WORD 2", 6), ("none", 0)):
+            words, cursor = [], None
+            while True:
+                page = dictionary.page_words(prefix, cursor, limit=4)
+                assert page["total"] == expected and len(page["words"]) <= 4
+                words.extend(page["words"])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            assert words == sorted([key, value] for key, value in dictionary.mapping.items()
+                                   if key.startswith(prefix.lower()))
+        dictionary.writer.flush()
+
+
+def test_delete_persists():
+    """
+    删除词表文件或者编译好的词典中的词之后重启，这个词仍然是删除的，重新添加之后恢复
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "dict.db")
+        dict_file = os.path.join(tmp_dir, "dict.csv")
+        compiled = os.path.join(tmp_dir, "dict.bin")
+        write_term_file(dict_file, "en", "zh", [("Hello world", "你好世界"), ("I'm", "我是")])
+        dictionary = TermDictionary("en", "zh", db_path, dict_file)
+        dictionary.compile(compiled)
+        dictionary.delete_words(["hello world"])
+        dictionary.writer.flush()
+        for compiled_dict in (None, compiled):
+            restarted = TermDictionary("en", "zh", db_path, dict_file, compiled_dict)
+            assert restarted.mask_term("hello world! I'm.")[1] == ["I'm"]
+            assert "hello world" not in restarted.mapping
+
+        dictionary.compile(compiled)
+        restarted = TermDictionary("en", "zh", db_path, dict_file, compiled)
+        assert restarted.mask_term("hello world! I'm.")[1] == ["I'm"]
+        dictionary.add_words([["hello world", "世界你好"]])
+        dictionary.writer.flush()
+        restarted = TermDictionary("en", "zh", db_path, dict_file, compiled)
+        assert restarted.mask_term("hello world! I'm.")[1] == ["hello world", "I'm"]
+        assert restarted.mapping["hello world"] == "世界你好"
+
+
+def test_import_concurrent_edits(monkeypatch):
+    """
+    导入的词按块生效，导入期间不阻塞增删词语，导入期间的修改在导入完成后仍然有效，并且与数据库一致
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dictionary = TermDictionary("en", "zh", os.path.join(tmp_dir, "dict.db"))
+        dictionary.add_words([["old", "旧"]])
+
+        def read_chunks(*_):
+            yield [("Hello world", "你好世界"), ("old", "导入")], []
+            assert dictionary.mask_term("hello world, old")[1] == ["hello world", "old"]
+            # 持有self.lock导入时这里会死锁
+            dictionary.add_words([["hello world", "世界你好"], ["new", "新"]])
+            dictionary.delete_words(["old"])
+            assert dictionary.mask_term("hello world, old and new")[1] == ["hello world", "new"]
+            yield [("I'm", "我是")], []
+        monkeypatch.setattr(term_protection, "read_term_chunks", read_chunks)
+
+        assert dictionary.import_words("ignored.csv")["imported"] == 3
+        expected = {"hello world": "世界你好", "new": "新", "i'm": "我是"}
+        assert dictionary.show_words(return_dict=True) == expected
+        assert dictionary.mask_term("hello world, old and new. I'm")[1] == \
+            ["hello world", "new", "I'm"]
+        dictionary.writer.flush()
+        assert {key: value for key, value in dictionary.read_dict_sqlite().items()
+                if value is not None} == expected
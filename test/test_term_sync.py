@@ -0,0 +1,103 @@
+"""
+测试多个进程之间的词典同步：用两个使用同一个sqlite数据库的词典模拟两个worker
+"""
+import os
+import tempfile
+import time
+
+import pytest
+
+from lib_translate.term_io import write_term_file
+from lib_translate import term_protection
+from lib_translate.term_protection import TermDictionary, TERM_SYNC_GAP_TIMEOUT
+
+
+@pytest.fixture(autouse=True)
+def no_sync_thread(monkeypatch):
+    """
+    测试中直接调用sync，mask_term不启动后台同步线程，避免临时数据库删除之后线程还在读取
+    """
+    monkeypatch.setattr(term_protection, "TERM_SYNC_INTERVAL", 0)
+
+
+def test_sync_delta():
+    """
+    一个词典的增删在另一个词典同步之后生效，自己写入的修改不会重复应用
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "dict.db")
+        writer, reader = TermDictionary("en", "zh", db_path), TermDictionary("en", "zh", db_path)
+
+        writer.add_words([["Hello world", "你好世界"], ["I'm", "我是"]])
+        assert reader.sync() == 0
+        writer.writer.flush()
+        version = reader.get_version()
+        assert reader.sync() == 2
+        assert reader.get_version() == version + 1
+        assert reader.mask_term("hello world! I'm.")[1] == ["hello world", "I'm"]
+        assert writer.sync() == 0
+
+        writer.delete_words(["I'm"])
+        writer.writer.flush()
+        # 还没有写入的修改以当前进程为准
+        reader.add_words([["hello world", "哈喽世界"]])
+        assert reader.sync() == 1
+        assert reader.mask_term("hello world! I'm.")[1] == ["hello world"]
+        assert reader.show_words(return_dict=True) == {"hello world": "哈喽世界"}
+        reader.writer.flush()
+        assert writer.sync() == 1
+        assert writer.show_words(return_dict=True) == {"hello world": "哈喽世界"}
+
+
+def test_sync_reload():
+    """
+    批量导入或者需要的修改记录已经被删除时，重新加载整个词典
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "dict.db")
+        writer, reader = TermDictionary("en", "zh", db_path), TermDictionary("en", "zh", db_path)
+        path = os.path.join(tmp_dir, "import.csv")
+        write_term_file(path, "en", "zh", [("word {}".format(i), str(i)) for i in range(10)])
+        writer.import_words(path)
+        assert writer.sync() == 0
+        assert reader.sync() == 10
+        assert reader.show_words(return_dict=True) == writer.show_words(return_dict=True)
+
+        writer.change_log.max_size = 2
+        for i in range(5):
+            writer.add_words([["new {}".format(i), str(i)]])
+            writer.writer.flush()
+        assert reader.sync() == 15
+        assert reader.mask_term("new 0 and word 9")[1] == ["new 0", "word 9"]
+
+
+def test_sync_late_commit():
+    """
+    版本号小的事务晚于版本号大的事务提交时（postgresql等数据库），晚提交的修改也会应用；
+    缺少的版本号超过term_sync_gap_timeout_seconds之后不再等待
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reader = TermDictionary("en", "zh", os.path.join(tmp_dir, "dict.db"))
+        table = reader.change_log.table
+        version = reader.synced_version
+
+        def commit(offset, word, created_at=None):
+            reader.engine.execute(table.insert(), [{
+                "version": version + offset, "src_word": word, "tgt_word": word.upper(),
+                "origin": "other", "created_at": created_at or time.time()}])
+
+        commit(1, "first")
+        assert reader.sync() == 1
+        assert reader.synced_version == version + 1
+        commit(3, "third")
+        assert reader.sync() == 1
+        assert reader.synced_version == version + 1
+        assert reader.sync() == 0
+        commit(2, "second")
+        assert reader.sync() == 1
+        assert reader.synced_version == version + 3
+        assert reader.mask_term("first second third")[1] == ["first", "second", "third"]
+
+        commit(5, "fifth", created_at=time.time() - TERM_SYNC_GAP_TIMEOUT - 1)
+        assert reader.sync() == 1
+        assert reader.synced_version == version + 5